@@ -0,0 +1,106 @@
+'''
+Provides: RingBufferHandler, setup(), flush()
+
+Logging without I/O on the caller's thread: records are appended to a
+bounded in-memory ring buffer, and a background thread writes them to the
+real handler (a file or the console). When the buffer is full the oldest
+records are dropped. A record at ERROR or above wakes the writer at once, and
+flush() writes everything buffered on demand.
+'''
+
+import collections
+import logging
+import sys
+import threading
+
+DEFAULT_CAPACITY = 10000 #records
+DEFAULT_FLUSH_INTERVAL = 1 #seconds
+LOG_FORMAT = logging.BASIC_FORMAT
+
+_handler = None
+
+
+class RingBufferHandler(logging.Handler):
+    def __init__(self, target, capacity=DEFAULT_CAPACITY,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 flush_level=logging.ERROR):
+        '''Buffer records for target, writing them on a background thread'''
+        super().__init__()
+        self.target = target
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.dropped = 0
+        self._buffer = collections.deque(maxlen=capacity)
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name='log-writer',
+                                        daemon=True)
+        self._thread.start()
+
+    def emit(self, record):
+        #Only append: formatting and writing happen on the writer thread
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(record)
+        if record.levelno >= self.flush_level:
+            self._wake.set()
+
+    def _run(self):
+        while not self._closing:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        '''Write every buffered record to the target now'''
+        with self._write_lock:
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                self.target.handle(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING,
+                    'levelname': 'WARNING',
+                    'msg': "{} log records dropped, the buffer was "
+                           "full".format(dropped)}))
+            buffer = self._buffer
+            while buffer:
+                self.target.handle(buffer.popleft())
+            self.target.flush()
+
+    def close(self):
+        if not self._closing:
+            self._closing = True
+            self._wake.set()
+            if self._thread is not threading.current_thread():
+                self._thread.join()
+            self.flush()
+            self.target.close()
+        super().close()
+
+
+def setup(filename=None, level=logging.DEBUG, capacity=DEFAULT_CAPACITY):
+    '''Log the root logger's records through a RingBufferHandler
+
+    Records are written to filename (overwritten) or, if None, the console.
+    A previous setup() is replaced.'''
+    global _handler
+    if filename is None:
+        target = logging.StreamHandler(sys.stderr)
+    else:
+        target = logging.FileHandler(filename, 'w')
+    target.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+        _handler.close()
+    _handler = RingBufferHandler(target, capacity)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    return _handler
+
+
+def flush():
+    '''Write everything buffered so far to disk (or the console)'''
+    if _handler is not None:
+        _handler.flush()
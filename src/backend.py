@@ -0,0 +1,149 @@
+'''
+Provides: Backend, get_backend(), set_backend()
+
+The backend is the only place that talks to the window manager. windowinfo
+and hotkey go through get_backend(), which is the Win32 API on Windows and an
+in-memory fake window manager elsewhere (see fakebackend).
+'''
+
+import sys
+
+_backend = None
+
+
+class Backend:
+    """Interface to the window manager
+
+    Windows are identified by an opaque hwnd and rectangles are
+    (left, top, right, bottom) tuples."""
+
+    def enum_windows(self):
+        """Return hwnds of all top-level windows, top of the z-order first"""
+        raise NotImplementedError
+
+    def get_window_title(self, hwnd):
+        raise NotImplementedError
+
+    def get_window_rect(self, hwnd):
+        raise NotImplementedError
+
+    def get_window_class(self, hwnd):
+        """Return the name of the window's class"""
+        raise NotImplementedError
+
+    def get_process_name(self, hwnd):
+        """Return the file name of the program owning the window, eg.
+        'notepad.exe', or '' if it cannot be queried"""
+        raise NotImplementedError
+
+    def is_iconic(self, hwnd):
+        """Return whether the window is minimised"""
+        raise NotImplementedError
+
+    def is_zoomed(self, hwnd):
+        """Return whether the window is maximised"""
+        raise NotImplementedError
+
+    def is_visible(self, hwnd):
+        raise NotImplementedError
+
+    def get_foreground_window(self):
+        raise NotImplementedError
+
+    def get_desktop_rect(self):
+        """Return the rectangle of the whole desktop"""
+        raise NotImplementedError
+
+    def get_monitors(self):
+        """Return [(bounds, work_area, is_primary), ...] for every monitor
+
+        The work area excludes the task bar and docked tool bars."""
+        raise NotImplementedError
+
+    def watch_displays(self, callback):
+        """Call callback() when monitors or their work areas change"""
+        raise NotImplementedError
+
+    def unwatch_displays(self):
+        raise NotImplementedError
+
+    def move_window(self, hwnd, rect, repaint=True):
+        raise NotImplementedError
+
+    def move_windows(self, moves):
+        """Move windows [(hwnd, rect), ...] at once, repainting only once"""
+        raise NotImplementedError
+
+    def watch_windows(self, callback):
+        """Call callback(hwnd, destroyed) when a top-level window changes
+
+        Changes are creation, destruction, showing/hiding, moving, resizing,
+        minimising/restoring and retitling. Events are delivered while the
+        message pump runs (see get_message)."""
+        raise NotImplementedError
+
+    def unwatch_windows(self):
+        """Stop calling the watch_windows callback"""
+        raise NotImplementedError
+
+    def get_cursor_pos(self):
+        """Return the cursor position (x, y), or None if it is not showing"""
+        raise NotImplementedError
+
+    def register_hotkey(self, hid, modifiers, virtual_key):
+        """Return whether the hotkey was registered"""
+        raise NotImplementedError
+
+    def unregister_hotkey(self, hid):
+        """Return whether the hotkey was unregistered"""
+        raise NotImplementedError
+
+    def set_timer(self, interval, callback):
+        """Return the id of a timer calling callback() every interval seconds
+
+        The callback runs on the thread waiting in get_message or
+        wait_message."""
+        raise NotImplementedError
+
+    def kill_timer(self, timer_id):
+        raise NotImplementedError
+
+    def get_message(self):
+        """Return (status, hid, (x, y)) of the next hotkey message (waits)
+
+        Status is positive for a hotkey, 0 to exit and -1 on error."""
+        raise NotImplementedError
+
+    def wait_message(self, timeout=None):
+        """Return the next hotkey message like get_message, or None if there
+        is none within timeout seconds (None waits indefinitely)
+
+        Timers and window events are dispatched while waiting. None is also
+        returned early once wake is called."""
+        raise NotImplementedError
+
+    def wake(self):
+        """Make the wait_message in progress, or the next one, return None
+
+        It can be called from any thread."""
+        raise NotImplementedError
+
+
+def get_backend():
+    """Return the backend in use, creating the default one if needed"""
+    global _backend
+    if _backend is None:
+        if sys.platform == 'win32':
+            import win32backend
+            _backend = win32backend.Win32Backend()
+        else:
+            import fakebackend
+            _backend = fakebackend.FakeBackend()
+    return _backend
+
+
+def set_backend(new_backend):
+    """Use new_backend from now on and return the previous one"""
+    global _backend
+    old_backend, _backend = _backend, new_backend
+    return old_backend
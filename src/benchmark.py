@@ -0,0 +1,307 @@
+'''
+Benchmark the fill over synthetic window layouts
+
+Layouts are generated from a seed, so runs are reproducible, and results are
+written as JSON keyed by case name so that two runs can be compared:
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+
+The full fill_foreground_window pipeline is timed on the fake backend.
+'''
+
+import argparse
+import heapq
+import json
+import logging
+import random
+import sys
+import time
+
+import backend
+import occupancy
+import windowinfo
+from fakebackend import FakeBackend
+from spatialindex import WindowIndex
+
+DESKTOP_SIZES = {
+    '1080p': (1920, 1080),
+    '1440p': (2560, 1440),
+    '4k': (3840, 2160),
+    '8k': (7680, 4320),
+    '16k': (15360, 8640),
+}
+MONITOR_COUNTS = (1, 2, 4)
+WINDOW_COUNTS = (1, 10, 100, 500, 2000)
+#The legacy engine takes seconds per fill on large desktops, so it is opt-in
+DEFAULT_ENGINES = ('exact', 'numpy')
+PERCENTILES = (50, 90, 99)
+
+
+def virtual_desktop_size(monitor_size, monitors):
+    """Return the size of monitors arranged side by side (or 2x2 for four)"""
+    width, height = monitor_size
+    if monitors == 4:
+        return width * 2, height * 2
+    return width * monitors, height
+
+
+def random_tiling(rng, desktop_size, count):
+    """Return count rects from recursively splitting the desktop, with gaps"""
+    def largest_first(rect):
+        return (-(rect[2] - rect[0]) * (rect[3] - rect[1]), rect)
+
+    tiles = [largest_first((0, 0) + tuple(desktop_size))]
+    while len(tiles) < count:
+        #Split the largest tile across its longer side
+        left, top, right, bottom = heapq.heappop(tiles)[1]
+        if right - left >= bottom - top:
+            split = rng.randint(left + (right - left) // 4,
+                                right - (right - left) // 4)
+            halves = [(left, top, split, bottom), (split, top, right, bottom)]
+        else:
+            split = rng.randint(top + (bottom - top) // 4,
+                                bottom - (bottom - top) // 4)
+            halves = [(left, top, right, split), (left, split, right, bottom)]
+        for half in halves:
+            heapq.heappush(tiles, largest_first(half))
+
+    rects = []
+    for _, (left, top, right, bottom) in sorted(tiles):
+        gap_x = rng.randint(0, (right - left) // 4)
+        gap_y = rng.randint(0, (bottom - top) // 4)
+        rects.append((left, top, right - gap_x, bottom - gap_y))
+    return rects
+
+
+def cascade(rng, desktop_size, count):
+    """Return count overlapping rects stepping down from the top-left"""
+    width, height = desktop_size[0] * 3 // 5, desktop_size[1] * 3 // 5
+    step = 30
+    columns = max(1, (desktop_size[1] - height) // step)
+    rects = []
+    for i in range(count):
+        offset = (i % columns) * step
+        shift = (i // columns) * step * 2 % max(1, desktop_size[0] - width)
+        rects.append((offset + shift, offset,
+                      offset + shift + width, offset + height))
+    return rects
+
+
+def tiny_grid(rng, desktop_size, count):
+    """Return count small rects in a regular grid with gaps between them"""
+    per_row = max(1, int(count ** 0.5 * desktop_size[0] / desktop_size[1]))
+    rows = -(-count // per_row)
+    cell_w, cell_h = desktop_size[0] // per_row, desktop_size[1] // rows
+    rects = []
+    for i in range(count):
+        left, top = (i % per_row) * cell_w, (i // per_row) * cell_h
+        rects.append((left + cell_w // 8, top + cell_h // 8,
+                       left + cell_w * 7 // 8, top + cell_h * 7 // 8))
+    return rects
+
+
+def random_windows(rng, desktop_size, count):
+    """Return count rects of random size and position (may overlap)"""
+    rects = []
+    for _ in range(count):
+        width = rng.randint(50, max(50, desktop_size[0] // 3))
+        height = rng.randint(50, max(50, desktop_size[1] // 3))
+        left = rng.randint(0, max(0, desktop_size[0] - width))
+        top = rng.randint(0, max(0, desktop_size[1] - height))
+        rects.append((left, top, left + width, top + height))
+    return rects
+
+
+LAYOUTS = {
+    'tiling': random_tiling,
+    'cascade': cascade,
+    'tiny-grid': tiny_grid,
+    'random': random_windows,
+}
+
+
+def make_windows(rects):
+    return [windowinfo.Window.create_dummy(str(i), rect)
+            for i, rect in enumerate(rects)]
+
+
+def empty_points(rng, windows, desktop_size, count, attempts=20):
+    """Return count random points, preferring points outside every window"""
+    index = WindowIndex(windows)
+    points = []
+    for _ in range(count):
+        for _ in range(attempts):
+            point = (rng.randint(0, desktop_size[0]),
+                     rng.randint(0, desktop_size[1]))
+            if index.is_empty(point):
+                break
+        points.append(point)
+    return points
+
+
+def summarise(samples):
+    """Return percentiles, mean and max of samples (seconds) in microseconds"""
+    ordered = sorted(samples)
+    summary = {}
+    for percentile in PERCENTILES:
+        rank = max(0, -(-percentile * len(ordered) // 100) - 1)
+        summary['p{}'.format(percentile)] = ordered[rank] * 1e6
+    summary['mean'] = sum(ordered) / len(ordered) * 1e6
+    summary['max'] = ordered[-1] * 1e6
+    summary['samples'] = len(ordered)
+    return summary
+
+
+def time_calls(func, args_list):
+    """Return the duration of func(*args) for each args in args_list"""
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def time_pipeline(rects, desktop_size, points, engine):
+    """Time fill_foreground_window on a fake backend holding rects"""
+    fake = FakeBackend(desktop_size)
+    for i, rect in enumerate(rects):
+        fake.add_window(str(i), rect)
+    fore = fake.add_window("foreground", (0, 0, 10, 10))
+    fake.set_foreground_window(fore)
+
+    old_backend = backend.set_backend(fake)
+    try:
+        samples = []
+        for point in points:
+            fake.get_window(fore).rect = (0, 0, 10, 10)
+            fake.cursor_pos = point
+            start = time.perf_counter()
+            windowinfo.fill_foreground_window(engine)
+            samples.append(time.perf_counter() - start)
+    finally:
+        backend.set_backend(old_backend)
+    return samples
+
+
+def run_case(layout, desktop_size, count, engines, repeat, seed):
+    """Return {measurement: summary} for one layout"""
+    rng = random.Random(seed)
+    rects = LAYOUTS[layout](rng, desktop_size, count)
+    windows = make_windows(rects)
+    index = WindowIndex(windows)
+    array = windowinfo.WindowArray.from_windows(windows)
+    points = empty_points(rng, windows, desktop_size, repeat)
+
+    results = {}
+    results['is_empty'] = summarise(time_calls(
+        windowinfo.is_empty, [(windows, p) for p in points]))
+    results['is_empty[index]'] = summarise(time_calls(
+        windowinfo.is_empty, [(index, p) for p in points]))
+    results['is_empty[array]'] = summarise(time_calls(
+        windowinfo.is_empty, [(array, p) for p in points]))
+
+    for engine in engines:
+        if engine == 'numpy' and not occupancy.HAVE_NUMPY:
+            continue
+        results['fill_space[{}]'.format(engine)] = summarise(time_calls(
+            windowinfo.fill_space,
+            [(index, desktop_size, p, engine) for p in points]))
+        results['fill_space[{}][array]'.format(engine)] = summarise(time_calls(
+            windowinfo.fill_space,
+            [(array, desktop_size, p, engine) for p in points]))
+        results['pipeline[{}]'.format(engine)] = summarise(
+            time_pipeline(rects, desktop_size, points, engine))
+    return results
+
+
+def run(sizes, monitors, layouts, counts, engines, repeat=20, seed=0,
+        progress=None):
+    """Return the benchmark results for every combination of the arguments"""
+    cases = {}
+    for size_name in sizes:
+        for monitor_count in monitors:
+            desktop_size = virtual_desktop_size(DESKTOP_SIZES[size_name],
+                                                monitor_count)
+            for layout in layouts:
+                for count in counts:
+                    name = '{}x{}/{}/{}'.format(size_name, monitor_count,
+                                                layout, count)
+                    if progress is not None:
+                        progress(name)
+                    cases[name] = run_case(layout, desktop_size, count,
+                                           engines, repeat, seed)
+    return {
+        'python': sys.version.split()[0],
+        'numpy': occupancy.HAVE_NUMPY,
+        'seed': seed,
+        'repeat': repeat,
+        'cases': cases,
+    }
+
+
+def compare(old, new, stat='p50', threshold=1.2):
+    """Return (case, measurement, old, new) where new is threshold x slower"""
+    regressions = []
+    for case, measurements in new['cases'].items():
+        for measurement, summary in measurements.items():
+            try:
+                before = old['cases'][case][measurement][stat]
+            except KeyError:
+                continue
+            if summary[stat] > before * threshold:
+                regressions.append((case, measurement, before, summary[stat]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', nargs='+', default=list(DESKTOP_SIZES),
+                        choices=list(DESKTOP_SIZES))
+    parser.add_argument('--monitors', nargs='+', type=int,
+                        default=list(MONITOR_COUNTS))
+    parser.add_argument('--layouts', nargs='+', default=list(LAYOUTS),
+                        choices=list(LAYOUTS))
+    parser.add_argument('--counts', nargs='+', type=int,
+                        default=list(WINDOW_COUNTS))
+    parser.add_argument('--engines', nargs='+', default=list(DEFAULT_ENGINES),
+                        choices=list(windowinfo.FILL_ENGINES))
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='cursor positions timed per case')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='report regressions against this '
+                        'JSON file (exit status 1 if any)')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='slowdown ratio counted as a regression')
+    args = parser.parse_args(argv)
+    #Points inside a window make the fill warn, which is expected here
+    logging.disable(logging.WARNING)
+
+    results = run(args.sizes, args.monitors, args.layouts, args.counts,
+                  args.engines, args.repeat, args.seed,
+                  progress=lambda name: print(name, file=sys.stderr))
+
+    for case, measurements in results['cases'].items():
+        for measurement, summary in measurements.items():
+            print('{:32} {:20} p50 {:10.1f}us  p99 {:10.1f}us'.format(
+                  case, measurement, summary['p50'], summary['p99']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        regressions = compare(old, results, threshold=args.threshold)
+        for case, measurement, before, after in regressions:
+            print('REGRESSION {} {}: {:.1f}us -> {:.1f}us'.format(
+                  case, measurement, before, after))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,251 @@
+'''
+Provides: Policy, fill_candidates(), choose_fill()
+
+fill_space grows the fill across the cursor row, then up and down, which can
+give a thin strip when a much larger free rectangle contains the cursor.
+Here several strategies each propose a rectangle containing the cursor, and
+the one scoring best under a Policy (set in config.ini) is used:
+
+    horizontal  fill_space_exact, across then up and down
+    vertical    the same, up and down then across
+    largest     the largest free rectangle (see freespace.FreeSpaceMap)
+    aspect      the free rectangle closest in shape to the window
+
+Horizontal is computed first, on the calling thread, so there is always a
+candidate to fall back on. The others run on worker threads, and only those
+finished within the policy's time budget are scored; the rest are dropped.
+Largest and aspect read a FreeSpaceMap, which takes as long to build as
+hundreds of fills: the map of the last layout is kept, and while a map is
+being built they are skipped rather than waited for past the budget.
+'''
+
+import collections
+import concurrent.futures
+import functools
+import logging
+import math
+import threading
+import time
+
+import windowinfo
+from freespace import FreeSpaceMap
+
+logging = logging.getLogger(__name__)
+
+#Strategies: names in STRATEGIES to run. A candidate scores area_weight
+#times the fraction of the area it covers, plus aspect_weight times its match
+#with the window's shape (1 for the same shape). Budget is in seconds.
+Policy = collections.namedtuple(
+    'Policy', 'strategies area_weight aspect_weight budget')
+
+DEFAULT_POLICY = Policy(('horizontal', 'vertical', 'largest', 'aspect'),
+                        1.0, 0.5, 0.02)
+
+#Strategies reading the FreeSpaceMap, skipped while it is being built
+MAP_STRATEGIES = {'largest', 'aspect'}
+
+_executor = None
+_executor_lock = threading.Lock()
+_free_map_future = None #Of the FreeSpaceMap built last, or being built
+_last_free_map = (None, None) #(layout, FreeSpaceMap) of the last layout
+
+
+class _Query:
+    def __init__(self, windows, area, position, size):
+        self.windows = windows
+        self.area = area
+        self.position = position
+        self.size = size
+        self.free_map = None #Once built, for the MAP_STRATEGIES
+
+
+def _transpose(rect):
+    return (rect[1], rect[0], rect[3], rect[2])
+
+
+def _horizontal(query):
+    return windowinfo.fill_space_exact(query.windows, query.area,
+                                       query.position)
+
+
+def _vertical(query):
+    windows = [windowinfo.Window.create_dummy(None, _transpose(win.position))
+               for win in query.windows]
+    rect = windowinfo.fill_space_exact(windows, _transpose(query.area),
+                                       query.position[::-1])
+    return None if rect is None else _transpose(rect)
+
+
+def _largest(query):
+    return query.free_map.rectangle_at(query.position)
+
+
+def _aspect(query):
+    if query.size is None:
+        return None
+    rects = query.free_map.rectangles_at(query.position)
+    return max(rects, key=lambda rect: (_aspect_match(rect, query.size),
+                                        _area(rect)), default=None)
+
+
+STRATEGIES = collections.OrderedDict([
+    ('horizontal', _horizontal),
+    ('vertical', _vertical),
+    ('largest', _largest),
+    ('aspect', _aspect),
+])
+
+
+def _area(rect):
+    return (rect[2] - rect[0]) * (rect[3] - rect[1])
+
+
+def _aspect_match(rect, size):
+    '''Return 1 if rect has the shape of size (width, height), less if not'''
+    width, height = rect[2] - rect[0], rect[3] - rect[1]
+    if min(width, height, size[0], size[1]) <= 0:
+        return 0.0
+    return math.exp(-abs(math.log((width / height) / (size[0] / size[1]))))
+
+
+def score(rect, area, size, policy):
+    """Return the score of a candidate rectangle under policy"""
+    area = windowinfo.get_area(area)
+    total = _area(rect) / max(_area(area), 1) * policy.area_weight
+    if size is not None:
+        total += _aspect_match(rect, size) * policy.aspect_weight
+    return total
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(STRATEGIES),
+                thread_name_prefix='fill-candidates')
+        return _executor
+
+
+def _layout_free_map(windows, area):
+    '''Return the FreeSpaceMap of windows within area, reusing the last one
+    if the layout has not changed'''
+    global _last_free_map
+    layout = (area, tuple((win.left, win.top, win.right, win.bottom)
+                          for win in windows))
+    last_layout, free_map = _last_free_map
+    if last_layout != layout:
+        free_map = FreeSpaceMap(windows, area)
+        _last_free_map = (layout, free_map)
+    return free_map
+
+
+def _start_free_map(free_map):
+    '''Return the Future of free_map() run on a worker thread, or None while
+    the last map is still being built, instead of queuing behind it'''
+    global _free_map_future
+    executor = _get_executor()
+    with _executor_lock:
+        if _free_map_future is not None and not _free_map_future.done():
+            return None
+        _free_map_future = executor.submit(free_map)
+        return _free_map_future
+
+
+def _remaining(deadline):
+    if deadline is None:
+        return None
+    return max(0, deadline - time.perf_counter())
+
+
+def fill_candidates(windows, area, position, size=None,
+                    policy=DEFAULT_POLICY, free_map=None):
+    """Return {strategy: rectangle or None} for the policy's strategies
+
+    Horizontal is always included. The other strategies are included if they
+    finished within policy.budget seconds (None for no limit); the others
+    are cancelled, or left to finish unseen if already running. Free_map is
+    a function returning the FreeSpaceMap of windows within area, for the
+    MAP_STRATEGIES (see WindowCache.free_map); by default the map of the
+    last layout is kept. Size is the (width, height) of the window being
+    filled, for the aspect strategy."""
+    for name in policy.strategies:
+        if name not in STRATEGIES:
+            raise ValueError("Unknown fill strategy: {}".format(name))
+    deadline = (None if policy.budget is None else
+                time.perf_counter() + policy.budget)
+    query = _Query(list(windows), windowinfo.get_area(area), tuple(position),
+                   size)
+    #Before any worker competes with it for the GIL
+    candidates = {'horizontal': STRATEGIES['horizontal'](query)}
+    names = [name for name in policy.strategies if name != 'horizontal']
+    map_future = None
+    if any(name in MAP_STRATEGIES for name in names):
+        if free_map is None:
+            free_map = functools.partial(_layout_free_map, query.windows,
+                                         query.area)
+        map_future = _start_free_map(free_map)
+    executor = _get_executor()
+    futures = {executor.submit(STRATEGIES[name], query): name
+               for name in names if name not in MAP_STRATEGIES}
+
+    if map_future is not None:
+        try:
+            query.free_map = map_future.result(_remaining(deadline))
+        except concurrent.futures.TimeoutError:
+            pass
+        except Exception as e:
+            logging.error("Free space map failed: {}".format(e))
+    skipped = []
+    for name in names:
+        if name not in MAP_STRATEGIES:
+            continue
+        if query.free_map is None:
+            skipped.append(name)
+            continue
+        #Looking the position up in the map is quick
+        try:
+            candidates[name] = STRATEGIES[name](query)
+        except Exception as e:
+            logging.error("Fill strategy {} failed: {}".format(name, e))
+
+    done, not_done = concurrent.futures.wait(futures,
+                                             timeout=_remaining(deadline))
+    for future in not_done:
+        future.cancel()
+    if not_done or skipped:
+        logging.debug("Fill candidates over budget: {}".format(
+                      sorted(skipped + [futures[future]
+                                        for future in not_done])))
+    for future in done:
+        try:
+            candidates[futures[future]] = future.result()
+        except Exception as e:
+            logging.error("Fill strategy {} failed: {}".format(
+                          futures[future], e))
+    return candidates
+
+
+def choose_fill(windows, area, position, size=None, policy=DEFAULT_POLICY,
+                free_map=None):
+    """Return the best scoring candidate rectangle, or None
+
+    Ties go to the strategy listed first in the policy, and without any
+    candidate the horizontal fill is used. Free_map is as for
+    fill_candidates."""
+    candidates = fill_candidates(windows, area, position, size, policy,
+                                 free_map)
+    best = None
+    best_score = None
+    for name in policy.strategies:
+        rect = candidates.get(name)
+        if rect is None:
+            continue
+        rect_score = score(rect, area, size, policy)
+        logging.debug("Fill candidate {}: {} scores {:.3f}".format(
+                      name, rect, rect_score))
+        if best is None or rect_score > best_score:
+            best, best_score = rect, rect_score
+    if best is None:
+        best = candidates['horizontal']
+    return best
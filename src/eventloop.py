@@ -0,0 +1,193 @@
+'''
+Provides: EventLoop, Periodic
+
+One scheduler for everything the daemon's main thread does.
+
+The daemon's thread used to block in get_message until the next hotkey, so
+anything else needing a wake up (resyncs, reloading the settings, commands)
+needed a thread of its own. EventLoop waits for backend messages with
+wait_message instead, for no longer than the next thing scheduled, and in
+between runs an asyncio loop, which holds the callbacks, timers and tasks.
+
+Callbacks and timers scheduled on the asyncio loop wake the wait when due,
+and so do callbacks scheduled from other threads through the EventLoop
+(call_soon_threadsafe, submit, run_coroutine_threadsafe). Only I/O waited on
+by a task is polled, every max_latency seconds.
+'''
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+
+import hotkey
+from backend import get_backend
+
+logging = logging.getLogger(__name__)
+
+DEFAULT_MAX_LATENCY = 0.05 #seconds
+
+
+class _Loop(asyncio.SelectorEventLoop):
+    """Remembers whether callbacks are ready and when timers are due, which
+    asyncio keeps to itself"""
+
+    def __init__(self):
+        super().__init__()
+        self.ready = False
+        self.timers = set() #Handles not run yet
+
+    def call_soon(self, callback, *args, **kwargs):
+        self.ready = True
+        return super().call_soon(callback, *args, **kwargs)
+
+    def call_at(self, when, callback, *args, **kwargs):
+        def run(*args):
+            self.timers.discard(handle)
+            callback(*args)
+        handle = super().call_at(when, run, *args, **kwargs)
+        self.timers.add(handle)
+        return handle
+
+
+class Periodic:
+    def __init__(self, events, interval, callback, args):
+        '''Call callback(*args) every interval seconds (see call_every)'''
+        self.interval = interval
+        self._events = events
+        self._callback = callback
+        self._args = args
+        self._handle = events.call_later(interval, self._run)
+
+    def _run(self):
+        try:
+            self._callback(*self._args)
+        except Exception as e:
+            logging.error("Periodic callback failed: {}".format(e))
+        if self._handle is not None:
+            self._handle = self._events.call_later(self.interval, self._run)
+
+    def cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+
+class EventLoop:
+    def __init__(self, max_latency=DEFAULT_MAX_LATENCY):
+        '''Handle backend messages and an asyncio loop on the running thread
+
+        Hotkey messages are handled like hotkey.process_next_message does.'''
+        self.max_latency = max_latency
+        #Selectors can be polled cheaply between waits on every platform
+        self.loop = _Loop()
+        self._lock = threading.Lock()
+        self._futures = set() #Of submit, not run yet
+        self._stopping = False
+
+    def call_soon_threadsafe(self, callback, *args):
+        '''Run callback(*args) on the loop soon, from any thread'''
+        handle = self.loop.call_soon_threadsafe(callback, *args)
+        get_backend().wake()
+        return handle
+
+    def call_later(self, delay, callback, *args):
+        '''Return the handle of callback(*args) run in delay seconds
+
+        Like asyncio, it must be called on the loop's thread (or before the
+        loop runs).'''
+        return self.loop.call_later(delay, callback, *args)
+
+    def call_every(self, interval, callback, *args):
+        '''Return a Periodic calling callback(*args) every interval seconds
+
+        The interval is counted from the end of the previous call, and an
+        exception does not stop the calls.'''
+        return Periodic(self, interval, callback, args)
+
+    def submit(self, func, *args):
+        '''Return a concurrent.futures.Future of func(*args) run on the loop
+
+        It can be called from any thread. If the loop stops before func is
+        run, the future is cancelled.'''
+        future = concurrent.futures.Future()
+        def run():
+            with self._lock:
+                self._futures.discard(future)
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+        with self._lock:
+            if self._stopping:
+                raise RuntimeError("The event loop is stopping")
+            self._futures.add(future)
+        self.call_soon_threadsafe(run)
+        return future
+
+    def run_coroutine_threadsafe(self, coroutine):
+        '''Return a concurrent.futures.Future of running coroutine as a task
+
+        See asyncio.run_coroutine_threadsafe.'''
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        get_backend().wake()
+        return future
+
+    def stop(self):
+        '''Make run return, from any thread'''
+        with self._lock:
+            self._stopping = True
+        get_backend().wake()
+
+    def _timeout(self):
+        '''Return the seconds the next wait may last, None for no limit'''
+        if self.loop.ready:
+            return 0
+        timers = self.loop.timers = {handle for handle in self.loop.timers
+                                     if not handle.cancelled()}
+        timeout = None
+        if timers:
+            timeout = max(0, min(handle.when() for handle in timers) -
+                          self.loop.time())
+        if asyncio.all_tasks(self.loop):
+            #They may wait for I/O
+            timeout = min(self.max_latency, timeout if timeout is not None
+                          else self.max_latency)
+        return timeout
+
+    def _step(self):
+        '''Run the asyncio callbacks that are ready and timers that are due'''
+        self.loop.call_soon(self.loop.stop)
+        self.loop.ready = False
+        self.loop.run_forever()
+
+    def run(self):
+        '''Return the status of the message ending the loop, None if stopped
+
+        The status is 0 for a message to exit and -1 on error (see
+        get_message). A loop runs only once.'''
+        backend = get_backend()
+        try:
+            while not self._stopping:
+                message = backend.wait_message(self._timeout()) # Waiting here
+                if message is not None:
+                    try:
+                        status = hotkey.handle_message(message)
+                    except Exception as e:
+                        logging.critical(str(e))
+                    else:
+                        if message[0] <= 0:
+                            return status
+                self._step()
+            return None
+        finally:
+            with self._lock:
+                self._stopping = True
+                futures, self._futures = self._futures, set()
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        self.loop.close()
@@ -0,0 +1,171 @@
+'''
+Provides: RuleSet, VerdictCache, set_rules(), get_rules(), is_excluded(),
+          is_too_small(), forget(), track(), is_tracking()
+
+Which windows are left out of the fill (as obstacles and as windows to fill)
+is given by a RuleSet: regular expressions for the titles, window classes and
+process names excluded, and for those included even so, plus the smallest
+size of a window. Each list is compiled once into a single expression.
+
+The verdict for a window only depends on its title, class and process, so it
+is kept per hwnd. The class and process of a window never change, and while
+window events are followed (see track) a title change is seen when it
+happens, so a window's title is not even fetched again until then.
+'''
+
+import re
+import threading
+
+from backend import get_backend
+
+DEFAULT_EXCLUDE_TITLES = (r'^$', r'^Program Manager$', r'^Window Fill\.exe')
+
+
+def _compile(patterns):
+    '''Return one expression searching for any of patterns, None if empty'''
+    patterns = [pattern for pattern in patterns if pattern]
+    if not patterns:
+        return None
+    return re.compile('|'.join('(?:{})'.format(pattern)
+                               for pattern in patterns))
+
+
+def _search(expression, text):
+    return expression is not None and expression.search(text) is not None
+
+
+class RuleSet:
+    def __init__(self, exclude_titles=DEFAULT_EXCLUDE_TITLES,
+                 exclude_classes=(), exclude_processes=(), include_titles=(),
+                 include_classes=(), include_processes=(), min_width=0,
+                 min_height=0):
+        '''Compile the rules (raises re.error for an invalid pattern)
+
+        A window is excluded if its title, class or process name matches an
+        exclude pattern, unless one of them matches an include pattern.
+        Process names are matched ignoring case. Windows narrower than
+        min_width or lower than min_height are excluded too.'''
+        self.patterns = (tuple(exclude_titles), tuple(exclude_classes),
+                         tuple(exclude_processes), tuple(include_titles),
+                         tuple(include_classes), tuple(include_processes))
+        self.min_width = min_width
+        self.min_height = min_height
+        self._titles = (_compile(exclude_titles), _compile(include_titles))
+        self._classes = (_compile(exclude_classes), _compile(include_classes))
+        self._processes = tuple(
+            _compile('(?i:{})'.format(pattern) for pattern in patterns if pattern)
+            for patterns in (exclude_processes, include_processes))
+        self.uses_class = any(self._classes)
+        self.uses_process = any(self._processes)
+
+    def __eq__(self, other):
+        return (isinstance(other, RuleSet) and
+                (self.patterns, self.min_width, self.min_height) ==
+                (other.patterns, other.min_width, other.min_height))
+
+    def __repr__(self):
+        return 'RuleSet{}'.format(self.patterns +
+                                  (self.min_width, self.min_height))
+
+    def excludes(self, title, class_name='', process_name=''):
+        '''Return whether a window with these names is excluded'''
+        fields = ((self._titles, title), (self._classes, class_name),
+                  (self._processes, process_name))
+        if not any(_search(exclude, text) for (exclude, _), text in fields):
+            return False
+        return not any(_search(include, text) for (_, include), text in fields)
+
+    def is_too_small(self, rect):
+        '''Return whether a window with rect is excluded by its size'''
+        return (rect[2] - rect[0] < self.min_width or
+                rect[3] - rect[1] < self.min_height)
+
+
+class VerdictCache:
+    def __init__(self, rules):
+        '''Remember whether each window is excluded by rules, per hwnd'''
+        self.rules = rules
+        self.tracking = False
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._verdicts = {} #{hwnd: (title, excluded)}
+
+    def is_excluded(self, hwnd, title=None):
+        '''Return whether the window is excluded by its names
+
+        A verdict is reused while the title is the same. If the title is not
+        given it is fetched, unless window events are tracked.'''
+        if title is None and not self.tracking:
+            title = get_backend().get_window_title(hwnd)
+        with self._lock:
+            verdict = self._verdicts.get(hwnd)
+        if verdict is not None and title in (None, verdict[0]):
+            self.hits += 1
+            return verdict[1]
+
+        self.misses += 1
+        backend = get_backend()
+        rules = self.rules
+        if title is None:
+            title = backend.get_window_title(hwnd)
+        class_name = backend.get_window_class(hwnd) if rules.uses_class else ''
+        process_name = (backend.get_process_name(hwnd)
+                        if rules.uses_process else '')
+        excluded = rules.excludes(title, class_name, process_name)
+        with self._lock:
+            if self.rules is rules: #Unless replaced meanwhile
+                self._verdicts[hwnd] = (title, excluded)
+        return excluded
+
+    def set_rules(self, rules):
+        '''Use rules from now on, dropping the verdicts of the previous ones'''
+        with self._lock:
+            self.rules = rules
+            self._verdicts.clear()
+
+    def forget(self, hwnd=None):
+        '''Drop the verdict of hwnd (eg. once destroyed), or of every window'''
+        with self._lock:
+            if hwnd is None:
+                self._verdicts.clear()
+            else:
+                self._verdicts.pop(hwnd, None)
+
+
+_verdicts = VerdictCache(RuleSet())
+
+
+def get_rules():
+    return _verdicts.rules
+
+
+def set_rules(rules):
+    _verdicts.set_rules(rules)
+
+
+def is_excluded(hwnd, title=None):
+    '''Return whether the window is excluded by the rules (see VerdictCache)'''
+    return _verdicts.is_excluded(hwnd, title)
+
+
+def is_too_small(rect):
+    '''Return whether a window with rect is excluded by the rules' sizes'''
+    return _verdicts.rules.is_too_small(rect)
+
+
+def forget(hwnd=None):
+    _verdicts.forget(hwnd)
+
+
+def track(tracking=True):
+    '''Set whether every title change is reported (see windowcache)
+
+    While tracked, a title change must be reported with is_excluded(hwnd,
+    title) or forget(hwnd), and verdicts are reused without fetching the
+    title again.'''
+    _verdicts.tracking = tracking
+
+
+def is_tracking():
+    return _verdicts.tracking
@@ -0,0 +1,240 @@
+'''
+Provides: FakeBackend, an in-memory window manager
+
+It is deterministic (hwnds are allocated in order) and cheap enough to hold
+thousands of windows, so the fill can be tested and benchmarked off Windows.
+'''
+
+import queue
+import time
+
+from backend import Backend
+
+
+class FakeWindow:
+    def __init__(self, hwnd, title, rect, visible=True, iconic=False,
+                 zoomed=False, class_name='FakeWindow',
+                 process_name='fake.exe'):
+        self.hwnd = hwnd
+        self.title = title
+        self.rect = tuple(rect)
+        self.visible = visible
+        self.iconic = iconic
+        self.zoomed = zoomed
+        self.class_name = class_name
+        self.process_name = process_name
+
+
+#Queued by wake, to end a wait_message
+_WAKE = object()
+
+#Height of the task bar at the bottom of the default monitor
+TASK_BAR_HEIGHT = 40
+
+
+class FakeBackend(Backend):
+    def __init__(self, desktop_size=(1920, 1080), monitors=None):
+        """A single monitor covering the desktop is used unless monitors (see
+        get_monitors) are given"""
+        self.desktop_size = desktop_size
+        self._monitors = monitors
+        self._display_watcher = None
+        self.cursor_pos = (0, 0)
+        self.foreground = None
+        self._windows = {}
+        self._z_order = [] #Top first
+        self._next_hwnd = 1
+        self._hotkeys = {} #hid: (modifiers, virtual_key)
+        self._messages = queue.Queue()
+        self._watcher = None
+        self._timers = {} #{timer id: [interval, callback, next time]}
+        self._next_timer_id = 1
+
+    def add_window(self, title, rect, visible=True, iconic=False,
+                   zoomed=False, **fields):
+        """Return the hwnd of a new window placed on top of the others
+
+        Fields are other FakeWindow attributes, eg. class_name."""
+        hwnd = self._next_hwnd
+        self._next_hwnd += 1
+        self._windows[hwnd] = FakeWindow(hwnd, title, rect, visible, iconic,
+                                         zoomed, **fields)
+        self._z_order.insert(0, hwnd)
+        self._notify(hwnd)
+        return hwnd
+
+    def remove_window(self, hwnd):
+        del self._windows[hwnd]
+        self._z_order.remove(hwnd)
+        if self.foreground == hwnd:
+            self.foreground = None
+        self._notify(hwnd, destroyed=True)
+
+    def update_window(self, hwnd, **fields):
+        """Change FakeWindow attributes (eg. title, rect or iconic) of hwnd
+
+        Unlike changing the FakeWindow directly, watchers are notified."""
+        window = self._windows[hwnd]
+        for name, value in fields.items():
+            if not hasattr(window, name):
+                raise AttributeError(name)
+            setattr(window, name, tuple(value) if name == 'rect' else value)
+        self._notify(hwnd)
+
+    def get_window(self, hwnd):
+        """Return the FakeWindow for hwnd, to inspect or modify directly"""
+        return self._windows[hwnd]
+
+    def set_foreground_window(self, hwnd):
+        """Make hwnd the foreground window and bring it to the top"""
+        self._z_order.remove(hwnd)
+        self._z_order.insert(0, hwnd)
+        self.foreground = hwnd
+
+    def clear(self):
+        """Remove all windows"""
+        for hwnd in list(self._z_order):
+            self.remove_window(hwnd)
+
+    def _notify(self, hwnd, destroyed=False):
+        if self._watcher is not None:
+            self._watcher(hwnd, destroyed)
+
+    def enum_windows(self):
+        return list(self._z_order)
+
+    def get_window_title(self, hwnd):
+        return self._windows[hwnd].title
+
+    def get_window_rect(self, hwnd):
+        return self._windows[hwnd].rect
+
+    def get_window_class(self, hwnd):
+        return self._windows[hwnd].class_name
+
+    def get_process_name(self, hwnd):
+        return self._windows[hwnd].process_name
+
+    def is_iconic(self, hwnd):
+        return self._windows[hwnd].iconic
+
+    def is_zoomed(self, hwnd):
+        return self._windows[hwnd].zoomed
+
+    def is_visible(self, hwnd):
+        return self._windows[hwnd].visible
+
+    def get_foreground_window(self):
+        return self.foreground
+
+    def get_desktop_rect(self):
+        return (0, 0) + tuple(self.desktop_size)
+
+    def get_monitors(self):
+        if self._monitors is None:
+            width, height = self.desktop_size
+            return [((0, 0, width, height),
+                     (0, 0, width, height - TASK_BAR_HEIGHT), True)]
+        return list(self._monitors)
+
+    def set_monitors(self, monitors):
+        """Change the monitors (None for the default) and notify watchers"""
+        self._monitors = monitors
+        if self._display_watcher is not None:
+            self._display_watcher()
+
+    def watch_displays(self, callback):
+        self._display_watcher = callback
+
+    def unwatch_displays(self):
+        self._display_watcher = None
+
+    def move_window(self, hwnd, rect, repaint=True):
+        self._windows[hwnd].rect = tuple(rect)
+        self._notify(hwnd)
+
+    def move_windows(self, moves):
+        #Every window has moved by the time the first watcher is notified
+        for hwnd, rect in moves:
+            self._windows[hwnd].rect = tuple(rect)
+        for hwnd, _ in moves:
+            self._notify(hwnd)
+
+    def watch_windows(self, callback):
+        self._watcher = callback
+
+    def unwatch_windows(self):
+        self._watcher = None
+
+    def get_cursor_pos(self):
+        return self.cursor_pos
+
+    def register_hotkey(self, hid, modifiers, virtual_key):
+        #Like Windows, a key combination can only be registered once
+        if (hid in self._hotkeys or
+                (modifiers, virtual_key) in self._hotkeys.values()):
+            return False
+        self._hotkeys[hid] = (modifiers, virtual_key)
+        return True
+
+    def unregister_hotkey(self, hid):
+        return self._hotkeys.pop(hid, None) is not None
+
+    def press_hotkey(self, hid, position=None):
+        """Queue a hotkey message, as if the keys were pressed"""
+        if position is None:
+            position = self.cursor_pos
+        self._messages.put((1, hid, position))
+
+    def post_quit(self):
+        """Queue a message to exit"""
+        self._messages.put((0, 0, (0, 0)))
+
+    def set_timer(self, interval, callback):
+        timer_id = self._next_timer_id
+        self._next_timer_id += 1
+        self._timers[timer_id] = [interval, callback,
+                                  time.monotonic() + interval]
+        return timer_id
+
+    def kill_timer(self, timer_id):
+        self._timers.pop(timer_id, None)
+
+    def _run_timers(self):
+        """Run the timers that are due, return the seconds until the next"""
+        now = time.monotonic()
+        for timer_id, timer in list(self._timers.items()):
+            interval, callback, next_time = timer
+            if next_time <= now and timer_id in self._timers:
+                timer[2] = now + interval
+                callback()
+        if not self._timers:
+            return None
+        return max(0, min(timer[2] for timer in self._timers.values()) -
+                   time.monotonic())
+
+    def get_message(self):
+        while True:
+            message = self.wait_message()
+            if message is not None:
+                return message
+
+    def wait_message(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._run_timers()
+            if deadline is not None:
+                remaining = max(0, deadline - time.monotonic())
+                wait = remaining if wait is None else min(wait, remaining)
+            try:
+                message = self._messages.get(timeout=wait)
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+                continue
+            if message is _WAKE:
+                return None
+            return message
+
+    def wake(self):
+        self._messages.put(_WAKE)
@@ -0,0 +1,107 @@
+'''
+Provides: FillCache, an LRU cache of fill results
+
+The exact fill only compares the cursor with window and work area edges, so
+its result is the same anywhere within a cell of the grid formed by those
+edges. Results are cached by the layout (hwnd and rectangle of every
+obstacle), the work area, the engine and that cell, so pressing the hotkey
+again in an unchanged layout skips the fill.
+
+Layouts containing a window are dropped when it changes (see invalidate).
+'''
+
+import bisect
+import collections
+import threading
+
+import windowinfo
+
+DEFAULT_MAX_ENTRIES = 256
+#Engines whose result is the same for every position in a cell
+CACHEABLE_ENGINES = {'exact', 'numpy'}
+
+
+def _cell(edges, value):
+    '''Return the index of the gap between edges, or the edge, at value'''
+    i = bisect.bisect_right(edges, value)
+    on_edge = i > 0 and edges[i - 1] == value
+    return 2 * i - on_edge
+
+
+class FillCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._results = collections.OrderedDict() #{(layout key, cell): rect}
+        self._layouts = {} #{layout key: (x edges, y edges, hwnds)}
+
+    def __len__(self):
+        return len(self._results)
+
+    def fill(self, windows, area, position, engine=windowinfo.DEFAULT_FILL_ENGINE):
+        '''Return fill_space(windows, area, position, engine), cached'''
+        x, y = position
+        if (engine not in CACHEABLE_ENGINES or
+                not (area[0] <= x <= area[2] and area[1] <= y <= area[3])):
+            #Outside the area the result depends on the exact position
+            windows = windowinfo.index_windows(windows, engine)
+            return windowinfo.fill_space(windows, area, position, engine)
+
+        layout_key = (engine, tuple(area), windowinfo.get_layout(windows))
+        with self._lock:
+            layout = self._layouts.get(layout_key)
+            if layout is None:
+                layout = self._add_layout(layout_key, area)
+            key = (layout_key, _cell(layout[0], x), _cell(layout[1], y))
+            try:
+                result = self._results[key]
+            except KeyError:
+                pass
+            else:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        result = windowinfo.fill_space(windows, area, position, engine)
+        with self._lock:
+            if layout_key in self._layouts: #Unless invalidated meanwhile
+                self._results[key] = result
+                while len(self._results) > self.max_entries:
+                    (old_layout_key, _, _), _ = self._results.popitem(False)
+                    self._forget_unused(old_layout_key)
+        return result
+
+    def _add_layout(self, layout_key, area):
+        xs = {area[0], area[2]}
+        ys = {area[1], area[3]}
+        hwnds = set()
+        for hwnd, (left, top, right, bottom) in layout_key[2]:
+            xs.update((left, right))
+            ys.update((top, bottom))
+            hwnds.add(hwnd)
+        layout = (sorted(xs), sorted(ys), frozenset(hwnds))
+        self._layouts[layout_key] = layout
+        return layout
+
+    def _forget_unused(self, layout_key):
+        if not any(key[0] == layout_key for key in self._results):
+            self._layouts.pop(layout_key, None)
+
+    def invalidate(self, hwnd=None):
+        '''Drop the results of layouts containing hwnd (None for all)'''
+        with self._lock:
+            if hwnd is None:
+                self._results.clear()
+                self._layouts.clear()
+                return
+            stale = {layout_key for layout_key, layout in self._layouts.items()
+                     if hwnd in layout[2]}
+            if not stale:
+                return
+            for layout_key in stale:
+                del self._layouts[layout_key]
+            for key in [key for key in self._results if key[0] in stale]:
+                del self._results[key]
@@ -0,0 +1,125 @@
+'''
+Provides: start(), stop(), record(), read_trace(), TraceRecord
+
+An opt-in recorder of the inputs and output of each fill, so that real
+desktops can be replayed offline through any engine (see replay).
+
+The trace file starts with MAGIC, followed by records that are each a
+little-endian uint32 length and then:
+
+    RECORD_HEADER   time, cursor, work area, desktop size, result (zeros
+                    and has_result 0 if None), fill time in microseconds,
+                    length of the engine name and number of windows
+    engine name     ASCII
+    rectangles      4 int32 per window
+
+Recording is off until start() is called, and record() returns at once
+while it is off. Records are appended, so a trace may span several runs.
+'''
+
+import collections
+import logging
+import struct
+import threading
+
+logging = logging.getLogger(__name__)
+
+MAGIC = b'WFTRACE1'
+LENGTH = struct.Struct('<I')
+RECORD_HEADER = struct.Struct('<d2i4i2iB4iIBI')
+RECT = struct.Struct('<4i')
+
+TraceRecord = collections.namedtuple(
+    'TraceRecord', 'time position work_area desktop_size result fill_time '
+                   'engine rects')
+
+_lock = threading.Lock()
+_file = None
+
+
+class TraceError(Exception):
+    pass
+
+
+def start(filename):
+    """Append a record of every fill to filename"""
+    global _file
+    stop()
+    f = open(filename, 'ab')
+    if f.tell() == 0:
+        f.write(MAGIC)
+    with _lock:
+        _file = f
+    logging.debug("Recording fills to {}".format(filename))
+
+def stop():
+    global _file
+    with _lock:
+        f, _file = _file, None
+    if f is not None:
+        f.close()
+
+def is_recording():
+    return _file is not None
+
+
+def encode(record):
+    """Return the bytes of a TraceRecord, without the length prefix"""
+    engine = record.engine.encode('ascii')
+    result = record.result
+    header = RECORD_HEADER.pack(
+        record.time, *record.position, *record.work_area,
+        *record.desktop_size, result is not None, *(result or (0, 0, 0, 0)),
+        int(record.fill_time * 1e6), len(engine), len(record.rects))
+    return b''.join([header, engine] + [RECT.pack(*rect)
+                                         for rect in record.rects])
+
+def decode(data):
+    """Return the TraceRecord of bytes produced by encode()"""
+    fields = RECORD_HEADER.unpack_from(data)
+    time, position = fields[0], fields[1:3]
+    work_area, desktop_size = fields[3:7], fields[7:9]
+    result = fields[10:14] if fields[9] else None
+    fill_time, engine_length, count = fields[14] / 1e6, fields[15], fields[16]
+
+    offset = RECORD_HEADER.size
+    engine = data[offset:offset + engine_length].decode('ascii')
+    offset += engine_length
+    if len(data) != offset + count * RECT.size:
+        raise TraceError("Record of {} bytes does not hold {} windows".format(
+                         len(data), count))
+    rects = [RECT.unpack_from(data, offset + i * RECT.size)
+             for i in range(count)]
+    return TraceRecord(time, position, work_area, desktop_size, result,
+                       fill_time, engine, rects)
+
+
+def record(trace_record):
+    """Append a TraceRecord to the trace, if recording"""
+    if _file is None:
+        return
+    data = encode(trace_record)
+    with _lock:
+        if _file is not None:
+            _file.write(LENGTH.pack(len(data)) + data)
+            _file.flush()
+
+
+def read_trace(filename):
+    """Yield the TraceRecords of a trace file
+
+    A record cut short (eg. by a crash while writing) ends the trace."""
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise TraceError("{} is not a fill trace".format(filename))
+        while True:
+            prefix = f.read(LENGTH.size)
+            if len(prefix) < LENGTH.size:
+                return
+            length, = LENGTH.unpack(prefix)
+            data = f.read(length)
+            if len(data) < length:
+                logging.warning("Trace {} ends with a partial record".format(
+                                filename))
+                return
+            yield decode(data)
@@ -0,0 +1,253 @@
+'''
+Provides: FreeSpaceMap, the maximal empty rectangles between windows
+
+The map lists every maximal empty rectangle (one that cannot grow in any
+direction without covering part of a window) within an area, and remembers
+for each cell of the grid formed by the window edges the largest of them
+containing it. Finding the free rectangle at the cursor is then two bisects.
+
+A window covers the points strictly inside it, as in windowinfo.is_empty, so
+a free rectangle may share its edges with windows. Windows less than two
+pixels wide or high cover no points and are ignored.
+
+When a single window moves, update() only recomputes the rows of the grid at
+and below the change. The grid keeps the lines of old positions, so the map
+is rebuilt once they outnumber the edges still in use. A map may be updated on one thread while it is read on
+another (see WindowCache.free_map).
+'''
+
+import bisect
+import threading
+
+
+def _area(rect):
+    return (rect[2] - rect[0]) * (rect[3] - rect[1])
+
+
+class FreeSpaceMap:
+    def __init__(self, windows, area):
+        '''Map the free space between windows within area
+
+        Area is (width, height) or (left, top, right, bottom), like the
+        desktop_size of fill_space.'''
+        if len(area) == 2:
+            area = (0, 0, area[0], area[1])
+        self.area = tuple(area)
+        self._lock = threading.Lock() #Held by update() and the lookups
+        self._obstacles = []
+        for win in windows:
+            rect = self._clip((win.left, win.top, win.right, win.bottom))
+            if rect is not None:
+                self._obstacles.append(rect)
+        self._build()
+
+    def _clip(self, rect):
+        '''Return rect clipped to the area, or None if it covers none of it'''
+        left, top, right, bottom = rect
+        if right - left < 2 or bottom - top < 2:
+            return None
+        left, top = max(left, self.area[0]), max(top, self.area[1])
+        right, bottom = min(right, self.area[2]), min(bottom, self.area[3])
+        if left >= right or top >= bottom:
+            return None
+        return (left, top, right, bottom)
+
+    def _build(self):
+        area = self.area
+        self.xs = sorted({area[0], area[2]} |
+                         {r[0] for r in self._obstacles} |
+                         {r[2] for r in self._obstacles})
+        self.ys = sorted({area[1], area[3]} |
+                         {r[1] for r in self._obstacles} |
+                         {r[3] for r in self._obstacles})
+        columns, rows = len(self.xs) - 1, len(self.ys) - 1
+        self._blocked = [[0] * columns for _ in range(rows)]
+        for rect in self._obstacles:
+            self._cover(rect, 1)
+        self._heights = []
+        self.rectangles = []
+        self._enumerate(0)
+        self._paint()
+
+    def _cells(self, rect):
+        '''Return the column and row index ranges of the cells inside rect'''
+        return (range(bisect.bisect_left(self.xs, rect[0]),
+                      bisect.bisect_left(self.xs, rect[2])),
+                range(bisect.bisect_left(self.ys, rect[1]),
+                      bisect.bisect_left(self.ys, rect[3])))
+
+    def _cover(self, rect, change):
+        '''Add change to the number of windows covering the cells of rect'''
+        columns, rows = self._cells(rect)
+        for row in rows:
+            blocked = self._blocked[row]
+            for column in columns:
+                blocked[column] += change
+
+    def _enumerate(self, first_row):
+        '''Find the maximal empty rectangles whose bottom row is first_row or
+        below, given the heights of the rows above it'''
+        xs, ys = self.xs, self.ys
+        columns = len(xs) - 1
+        del self._heights[first_row:]
+        previous = self._heights[-1] if self._heights else [0] * columns
+
+        for row in range(first_row, len(ys) - 1):
+            blocked = self._blocked[row]
+            heights = [0 if blocked[i] else previous[i] + 1
+                       for i in range(columns)]
+            self._heights.append(heights)
+            below = self._blocked[row + 1] if row + 1 < len(ys) - 1 else None
+
+            #Rectangles bounded by the histogram of empty cells above row
+            stack = [] #[(first column, height), ...] by increasing height
+            for i, height in enumerate(heights + [0]):
+                start = i
+                while stack and stack[-1][1] >= height:
+                    start, top_height = stack.pop()
+                    if top_height > height and (
+                            below is None or any(below[start:i])):
+                        #Cannot grow sideways, up (by height) or down
+                        self.rectangles.append(
+                            (xs[start], ys[row + 1 - top_height],
+                             xs[i], ys[row + 1]))
+                if height:
+                    stack.append((start, height))
+            previous = heights
+
+    def _paint(self):
+        '''Record the largest rectangle containing each empty cell'''
+        xs, ys = self.xs, self.ys
+        columns, rows = len(xs) - 1, len(ys) - 1
+        self._best = [[None] * columns for _ in range(rows)]
+        #next_free[row][i] is the first column >= i not painted yet
+        next_free = [list(range(columns + 1)) for _ in range(rows)]
+
+        def find(skip, i):
+            root = i
+            while skip[root] != root:
+                root = skip[root]
+            while skip[i] != root:
+                skip[i], i = root, skip[i]
+            return root
+
+        order = sorted(range(len(self.rectangles)),
+                       key=lambda n: -_area(self.rectangles[n]))
+        for n in order:
+            column_range, row_range = self._cells(self.rectangles[n])
+            for row in row_range:
+                skip, best = next_free[row], self._best[row]
+                column = find(skip, column_range.start)
+                while column < column_range.stop:
+                    best[column] = n
+                    skip[column] = column + 1
+                    column = find(skip, column + 1)
+
+    def _cells_at(self, position):
+        '''Return the (column, row) of the cells whose closure has position'''
+        x, y = position
+        area = self.area
+        if not (area[0] <= x <= area[2] and area[1] <= y <= area[3]):
+            return []
+        columns = self._around(self.xs, x)
+        rows = self._around(self.ys, y)
+        return [(column, row) for column in columns for row in rows]
+
+    @staticmethod
+    def _around(lines, value):
+        '''Return the indexes of the intervals between lines touching value'''
+        i = bisect.bisect_right(lines, value) - 1
+        indexes = [i] if i < len(lines) - 1 else []
+        if lines[i] == value and i > 0:
+            indexes.append(i - 1)
+        return indexes
+
+    def rectangle_at(self, position):
+        '''Return the largest free rectangle containing position, or None
+
+        This may differ from fill_space, which grows across then down.'''
+        best = None
+        with self._lock:
+            for column, row in self._cells_at(position):
+                n = self._best[row][column]
+                if n is not None and (best is None or
+                                      _area(self.rectangles[n]) >
+                                      _area(self.rectangles[best])):
+                    best = n
+            return None if best is None else self.rectangles[best]
+
+    def rectangles_at(self, position):
+        '''Return all maximal free rectangles containing position'''
+        x, y = position
+        with self._lock:
+            return [rect for rect in self.rectangles
+                    if rect[0] <= x <= rect[2] and rect[1] <= y <= rect[3]]
+
+    def update(self, old_rect=None, new_rect=None):
+        '''Update the map after a window moved from old_rect to new_rect
+
+        Either may be None for a window that appeared or disappeared.'''
+        with self._lock:
+            self._update(old_rect, new_rect)
+
+    def _update(self, old_rect, new_rect):
+        old = self._clip(old_rect) if old_rect is not None else None
+        new = self._clip(new_rect) if new_rect is not None else None
+        if old == new:
+            return
+        if old is not None:
+            self._obstacles.remove(old)
+        if new is not None:
+            self._obstacles.append(new)
+        if len(self.xs) + len(self.ys) > 2 * self._edge_count():
+            #Every row and column of the grid costs time in each update
+            self._build()
+            return
+        if new is not None:
+            self._split(self.xs, new[0], new[2], self._split_column)
+            self._split(self.ys, new[1], new[3], self._split_row)
+
+        changed = [rect for rect in (old, new) if rect is not None]
+        if old is not None:
+            self._cover(old, -1)
+        if new is not None:
+            self._cover(new, 1)
+
+        #Rows above the change keep their heights and rectangles, except that
+        #the row just above may now be able to grow down
+        first_row = bisect.bisect_left(self.ys, min(r[1] for r in changed))
+        first_row = max(0, first_row - 1)
+        keep_above = self.ys[first_row]
+        self.rectangles = [rect for rect in self.rectangles
+                           if rect[3] <= keep_above]
+        self._enumerate(first_row)
+        self._paint()
+
+    def _edge_count(self):
+        '''Return the number of grid lines a rebuilt map would have'''
+        area = self.area
+        xs = {area[0], area[2]}
+        ys = {area[1], area[3]}
+        for left, top, right, bottom in self._obstacles:
+            xs.update((left, right))
+            ys.update((top, bottom))
+        return len(xs) + len(ys)
+
+    def _split(self, lines, low, high, split):
+        for value in (low, high):
+            i = bisect.bisect_left(lines, value)
+            if lines[i] != value:
+                #Divide the interval i-1 into two identical ones
+                lines.insert(i, value)
+                split(i - 1)
+
+    def _split_column(self, column):
+        for blocked in self._blocked:
+            blocked.insert(column, blocked[column])
+        for heights in self._heights:
+            heights.insert(column, heights[column])
+
+    def _split_row(self, row):
+        self._blocked.insert(row, list(self._blocked[row]))
+        #Heights from this row down are recomputed by update()
+        del self._heights[row:]
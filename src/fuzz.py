@@ -0,0 +1,220 @@
+'''
+Check the fill engines against each other on random window layouts
+
+Layouts are small and dense, with shared edges, thin windows and windows
+reaching out of the area, so the awkward cases come up often:
+
+    python fuzz.py --iterations 2000 --seed 0
+
+Every fill must contain the cursor, lie within the area, cover no window and
+be unable to grow (be maximal). The exact fill is the reference: the numpy
+engine, fill_space_many, FillCache, WindowArray and RectArray must return
+exactly its result. The legacy fill only probes some rows, so only its span
+along the cursor row must agree. The fill candidates must each be empty and
+maximal, and the largest no smaller than any other (the free space map
+behind the largest and aspect candidates has none where only a line is
+free).
+'''
+
+import argparse
+import logging
+import random
+import sys
+
+import candidates
+import occupancy
+import windowinfo
+from fillcache import FillCache
+
+#Coordinates are drawn from a coarse grid so that edges often coincide
+GRID = 8
+
+
+def random_area(rng):
+    """Return a small area (left, top, right, bottom), maybe off the origin"""
+    left, top = (rng.choice((0, rng.randrange(-200, 200))) for _ in 'xy')
+    return (left, top, left + rng.randrange(20, 240),
+            top + rng.randrange(20, 180))
+
+
+def random_layout(rng, area, count):
+    """Return count dummy windows in and around area"""
+    left, top, right, bottom = area
+    def coordinate(low, high):
+        if rng.random() < 0.7:
+            return low + rng.randrange(-2, (high - low) // GRID + 3) * GRID
+        return rng.randrange(low - 20, high + 20)
+    windows = []
+    for i in range(count):
+        x1, x2 = sorted((coordinate(left, right), coordinate(left, right)))
+        y1, y2 = sorted((coordinate(top, bottom), coordinate(top, bottom)))
+        if rng.random() < 0.1:
+            #Thin windows, which cover no points
+            x2 = x1 + rng.randrange(0, 2)
+        windows.append(windowinfo.Window.create_dummy(
+            str(i), (x1, y1, max(x1, x2), y2)))
+    return windows
+
+
+def random_points(rng, windows, area, count):
+    """Return count points, many on window and area edges"""
+    left, top, right, bottom = area
+    xs = [left, right] + [win.left for win in windows] + [
+        win.right for win in windows]
+    ys = [top, bottom] + [win.top for win in windows] + [
+        win.bottom for win in windows]
+    points = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            points.append((rng.choice(xs) + rng.randrange(-1, 2),
+                           rng.choice(ys) + rng.randrange(-1, 2)))
+        else:
+            points.append((rng.randrange(left - 5, right + 6),
+                           rng.randrange(top - 5, bottom + 6)))
+    return points
+
+
+def is_rect_empty(windows, rect):
+    """Return whether no window covers any point of the inclusive rect"""
+    return not any(max(win.left + 1, rect[0]) <= min(win.right - 1, rect[2]) and
+                   max(win.top + 1, rect[1]) <= min(win.bottom - 1, rect[3])
+                   for win in windows)
+
+
+def _area(rect):
+    return (rect[2] - rect[0]) * (rect[3] - rect[1])
+
+
+def check_rect(windows, area, position, rect):
+    """Return what is wrong with a fill rect at position, [] if nothing"""
+    x, y = position
+    left, top, right, bottom = rect
+    problems = []
+    if not (left <= x <= right and top <= y <= bottom):
+        problems.append("does not contain the position")
+    if not (area[0] <= left and area[1] <= top and right <= area[2] and
+            bottom <= area[3]):
+        problems.append("is not within the area")
+    if not is_rect_empty(windows, rect):
+        problems.append("covers a window")
+    #Maximal: one more pixel on any side reaches a window or leaves the area
+    grown = [(left - 1, top, right, bottom, left == area[0]),
+             (left, top - 1, right, bottom, top == area[1]),
+             (left, top, right + 1, bottom, right == area[2]),
+             (left, top, right, bottom + 1, bottom == area[3])]
+    for side, (l, t, r, b, at_edge) in zip('left top right bottom'.split(),
+                                           grown):
+        if not at_edge and is_rect_empty(windows, (l, t, r, b)):
+            problems.append("can grow to the {}".format(side))
+    return problems
+
+
+def check(windows, area, position):
+    """Return the problems found with every fill at position"""
+    problems = []
+    def report(name, message):
+        problems.append("{}: {}".format(name, message))
+
+    reference = windowinfo.fill_space_exact(windows, area, position)
+    if (reference is None) == windowinfo.is_empty(windows, position):
+        report('exact', "result {} does not match emptiness".format(
+               reference))
+    inside = (area[0] <= position[0] <= area[2] and
+              area[1] <= position[1] <= area[3])
+    if reference is not None and inside:
+        for problem in check_rect(windows, area, position, reference):
+            report('exact', "{} {}".format(reference, problem))
+
+    same = {
+        'numpy': windowinfo.fill_space_numpy(windows, area, position),
+        'fill_space_many': windowinfo.fill_space_many(windows, area,
+                                                      [position])[0],
+        'FillCache': FillCache().fill(windows, area, position),
+        'WindowArray': windowinfo.fill_space_exact(
+            windowinfo.WindowArray.from_windows(windows), area, position),
+    }
+    if occupancy.HAVE_NUMPY:
+        same['RectArray'] = occupancy.RectArray(
+            [win.position for win in windows]).fill(area, position)
+    for name, result in same.items():
+        if result != reference:
+            report(name, "{} differs from exact {}".format(result, reference))
+
+    legacy = windowinfo.fill_space_legacy(windows, area, position)
+    if (legacy is None) != (reference is None):
+        report('legacy', "{} differs from exact {}".format(legacy, reference))
+    elif legacy is not None and inside:
+        if (legacy[0], legacy[2]) != (reference[0], reference[2]):
+            report('legacy', "span {} differs from exact {}".format(
+                   legacy, reference))
+        if not area[1] <= legacy[1] <= position[1] <= legacy[3] <= area[3]:
+            report('legacy', "{} is not within the area".format(legacy))
+
+    if inside:
+        found = candidates.fill_candidates(
+            windows, area, position, (40, 30),
+            candidates.DEFAULT_POLICY._replace(budget=None))
+        #The free space map only holds rectangles of positive area
+        flat = all(rect is None or _area(rect) == 0 for rect in found.values())
+        for name, rect in found.items():
+            if rect is None:
+                if reference is not None and not (
+                        flat and name in ('largest', 'aspect')):
+                    report(name, "None differs from exact {}".format(
+                           reference))
+            elif reference is None:
+                report(name, "{} but the position is covered".format(rect))
+            else:
+                for problem in check_rect(windows, area, position, rect):
+                    report(name, "{} {}".format(rect, problem))
+        largest = found.get('largest')
+        if largest is not None:
+            for name, rect in found.items():
+                if rect is not None and _area(rect) > _area(largest):
+                    report('largest', "{} is smaller than {} {}".format(
+                           largest, name, rect))
+    return problems
+
+
+def fuzz(iterations, seed=0, points=20, max_windows=12):
+    """Return [(iteration, area, rects, position, problems), ...]
+
+    Each iteration is a new layout, reproducible from seed and iteration."""
+    failures = []
+    for iteration in range(iterations):
+        rng = random.Random('{}/{}'.format(seed, iteration))
+        area = random_area(rng)
+        windows = random_layout(rng, area, rng.randrange(0, max_windows + 1))
+        for position in random_points(rng, windows, area, points):
+            problems = check(windows, area, position)
+            if problems:
+                failures.append((iteration, area,
+                                 [win.position for win in windows],
+                                 position, problems))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=500,
+                        help='random layouts to check')
+    parser.add_argument('--points', type=int, default=20,
+                        help='cursor positions checked per layout')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    #Positions inside a window make the fill warn, which is expected here
+    logging.disable(logging.WARNING)
+
+    failures = fuzz(args.iterations, args.seed, args.points)
+    for iteration, area, rects, position, problems in failures[:20]:
+        print('iteration {}: area {} position {}'.format(iteration, area,
+                                                         position))
+        print('    windows {}'.format(rects))
+        for problem in problems:
+            print('    {}'.format(problem))
+    print('{} failures in {} layouts'.format(len(failures), args.iterations))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,21 +13,24 @@ Message structure & Hotkey Message
     https://msdn.microsoft.com/en-us/library/windows/desktop/ms646279%28v=vs.85%29.aspx
 """
 
-import ctypes  # @UnusedImport
-import ctypes.wintypes
+import collections
+import itertools
 import string
+import threading
 import logging
 
-logging = logging.getLogger(__name__)
+from backend import get_backend
 
-_RegisterHotKey = ctypes.windll.user32.RegisterHotKey
-_UnregisterHotKey = ctypes.windll.user32.UnregisterHotKey
-_GetMessage = ctypes.windll.user32.GetMessageW
+logging = logging.getLogger(__name__)
 
 #Mouse events are not supported with _RegisterHotKey
 KEY_MAP = { letter: 0x41+i for i, letter in enumerate(string.ascii_uppercase) }
 
-_registered_hotkeys = [] #[(HID, Hotkey tuple, function), ...]
+#Most distinct hotkeys waiting for their handler before presses are dropped
+DEFAULT_QUEUE_SIZE = 8
+
+_registered_hotkeys = {} #{HID: (Hotkey tuple, function), ...}
+_next_hid = itertools.count() #HIDs are never reused
 
 
 class HotkeyException(Exception):
@@ -37,6 +40,65 @@ class FailedToRegisterHotkey(HotkeyException):
     pass
 
 
+class HandlerQueue:
+    """Run hotkey handlers in order on a worker thread
+    
+    A press of a hotkey whose handler is still waiting to run is merged into
+    the waiting one (with the newer cursor position), so bursts of presses do
+    not pile up. At most maxsize handlers wait, further presses are dropped."""
+    
+    def __init__(self, maxsize=DEFAULT_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self._pending = collections.OrderedDict() #{HID: (function, x, y)}
+        self._running = False
+        self._condition = threading.Condition()
+        self._thread = None
+    
+    def submit(self, hid, func, x, y):
+        """Return whether the handler is waiting to run (False if dropped)"""
+        with self._condition:
+            if hid in self._pending:
+                self._pending[hid] = (func, x, y)
+                logging.debug('Hotkey press coalesced, hid: {}'.format(hid))
+                return True
+            if len(self._pending) >= self.maxsize:
+                logging.warning('Hotkey queue full, press dropped, hid: '
+                                '{}'.format(hid))
+                return False
+            self._pending[hid] = (func, x, y)
+            self._condition.notify_all()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='hotkey-handlers',
+                                                daemon=True)
+                self._thread.start()
+            return True
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                self._running = False
+                self._condition.notify_all()
+                while not self._pending:
+                    self._condition.wait()
+                hid, (func, x, y) = self._pending.popitem(last=False)
+                self._running = True
+            try:
+                func(x, y)
+            except Exception as e:
+                logging.critical('Hotkey handler failed (hid {}): {}'.format(
+                                 hid, e))
+    
+    def join(self, timeout=None):
+        """Return whether every waiting handler has finished running"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and not self._running, timeout)
+
+
+_handlers = HandlerQueue()
+
+
 def get_total_registrations():
     """Return number of registered hotkeys"""
     return len(_registered_hotkeys)
@@ -46,7 +108,8 @@ def register_hotkey(keys, func):
     """Return the HID (identifier) of the newly registered hotkey
     
     By registering func(x, y) with keys, the function will be called with the
-    mouse cursor position (x, y) at the time the keys are pressed.
+    mouse cursor position (x, y) at the time the keys are pressed. It is called
+    on a worker thread (see HandlerQueue), not on the thread that registered it.
     
     eg. register_hotkey(("MOD_CONTROL", "MOD_SHIFT", "Q"), lambda x, y: print())
     The keys must be a single key in KEY_MAP and optional modifiers.
@@ -73,15 +136,15 @@ def register_hotkey(keys, func):
         raise FailedToRegisterHotkey("Invalid hotkey {}".format(keys))
     key = processed_keys[0].upper()
     
-    hid = len(_registered_hotkeys)
-    new_reg = (hid, tuple(sorted(keys)), func)
+    hid = next(_next_hid)
+    new_reg = (tuple(sorted(keys)), func)
     
-    if _RegisterHotKey(None, hid, modifiers, KEY_MAP[key]):
-        logging.debug('Hotkey registered: {}'.format(new_reg))
-        _registered_hotkeys.append(new_reg)
+    if get_backend().register_hotkey(hid, modifiers, KEY_MAP[key]):
+        logging.debug('Hotkey registered: {} {}'.format(hid, new_reg))
+        _registered_hotkeys[hid] = new_reg
         return hid
     else:
-        msg = 'Hotkey failed to register: {}'.format(new_reg)
+        msg = 'Hotkey failed to register: {} {}'.format(hid, new_reg)
         logging.warning(msg)
         raise FailedToRegisterHotkey(msg)
     
@@ -97,54 +160,67 @@ def unregister_hotkey(hid=None, keys=None, func=None):
     if keys is not None:
         keys = tuple(sorted(keys))
     
-    def registered(hotkey):
-        """Return if hotkey was NOT removed"""
-        stored_hid, stored_keys, stored_func = hotkey
-        if((hid is not None and stored_hid == hid) or
-           (keys is not None and stored_keys == keys) or
-           (func is not None and stored_func == func)):
-            if _UnregisterHotKey(None, stored_hid):
-                logging.debug('Hotkey unregistered: {}'.format(*hotkey))
-                return False
-            else:
-                logging.error('Failed to registered hotkey: {}'.format(*hotkey))
-        
-        return True
-        
+    if keys is None and func is None:
+        matches = [hid] if hid in _registered_hotkeys else []
+    else:
+        matches = [stored_hid for stored_hid, (stored_keys, stored_func)
+                   in _registered_hotkeys.items()
+                   if stored_hid == hid or
+                   (keys is not None and stored_keys == keys) or
+                   (func is not None and stored_func == func)]
+    
+    removed = 0
+    for stored_hid in matches:
+        if get_backend().unregister_hotkey(stored_hid):
+            logging.debug('Hotkey unregistered: {}'.format(stored_hid))
+            del _registered_hotkeys[stored_hid]
+            removed += 1
+        else:
+            logging.error('Failed to unregister hotkey: {}'.format(stored_hid))
     
-    global _registered_hotkeys
-    original_length = len(_registered_hotkeys)
-    _registered_hotkeys = [hk for hk in _registered_hotkeys if registered(hk)]
+    return removed
+    
+
+def replace_hotkey(hid, keys, func):
+    """Return the HID of keys newly registered for func in place of hid
     
-    return original_length - len(_registered_hotkeys)
+    The new hotkey is registered before the old one is unregistered, so one
+    of them is always active. If the new one cannot be registered, the old
+    one is kept and FailedToRegisterHotkey is raised."""
+    
+    new_hid = register_hotkey(keys, func)
+    if not unregister_hotkey(hid=hid):
+        logging.warning('Replaced hotkey was not registered: {}'.format(hid))
+    return new_hid
     
 
 def unregister_all_hotkeys():
     """Return if all hotkeys were successfully unregistered"""
     
-    def registered(hotkey):
-        """Return if hotkey was NOT removed"""
-        stored_hid, stored_keys, stored_func = hotkey  # @UnusedVariable
-        if _UnregisterHotKey(None, stored_hid):
-            logging.debug('Hotkey unregistered: {}'.format(*hotkey))
-            return False
-        else:
-            return True
-    
-    global _registered_hotkeys
-    _registered_hotkeys = [hk for hk in _registered_hotkeys if registered(hk)]
+    for hid in list(_registered_hotkeys):
+        unregister_hotkey(hid=hid)
     
-    if len(_registered_hotkeys):
-        return False
-    else:
-        return True
+    return not _registered_hotkeys
+
+
+def wait_for_handlers(timeout=None):
+    """Return whether all hotkey handlers that were triggered have finished"""
+    return _handlers.join(timeout)
 
 
 #TODO: Exceptions for process_next_message function
 def process_next_message():
-    """Return if next message was processed successfully (waits for message)"""
-    msg = ctypes.wintypes.MSG()
-    success = _GetMessage(ctypes.pointer(msg), None, 0, 0) # Waiting here
+    """Return if next message was processed successfully (waits for message)
+    
+    The hotkey's function is queued to run on the handler thread."""
+    return handle_message(get_backend().get_message()) # Waiting here
+
+
+def handle_message(message):
+    """Return if a message from the backend was processed successfully
+    
+    Message is (status, hid, (x, y)), see get_message and eventloop."""
+    success, msg_hid, (x, y) = message
     
     if success <= 0:
         if success == 0:
@@ -153,11 +229,11 @@ def process_next_message():
             logging.error("Windows fatal message.")
         return success
     
-    for hid, keys, func in _registered_hotkeys:  # @UnusedVariable
-        if hid == msg.wParam:
-            func(msg.pt.x, msg.pt.y)
-            return True
-    else:
+    try:
+        keys, func = _registered_hotkeys[msg_hid]  # @UnusedVariable
+    except KeyError:
         logging.warn('No hotkey registered for windows message, hid: {}'.format(
-                     msg.wParam))
+                     msg_hid))
         return False
+    
+    return _handlers.submit(msg_hid, func, x, y)
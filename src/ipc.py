@@ -0,0 +1,191 @@
+'''
+Provides: CommandServer, send_command()
+
+A local command channel to the run_with_console daemon, so that scripts and
+launchers (see run_once) can trigger a fill without importing and setting up
+the fill themselves. It is a named pipe on Windows and a Unix-domain socket
+elsewhere, in a directory of the user's (XDG_RUNTIME_DIR or else the home
+directory) and only accessible to them.
+
+Messages are JSON: the request is {"command": name, "args": {...}} and the
+reply is {"ok": true, "result": ...} or {"ok": false, "error": message}.
+This module only imports the standard library, and what only the server
+needs is imported by it, to keep the client fast.
+'''
+
+import json
+import logging
+import os
+import sys
+import threading
+from multiprocessing.connection import Client, Listener, address_type
+
+logging = logging.getLogger(__name__)
+
+
+class IPCException(Exception):
+    pass
+
+class DaemonNotRunning(IPCException):
+    pass
+
+class CommandFailed(IPCException):
+    pass
+
+
+def get_address():
+    """Return (address, family) of the daemon's command channel"""
+    if sys.platform == 'win32':
+        user = os.getenv('USERNAME', 'user')
+        return r'\\.\pipe\WindowFill-{}'.format(user), 'AF_PIPE'
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'window-fill.sock'), 'AF_UNIX'
+    return os.path.expanduser('~/.window-fill.sock'), 'AF_UNIX'
+
+
+def send_command(command, timeout=5, address=None, **args):
+    """Return the result of running command in the daemon
+
+    Raises DaemonNotRunning if there is no daemon to connect to."""
+    if address is None:
+        address, family = get_address()
+    else:
+        family = address_type(address)
+    try:
+        connection = Client(address, family)
+    except OSError as e:
+        #Eg. the socket does not exist or nothing is listening on it
+        raise DaemonNotRunning(str(e))
+
+    with connection:
+        connection.send_bytes(json.dumps({'command': command,
+                                          'args': args}).encode())
+        if not connection.poll(timeout):
+            raise CommandFailed("No reply to {} within {}s".format(command,
+                                                                   timeout))
+        reply = json.loads(connection.recv_bytes().decode())
+
+    if not reply['ok']:
+        raise CommandFailed(reply['error'])
+    return reply['result']
+
+
+class CommandServer:
+    """Serve commands on a background thread, one connection at a time
+
+    Commands is {name: function(**args)}, and the function's return value
+    (which must be JSON serialisable) is sent back to the client. With a
+    scheduler, eg. an EventLoop, the functions run on it (through its
+    submit) rather than on the server's thread."""
+
+    def __init__(self, commands, address=None, scheduler=None):
+        self.commands = commands
+        self.scheduler = scheduler
+        if address is None:
+            self.address, self.family = get_address()
+        else:
+            self.address, self.family = address, address_type(address)
+        self._listener = None
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        """Start listening, raises IPCException if it is not possible"""
+        try:
+            if self.family == 'AF_UNIX':
+                self._remove_stale_socket()
+                #Only the user may connect
+                umask = os.umask(0o077)
+                try:
+                    self._listener = Listener(self.address, self.family)
+                finally:
+                    os.umask(umask)
+            else:
+                self._listener = Listener(self.address, self.family)
+        except OSError as e:
+            raise IPCException("Unable to listen on {}: {}".format(
+                               self.address, e))
+
+        self._stopping = False
+        self._thread = threading.Thread(target=self._serve, name='ipc-server',
+                                        daemon=True)
+        self._thread.start()
+        logging.debug("Listening for commands on {}".format(self.address))
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.address):
+            return
+        try:
+            send_command('ping', address=self.address)
+        except DaemonNotRunning:
+            os.remove(self.address) #Left over from a crashed daemon
+        else:
+            raise IPCException("A daemon is already listening on "
+                               "{}".format(self.address))
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping = True
+        try:
+            #Wake the listener up
+            Client(self.address, self.family).close()
+        except OSError:
+            pass
+        self._thread.join()
+        self._thread = None
+        self._listener.close()
+
+    def _serve(self):
+        while True:
+            try:
+                connection = self._listener.accept()
+            except OSError as e:
+                logging.error("Command channel failed: {}".format(e))
+                return
+            if self._stopping:
+                connection.close()
+                return
+            with connection:
+                try:
+                    self._handle(connection)
+                except (EOFError, OSError) as e:
+                    logging.debug("Command connection lost: {}".format(e))
+
+    def _handle(self, connection):
+        try:
+            request = json.loads(connection.recv_bytes().decode())
+            command, args = request['command'], request.get('args', {})
+        except (ValueError, KeyError, TypeError) as e:
+            reply = {'ok': False, 'error': "Invalid request: {}".format(e)}
+        else:
+            reply = self._dispatch(command, args)
+        connection.send_bytes(json.dumps(reply).encode())
+
+    def _dispatch(self, command, args):
+        if self.scheduler is None:
+            return self.run(command, args)
+        from concurrent.futures import CancelledError
+        try:
+            return self.scheduler.submit(self.run, command, args).result()
+        except (RuntimeError, CancelledError):
+            return {'ok': False,
+                    'error': "Not run, the daemon is stopping: {}".format(
+                             command)}
+
+    def run(self, command, args):
+        """Return the reply to a command"""
+        if command == 'ping':
+            return {'ok': True, 'result': 'pong'}
+        try:
+            func = self.commands[command]
+        except KeyError:
+            return {'ok': False, 'error': "Unknown command: {}".format(command)}
+
+        logging.debug("Command received: {} {}".format(command, args))
+        try:
+            return {'ok': True, 'result': func(**args)}
+        except Exception as e:
+            logging.error("Command {} failed: {}".format(command, e))
+            return {'ok': False, 'error': str(e)}
@@ -0,0 +1,183 @@
+'''
+Provides: phase(), enable(), disable(), get_percentiles(), dump()
+
+Latency of the phases of a fill (eg. reading the cursor or moving the window)
+is recorded in rolling histograms, which can be dumped as JSON percentiles.
+
+    with metrics.phase('move'):
+        fore.move_window(new_size)
+
+Timing is off until enable() is called, and while it is off phase() costs
+little more than the function call.
+'''
+
+import collections
+import json
+import threading
+import time
+
+#Each power of two is split into 2**SUB_BUCKET_BITS linear buckets, so a
+#recorded value is within about 1/16th (6%) of the true value
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+#Histograms cover the last one to two windows of this many seconds
+DEFAULT_WINDOW = 300
+PERCENTILES = (50, 90, 99, 99.9)
+
+_enabled = False
+_lock = threading.Lock()
+_histograms = {} #{phase name: RollingHistogram}
+
+
+def _bucket(value):
+    """Return the bucket index of a non-negative integer value"""
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+def _bucket_high(index):
+    """Return the highest value in bucket index"""
+    if index < SUB_BUCKETS:
+        return index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    return ((index - (shift << SUB_BUCKET_BITS) + 1) << shift) - 1
+
+
+class Histogram:
+    """Log-linear (HDR-style) histogram of integer values"""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.count = 0
+        self.max = 0
+
+    def record(self, value):
+        self.counts[_bucket(value)] += 1
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile):
+        """Return the value below which percentile % of the values lie"""
+        if not self.count:
+            return 0
+        target = max(1, -int(-percentile * self.count // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(_bucket_high(index), self.max)
+        return self.max
+
+
+class RollingHistogram:
+    """Histogram of the values recorded in the last one to two windows"""
+
+    def __init__(self, window=DEFAULT_WINDOW, clock=time.monotonic):
+        self.window = window
+        self._clock = clock
+        self._started = clock()
+        self._current = Histogram()
+        self._previous = Histogram()
+
+    def record(self, value):
+        now = self._clock()
+        if now - self._started >= self.window:
+            if now - self._started >= self.window * 2:
+                self._previous = Histogram()
+            else:
+                self._previous = self._current
+            self._current = Histogram()
+            self._started = now
+        self._current.record(value)
+
+    def snapshot(self):
+        """Return a Histogram of the recent values"""
+        histogram = Histogram()
+        histogram.merge(self._previous)
+        histogram.merge(self._current)
+        return histogram
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def phase(name):
+    """Return a context manager recording how long its body takes as name"""
+    if not _enabled:
+        return _NULL_PHASE
+    return _Phase(name)
+
+def record(name, seconds):
+    """Record a duration (in seconds) of phase name"""
+    with _lock:
+        try:
+            histogram = _histograms[name]
+        except KeyError:
+            histogram = _histograms[name] = RollingHistogram()
+        histogram.record(int(seconds * 1e6))
+
+def reset():
+    """Forget all recorded durations"""
+    with _lock:
+        _histograms.clear()
+
+def get_percentiles():
+    """Return {phase: {'p50': microseconds, ..., 'max': .., 'count': ..}}"""
+    with _lock:
+        snapshots = {name: histogram.snapshot()
+                     for name, histogram in _histograms.items()}
+    percentiles = {}
+    for name, histogram in snapshots.items():
+        summary = {'p{:g}'.format(p): histogram.percentile(p)
+                   for p in PERCENTILES}
+        summary['max'] = histogram.max
+        summary['count'] = histogram.count
+        percentiles[name] = summary
+    return percentiles
+
+def dump(filename):
+    """Write get_percentiles() to a JSON file and return it"""
+    percentiles = get_percentiles()
+    with open(filename, 'w') as f:
+        json.dump(percentiles, f, indent=1, sort_keys=True)
+    return percentiles
@@ -0,0 +1,80 @@
+'''
+Provides: get_monitors(), get_monitor_at(), watch(), invalidate()
+
+The monitor topology (bounds and work area of every monitor) is read from the
+backend once and kept until it is invalidated, either by a display or work
+area change notification (see watch) or explicitly.
+'''
+
+import collections
+import logging
+import threading
+
+from backend import get_backend
+
+logging = logging.getLogger(__name__)
+
+Monitor = collections.namedtuple('Monitor', 'bounds work_area is_primary')
+
+
+class MonitorTopology:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._monitors = None
+        self._backend = None
+
+    def get_monitors(self):
+        """Return the list of Monitors, the primary monitor first"""
+        backend = get_backend()
+        with self._lock:
+            if self._monitors is None or self._backend is not backend:
+                monitors = [Monitor(*info) for info in backend.get_monitors()]
+                monitors.sort(key=lambda m: not m.is_primary)
+                self._monitors = monitors
+                self._backend = backend
+                logging.debug("Monitors: {}".format(monitors))
+            return self._monitors
+
+    def invalidate(self):
+        """Forget the monitors, they are read again when next needed"""
+        with self._lock:
+            self._monitors = None
+
+    def get_monitor_at(self, position):
+        """Return the Monitor containing position, or the nearest one"""
+        monitors = self.get_monitors()
+        x, y = position
+
+        def distance(monitor):
+            left, top, right, bottom = monitor.bounds
+            dx = max(left - x, 0, x - (right - 1))
+            dy = max(top - y, 0, y - (bottom - 1))
+            return dx * dx + dy * dy
+
+        return min(monitors, key=distance)
+
+
+_topology = MonitorTopology()
+
+
+def get_monitors():
+    return _topology.get_monitors()
+
+def get_monitor_at(position):
+    return _topology.get_monitor_at(position)
+
+def invalidate():
+    _topology.invalidate()
+
+def watch(on_change=None):
+    """Invalidate the monitors when the displays or work areas change
+
+    On_change() is called after that, if given."""
+    def changed():
+        invalidate()
+        if on_change is not None:
+            on_change()
+    get_backend().watch_displays(changed)
+
+def unwatch():
+    get_backend().unwatch_displays()
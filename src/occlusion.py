@@ -0,0 +1,120 @@
+'''
+Provides: prune_occluded(), merge_aligned()
+
+Shrink the obstacle set of a fill without changing its result. The fill only
+depends on which points are covered by some window (see is_empty), so a
+window whose points are all covered by other windows can be dropped, and
+two windows whose covered points together form a rectangle can be replaced
+by that rectangle.
+'''
+
+import windowinfo
+
+#Give up proving a window covered after splitting it this many times
+MAX_SPLITS = 64
+
+
+def _points(win):
+    '''Return the inclusive rectangle of points covered by a window'''
+    return (win.left + 1, win.top + 1, win.right - 1, win.bottom - 1)
+
+
+def _subtract(piece, other):
+    '''Return inclusive rectangle piece minus other, as disjoint rectangles'''
+    left, top, right, bottom = piece
+    o_left, o_top, o_right, o_bottom = other
+    if (o_left > right or o_right < left or o_top > bottom or
+            o_bottom < top):
+        return [piece]
+    pieces = []
+    if o_top > top:
+        pieces.append((left, top, right, o_top - 1))
+    if o_bottom < bottom:
+        pieces.append((left, o_bottom + 1, right, bottom))
+    middle_top, middle_bottom = max(top, o_top), min(bottom, o_bottom)
+    if o_left > left:
+        pieces.append((left, middle_top, o_left - 1, middle_bottom))
+    if o_right < right:
+        pieces.append((o_right + 1, middle_top, right, middle_bottom))
+    return pieces
+
+
+def _is_covered(rect, kept):
+    '''Return whether every point of rect is covered by a rectangle in kept'''
+    left, top, right, bottom = rect
+    others = [other for other in kept
+              if other[0] <= right and other[2] >= left and
+              other[1] <= bottom and other[3] >= top]
+    #Cheap test first: the corners are the points most often left uncovered
+    for x, y in ((left, top), (right, top), (left, bottom), (right, bottom)):
+        if not any(other[0] <= x <= other[2] and other[1] <= y <= other[3]
+                   for other in others):
+            return False
+    #Depth first, so an uncovered piece is found without splitting the rest
+    pieces = [rect]
+    splits = 0
+    while pieces:
+        piece = pieces.pop()
+        left, top, right, bottom = piece
+        for other in others:
+            if (other[0] <= right and other[2] >= left and
+                    other[1] <= bottom and other[3] >= top):
+                break
+        else:
+            return False
+        splits += 1
+        if splits > MAX_SPLITS:
+            return False
+        pieces.extend(_subtract(piece, other))
+    return True
+
+
+def prune_occluded(windows):
+    """Return the windows that are not hidden by the windows before them
+
+    Windows should be in z-order, top first (as from get_active_windows), so
+    that windows are dropped when they are behind others. Windows covering
+    no points (less than two pixels wide or high) are dropped too. The
+    order of the remaining windows is kept."""
+    kept = []
+    kept_points = []
+    for win in windows:
+        if win.right - win.left < 2 or win.bottom - win.top < 2:
+            continue
+        points = _points(win)
+        if not _is_covered(points, kept_points):
+            kept.append(win)
+            kept_points.append(points)
+    return kept
+
+
+def merge_aligned(windows):
+    """Return the windows with aligned overlapping ones merged
+
+    Two windows with the same top and bottom that overlap horizontally (or
+    the same left and right that overlap vertically) cover a rectangle of
+    points, so are replaced by a dummy Window of that rectangle."""
+    for horizontal in (True, False):
+        if horizontal:
+            key = lambda win: (win.top, win.bottom, win.left, win.right)
+        else:
+            key = lambda win: (win.left, win.right, win.top, win.bottom)
+        merged = []
+        for win in sorted(windows, key=key):
+            if merged:
+                last = merged[-1]
+                if horizontal:
+                    aligned = (last.top, last.bottom) == (win.top, win.bottom)
+                    overlaps = win.left < last.right
+                else:
+                    aligned = (last.left, last.right) == (win.left, win.right)
+                    overlaps = win.top < last.bottom
+                if aligned and overlaps:
+                    merged[-1] = windowinfo.Window.create_dummy(
+                        None, (min(last.left, win.left), min(last.top, win.top),
+                               max(last.right, win.right),
+                               max(last.bottom, win.bottom)))
+                    continue
+            merged.append(win)
+        windows = merged
+    return windows
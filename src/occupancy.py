@@ -0,0 +1,282 @@
+'''
+Provides: OccupancyGrid, a NumPy occupancy bitmap with a summed-area table
+          RectArray, window rectangles as NumPy columns
+
+The grid holds one cell per span of desktop points between window edges (in
+scale x scale blocks of points when downscaled), so that the emptiness of
+any rectangle can be read in O(1) and the fill expansion runs as array
+operations.
+
+The RectArray is for filling many windows in turn: each fill is a few
+comparisons over all the rectangles at once, and a window that has been
+placed is updated in place rather than rebuilding the obstacles. It can also
+fill many positions at once (fill_many), as array operations over a block of
+positions by all the rectangles.
+
+NumPy is optional: HAVE_NUMPY is False when it is not installed.
+'''
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+HAVE_NUMPY = numpy is not None
+
+#Positions filled per block by RectArray.fill_many, bounding its memory use
+FILL_MANY_BLOCK = 1024
+
+
+class OccupancyGrid:
+    def __init__(self, windows, desktop_size, scale=1):
+        '''Rasterise the windows covering the desktop points (0, 0)-(w, h)
+
+        The desktop_size may also be an area (left, top, right, bottom), in
+        which case the grid covers the points of that area.
+        The windows may also be a RectArray of their rectangles.
+        A window covers the points strictly inside it (see is_empty). When
+        downscaled, a cell is occupied if any of its points is covered.
+
+        Only the grid of window edges is rasterised: a column (or row) spans
+        the points between two consecutive edges, whose cells are all alike.
+        Its size depends on the number of windows, not on the desktop size.'''
+        if not HAVE_NUMPY:
+            raise RuntimeError("OccupancyGrid requires NumPy")
+
+        if len(desktop_size) == 2:
+            self.origin = (0, 0)
+        else:
+            self.origin = tuple(desktop_size[:2])
+            desktop_size = (desktop_size[2] - desktop_size[0],
+                            desktop_size[3] - desktop_size[1])
+        self.desktop_size = desktop_size
+        self.scale = scale
+
+        if isinstance(windows, RectArray):
+            rects = windows.rects
+        else:
+            rects = numpy.array([(win.left, win.top, win.right, win.bottom)
+                                 for win in windows], dtype=numpy.int64)
+        rects = rects.reshape(-1, 4) - (self.origin * 2)
+        #Inclusive cell ranges of the covered points, clipped to the grid
+        left = numpy.maximum(rects[:, 0] + 1, 0) // scale
+        top = numpy.maximum(rects[:, 1] + 1, 0) // scale
+        right = numpy.minimum(rects[:, 2] - 1, desktop_size[0]) // scale
+        bottom = numpy.minimum(rects[:, 3] - 1, desktop_size[1]) // scale
+        keep = ((rects[:, 2] - rects[:, 0] >= 2) &
+                (rects[:, 3] - rects[:, 1] >= 2) &
+                (rects[:, 2] - 1 >= 0) & (rects[:, 3] - 1 >= 0) &
+                (rects[:, 0] + 1 <= desktop_size[0]) &
+                (rects[:, 1] + 1 <= desktop_size[1]))
+        left, top, right, bottom = (a[keep] for a in (left, top, right, bottom))
+
+        #First cell of each column and row, and the end of the last
+        self.xs = numpy.unique(numpy.concatenate((
+            [0, desktop_size[0] // scale + 1], left, right + 1)))
+        self.ys = numpy.unique(numpy.concatenate((
+            [0, desktop_size[1] // scale + 1], top, bottom + 1)))
+        self.width = len(self.xs) - 1
+        self.height = len(self.ys) - 1
+        left, right = (numpy.searchsorted(self.xs, left),
+                       numpy.searchsorted(self.xs, right + 1) - 1)
+        top, bottom = (numpy.searchsorted(self.ys, top),
+                       numpy.searchsorted(self.ys, bottom + 1) - 1)
+
+        #2D difference array: the prefix sum counts windows over each cell
+        diff = numpy.zeros((self.height + 1, self.width + 1), dtype=numpy.int32)
+        numpy.add.at(diff, (top, left), 1)
+        numpy.add.at(diff, (top, right + 1), -1)
+        numpy.add.at(diff, (bottom + 1, left), -1)
+        numpy.add.at(diff, (bottom + 1, right + 1), 1)
+        counts = diff.cumsum(axis=0).cumsum(axis=1)
+        self.occupied = counts[:self.height, :self.width] > 0
+
+        #Summed-area table with a leading row and column of zeros
+        self.sat = numpy.zeros((self.height + 1, self.width + 1),
+                               dtype=numpy.int32)
+        self.occupied.cumsum(axis=0, out=self.sat[1:, 1:])
+        self.sat[1:, 1:].cumsum(axis=1, out=self.sat[1:, 1:])
+
+    def contains(self, position):
+        '''Return whether position lies on the desktop covered by the grid'''
+        return (0 <= position[0] - self.origin[0] <= self.desktop_size[0] and
+                0 <= position[1] - self.origin[1] <= self.desktop_size[1])
+
+    def _cell(self, position):
+        '''Return the (column, row) of the grid at position'''
+        s = self.scale
+        return (int(numpy.searchsorted(
+                    self.xs, (position[0] - self.origin[0]) // s, 'right')) - 1,
+                int(numpy.searchsorted(
+                    self.ys, (position[1] - self.origin[1]) // s, 'right')) - 1)
+
+    def _count(self, left, top, right, bottom):
+        '''Return the number of occupied cells in the inclusive cell range'''
+        sat = self.sat
+        return int(sat[bottom + 1, right + 1] - sat[top, right + 1] -
+                   sat[bottom + 1, left] + sat[top, left])
+
+    def is_empty(self, position):
+        '''Return whether the cell at position is empty'''
+        column, row = self._cell(position)
+        return not self.occupied[row, column]
+
+    def is_rect_empty(self, rect):
+        '''Return whether no cell of rect (left, top, right, bottom) is occupied
+
+        The rectangle includes its edges and must lie within the grid.'''
+        left, top = self._cell(rect[:2])
+        right, bottom = self._cell(rect[2:])
+        return self._count(left, top, right, bottom) == 0
+
+    def fill(self, position):
+        '''Return the fill_space rectangle at position, or None if occupied
+
+        At scale 1 the result equals the exact fill. When downscaled the
+        rectangle is snapped inwards to whole cells.'''
+        s = self.scale
+        x, y = self.origin
+        cx, cy = self._cell(position)
+        if self.occupied[cy, cx]:
+            return None
+
+        row = self.occupied[cy]
+        before = numpy.flatnonzero(row[:cx])
+        after = numpy.flatnonzero(row[cx + 1:])
+        left = before[-1] + 1 if len(before) else 0
+        right = cx + after[0] if len(after) else self.width - 1
+
+        #Occupied cells per row between left and right, for all rows at once
+        sat = self.sat
+        per_row = (sat[1:, right + 1] - sat[1:, left] -
+                   sat[:-1, right + 1] + sat[:-1, left])
+        blocked = per_row > 0
+        before = numpy.flatnonzero(blocked[:cy])
+        after = numpy.flatnonzero(blocked[cy + 1:])
+        top = before[-1] + 1 if len(before) else 0
+        bottom = cy + after[0] if len(after) else self.height - 1
+
+        return (x + int(self.xs[left]) * s, y + int(self.ys[top]) * s,
+                x + min(int(self.xs[right + 1]) * s - 1, self.desktop_size[0]),
+                y + min(int(self.ys[bottom + 1]) * s - 1,
+                        self.desktop_size[1]))
+
+
+class RectArray:
+    def __init__(self, rects):
+        '''Hold rects [(left, top, right, bottom), ...] as NumPy columns'''
+        if not HAVE_NUMPY:
+            raise RuntimeError("RectArray requires NumPy")
+        self.rects = numpy.array(rects, dtype=numpy.int64).reshape(-1, 4)
+        left, top, right, bottom = self.rects.T
+        #Windows too thin to contain a point never block anything
+        self._blocking = (right - left >= 2) & (bottom - top >= 2)
+
+    @classmethod
+    def from_columns(cls, lefts, tops, rights, bottoms):
+        '''Return a RectArray of the columns of the rectangles' coordinates,
+        eg. array('i') buffers, which NumPy copies without a Python loop'''
+        return cls(numpy.column_stack([
+            numpy.asarray(column, dtype=numpy.int64)
+            for column in (lefts, tops, rights, bottoms)]))
+
+    def __len__(self):
+        return len(self.rects)
+
+    def is_empty(self, position):
+        '''Return whether no rectangle covers position'''
+        x, y = position
+        left, top, right, bottom = self.rects.T
+        return not ((left < x) & (x < right) & (top < y) & (y < bottom)).any()
+
+    def replace(self, index, rect):
+        '''Change the rectangle at index, eg. after moving its window'''
+        self.rects[index] = rect
+        self._blocking[index] = rect[2] - rect[0] >= 2 and rect[3] - rect[1] >= 2
+
+    def fill(self, area, position, ignore=None):
+        '''Return the fill_space_exact rectangle at position within area
+
+        The rectangle at index ignore (eg. of the window being filled) does
+        not block. Returns None if position is covered.'''
+        x, y = position
+        area_left, area_top, area_right, area_bottom = area
+        left, top, right, bottom = self.rects.T
+        blocking = self._blocking
+        if ignore is not None:
+            blocking = blocking.copy()
+            blocking[ignore] = False
+
+        row = blocking & (top < y) & (y < bottom)
+        if (row & (left < x) & (x < right)).any():
+            return None
+
+        #Horizontal: windows crossing the row lie entirely left or right
+        new_left = area_left if x > area_left else x
+        new_right = area_right if x < area_right else x
+        lefts = right[row & (right <= x)]
+        if len(lefts):
+            new_left = max(new_left, int(lefts.max()))
+        rights = left[row & (left >= x)]
+        if len(rights):
+            new_right = min(new_right, int(rights.min()))
+
+        #Vertical: windows overlapping the span lie entirely above or below
+        new_top = area_top if y > area_top else y
+        new_bottom = area_bottom if y < area_bottom else y
+        span = blocking & (left + 1 <= new_right) & (right - 1 >= new_left)
+        tops = bottom[span & (bottom <= y)]
+        if len(tops):
+            new_top = max(new_top, int(tops.max()))
+        bottoms = top[span & (top >= y)]
+        if len(bottoms):
+            new_bottom = min(new_bottom, int(bottoms.min()))
+
+        return (new_left, new_top, new_right, new_bottom)
+
+    def fill_many(self, area, positions):
+        '''Return [fill(area, position) for position in positions]
+
+        The positions are filled a block at a time, each step of the fill
+        comparing every position of the block with every rectangle at once.'''
+        positions = numpy.array(positions, dtype=numpy.int64).reshape(-1, 2)
+        results = []
+        for start in range(0, len(positions), FILL_MANY_BLOCK):
+            results.extend(self._fill_block(
+                area, positions[start:start + FILL_MANY_BLOCK]))
+        return results
+
+    def _fill_block(self, area, positions):
+        area_left, area_top, area_right, area_bottom = area
+        #Positions down the rows, rectangles across the columns
+        x, y = positions[:, :1], positions[:, 1:]
+        rects = self.rects[self._blocking]
+        left, top, right, bottom = rects.T
+        low = numpy.iinfo(numpy.int64).min
+        high = numpy.iinfo(numpy.int64).max
+
+        row = (top < y) & (y < bottom)
+        covered = (row & (left < x) & (x < right)).any(axis=1)
+
+        #Horizontal: windows crossing the row lie entirely left or right
+        x, y = x[:, 0], y[:, 0]
+        new_left = numpy.where(x > area_left, area_left, x)
+        new_right = numpy.where(x < area_right, area_right, x)
+        new_left = numpy.maximum(new_left, numpy.where(
+            row & (right <= x[:, None]), right, low).max(axis=1, initial=low))
+        new_right = numpy.minimum(new_right, numpy.where(
+            row & (left >= x[:, None]), left, high).min(axis=1, initial=high))
+
+        #Vertical: windows overlapping the span lie entirely above or below
+        span = ((left + 1 <= new_right[:, None]) &
+                (right - 1 >= new_left[:, None]))
+        new_top = numpy.where(y > area_top, area_top, y)
+        new_bottom = numpy.where(y < area_bottom, area_bottom, y)
+        new_top = numpy.maximum(new_top, numpy.where(
+            span & (bottom <= y[:, None]), bottom, low).max(axis=1, initial=low))
+        new_bottom = numpy.minimum(new_bottom, numpy.where(
+            span & (top >= y[:, None]), top, high).min(axis=1, initial=high))
+
+        rows = numpy.stack((new_left, new_top, new_right, new_bottom), axis=1)
+        return [None if is_covered else tuple(rect)
+                for is_covered, rect in zip(covered.tolist(), rows.tolist())]
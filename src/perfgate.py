@@ -0,0 +1,122 @@
+'''
+Fail when a fill engine has become slower than the stored baseline
+
+    python perfgate.py              exit status 1 on a regression
+    python perfgate.py --update     store the current timings as the baseline
+
+A few benchmark cases are timed, and each measurement is divided by the
+linear is_empty scan of the same case, which depends only on the speed of
+the machine. The baseline therefore holds across machines, and a change is
+a regression when its relative time grows by more than the ratio stored
+with the baseline (or given with --ratio).
+'''
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+import benchmark
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'perf_baseline.json')
+DEFAULT_RATIO = 1.5
+#Dense enough that the scan being divided by is well above timer noise
+GATE_CASES = {
+    'sizes': ['1080p'],
+    'monitors': [1],
+    'layouts': ['tiling', 'cascade', 'random'],
+    'counts': [100],
+}
+#Measurement every other is relative to
+REFERENCE = 'is_empty'
+
+
+def relative_timings(results, stat='p50'):
+    """Return {case: {measurement: stat / reference stat}} from benchmark.run"""
+    relative = {}
+    for case, measurements in results['cases'].items():
+        reference = measurements[REFERENCE][stat]
+        relative[case] = {measurement: summary[stat] / reference
+                          for measurement, summary in measurements.items()
+                          if measurement != REFERENCE}
+    return relative
+
+
+def find_regressions(baseline, relative, ratio=None):
+    """Return (case, measurement, before, after) slower by more than ratio
+
+    The ratio defaults to the one stored in the baseline."""
+    if ratio is None:
+        ratio = baseline.get('ratio', DEFAULT_RATIO)
+    regressions = []
+    for case, measurements in relative.items():
+        for measurement, after in measurements.items():
+            try:
+                before = baseline['cases'][case][measurement]
+            except KeyError:
+                continue
+            if after > before * ratio:
+                regressions.append((case, measurement, before, after))
+    return regressions
+
+
+def measure(engines, repeat, runs):
+    """Return the relative timings, the fastest of several runs for each"""
+    best = {}
+    for _ in range(runs):
+        results = benchmark.run(engines=engines, repeat=repeat, **GATE_CASES)
+        for case, measurements in relative_timings(results).items():
+            for measurement, value in measurements.items():
+                fastest = best.setdefault(case, {})
+                fastest[measurement] = min(value, fastest.get(measurement,
+                                                              value))
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--engines', nargs='+',
+                        default=list(benchmark.DEFAULT_ENGINES))
+    parser.add_argument('--repeat', type=int, default=30,
+                        help='cursor positions timed per case')
+    parser.add_argument('--runs', type=int, default=3,
+                        help='runs of the cases, the fastest is kept')
+    parser.add_argument('--ratio', type=float,
+                        help='slowdown counted as a regression (default: the '
+                        'baseline\'s, or {})'.format(DEFAULT_RATIO))
+    parser.add_argument('--update', action='store_true',
+                        help='write the timings to the baseline')
+    args = parser.parse_args(argv)
+    #Points inside a window make the fill warn, which is expected here
+    logging.disable(logging.WARNING)
+
+    relative = measure(args.engines, args.repeat, args.runs)
+    for case, measurements in relative.items():
+        for measurement, value in measurements.items():
+            print('{:32} {:20} {:8.2f} x {}'.format(case, measurement, value,
+                                                    REFERENCE))
+
+    if args.update:
+        baseline = {
+            'reference': REFERENCE,
+            'ratio': args.ratio or DEFAULT_RATIO,
+            'cases': relative,
+        }
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = find_regressions(baseline, relative, args.ratio)
+    for case, measurement, before, after in regressions:
+        print('REGRESSION {} {}: {:.2f} -> {:.2f} x {}'.format(
+              case, measurement, before, after, REFERENCE))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+'''
+Replay a recorded fill trace through the fill engines
+
+The trace (see filltrace) holds the windows, cursor and work area of real
+fills, so the engines can be compared on them offline, on any platform:
+
+    python replay.py trace.bin --engines exact numpy legacy
+
+Each engine's results are compared with those recorded by the same engine
+(other records are only timed), and its timings are summarised as in
+benchmark (and can be written and compared the same way).
+'''
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import benchmark
+import filltrace
+import occupancy
+import windowinfo
+
+
+def replay(records, engines, repeat=1):
+    """Run every record through each engine
+
+    Return ({measurement: summary}, {engine: mismatches}, {engine: compared})
+    where mismatches are [(record number, recorded result, replayed result),
+    ...] among the compared records, those recorded with that engine."""
+    samples = {'recorded': []}
+    mismatches = {}
+    compared = {}
+    for engine in engines:
+        samples['fill_space[{}]'.format(engine)] = []
+        mismatches[engine] = []
+        compared[engine] = 0
+
+    for number, trace_record in enumerate(records):
+        samples['recorded'].append(trace_record.fill_time)
+        windows = benchmark.make_windows(trace_record.rects)
+        for engine in engines:
+            timings = samples['fill_space[{}]'.format(engine)]
+            #As fill_foreground_window does, outside the timings
+            indexed = windowinfo.index_windows(windows, engine)
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = windowinfo.fill_space(indexed,
+                                               trace_record.work_area,
+                                               trace_record.position, engine)
+                timings.append(time.perf_counter() - start)
+            if trace_record.engine != engine:
+                continue
+            compared[engine] += 1
+            if result != trace_record.result:
+                mismatches[engine].append((number, trace_record.result,
+                                           result))
+
+    summaries = {measurement: benchmark.summarise(timings)
+                 for measurement, timings in samples.items() if timings}
+    return summaries, mismatches, compared
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('trace', help='trace file written by filltrace')
+    parser.add_argument('--engines', nargs='+',
+                        default=list(benchmark.DEFAULT_ENGINES),
+                        choices=list(windowinfo.FILL_ENGINES))
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='times each record is replayed per engine')
+    parser.add_argument('--output', help='write the timings to this JSON file')
+    parser.add_argument('--compare', help='report regressions against this '
+                        'JSON file (exit status 1 if any)')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='slowdown ratio counted as a regression')
+    args = parser.parse_args(argv)
+    #Positions inside a window make the fill warn, as they did when recorded
+    logging.disable(logging.WARNING)
+
+    records = list(filltrace.read_trace(args.trace))
+    summaries, mismatches, compared = replay(records, args.engines,
+                                             args.repeat)
+    for measurement, summary in summaries.items():
+        print('{:20} p50 {:10.1f}us  p99 {:10.1f}us  max {:10.1f}us  '
+              '({} samples)'.format(measurement, summary['p50'],
+                                    summary['p99'], summary['max'],
+                                    summary['samples']))
+    for engine, engine_mismatches in mismatches.items():
+        print('{:20} {} of {} results differ from the trace ({} recorded '
+              'with other engines not compared)'.format(
+              engine, len(engine_mismatches), compared[engine],
+              len(records) - compared[engine]))
+        for number, recorded, replayed in engine_mismatches[:10]:
+            print('    record {}: {} -> {}'.format(number, recorded, replayed))
+
+    results = {
+        'python': sys.version.split()[0],
+        'numpy': occupancy.HAVE_NUMPY,
+        'repeat': args.repeat,
+        'cases': {os.path.basename(args.trace): summaries},
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        regressions = benchmark.compare(old, results,
+                                        threshold=args.threshold)
+        for case, measurement, before, after in regressions:
+            print('REGRESSION {} {}: {:.1f}us -> {:.1f}us'.format(
+                  case, measurement, before, after))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
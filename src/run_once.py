@@ -1,6 +1,6 @@
 import logging
 
-import windowinfo
+import ipc
 
 DEBUG = False
 
@@ -14,6 +14,13 @@ if __name__ == '__main__':
                         level=logging.DEBUG)
     
     try:
-        windowinfo.fill_foreground_window()
-    except Exception as e:
+        #Ask the running daemon to fill, it is much faster
+        ipc.send_command('fill')
+    except ipc.DaemonNotRunning:
+        import windowinfo
+        try:
+            windowinfo.fill_foreground_window()
+        except Exception as e:
+            logging.critical(str(e))
+    except ipc.IPCException as e:
         logging.critical(str(e))
@@ -1,32 +1,117 @@
 import logging
+import threading
 
+import asynclog
+import eventloop
+import exclusion
+import fillcache
+import filltrace
+import ipc
+import metrics
+import monitors
 import settings
+import windowcache
 import windowinfo
 import hotkey
 
 logging = logging.getLogger(__name__)
 
 
-def move(x, y):
-    windowinfo.fill_foreground_window()
-
 if __name__ == '__main__':
     config = settings.Settings()
     config.setup_logging(to_file=True, to_console=True)
     user_hotkey = config.get_hotkey()
     
+    def apply_development_settings():
+        if config.get_timings_enabled():
+            metrics.enable()
+        else:
+            metrics.disable()
+        if config.get_trace_enabled():
+            if not filltrace.is_recording():
+                filltrace.start(config.get_trace_filename())
+        else:
+            filltrace.stop()
+    
+    apply_development_settings()
+    
+    #Window events, resyncs, settings reloads and commands all run on it
+    events = eventloop.EventLoop()
+    exclusion.set_rules(config.get_exclusion_rules())
+    fill_cache = fillcache.FillCache()
+    window_cache = windowcache.WindowCache(on_change=fill_cache.invalidate)
+    window_cache.start(scheduler=events)
+    monitors.watch(fill_cache.invalidate)
+    
+    #Hotkey presses are handled on the handler thread, commands on the loop
+    fill_lock = threading.Lock()
+    
+    def fill():
+        with fill_lock:
+            return windowinfo.fill_foreground_window(
+                config.get_fill_engine(), window_cache.snapshot, fill_cache,
+                config.get_candidate_policy(), window_cache.free_map)
+    
+    def fill_all():
+        with fill_lock:
+            moved = windowinfo.fill_all_windows(config.get_fill_all_order(),
+                                                window_cache.z_ordered)
+        return len(moved)
+    
+    def move(x, y):
+        fill()
+    
+    def dump_timings(filename=None):
+        """Write the fill latency percentiles to a JSON file and return them"""
+        return metrics.dump(filename or config.get_timings_filename())
+    
+    command_server = ipc.CommandServer({'fill': fill, 'fill_all': fill_all,
+                                        'timings': dump_timings,
+                                        'flush_log': asynclog.flush},
+                                       scheduler=events)
     try:
-        hotkey.register_hotkey(user_hotkey, move)
+        command_server.start()
+    except ipc.IPCException as e:
+        logging.error(e)
+    
+    def reload_settings():
+        """Apply changes to the configuration file (on the event loop)"""
+        global user_hotkey, hotkey_hid
+        if not config.reload_if_changed():
+            return
+        apply_development_settings()
+        rules = config.get_exclusion_rules()
+        if rules != exclusion.get_rules():
+            exclusion.set_rules(rules)
+            window_cache.resync()
+            fill_cache.invalidate()
+        new_hotkey = config.get_hotkey()
+        if sorted(new_hotkey) != sorted(user_hotkey):
+            try:
+                hotkey_hid = hotkey.replace_hotkey(hotkey_hid, new_hotkey, move)
+            except hotkey.FailedToRegisterHotkey as e:
+                logging.error("Keeping the previous hotkey: {}".format(e))
+            else:
+                user_hotkey = new_hotkey
+    
+    try:
+        hotkey_hid = hotkey.register_hotkey(user_hotkey, move)
     except hotkey.FailedToRegisterHotkey as e:
         logging.critical(e)
     else:
-        while True:
-            try:
-                hotkey.process_next_message()
-            except Exception as e:
-                logging.critical(str(e))
-
-        if not hotkey.unregister_hotkey(keys=user_hotkey):
+        reload_timer = events.call_every(settings.RELOAD_INTERVAL,
+                                         reload_settings)
+        events.run()
+        
+        reload_timer.cancel()
+        if not hotkey.unregister_hotkey(hid=hotkey_hid):
             logging.error("Unable to unregister hotkey")
     
+    command_server.stop()
+    if metrics.is_enabled():
+        dump_timings()
+    filltrace.stop()
+    monitors.unwatch()
+    window_cache.stop()
+    events.close()
     logging.shutdown()
@@ -3,13 +3,24 @@
 import os
 import logging
 import configparser
+import re
 import string
 
+import asynclog
+import candidates
+import exclusion
+
 logging = logging.getLogger(__name__)
 
-DEFAULT_APPDATA_LOCATION = os.path.join(os.getenv('APPDATA'), 'Window Fill')
+#APPDATA only exists on Windows, use the home directory elsewhere
+DEFAULT_APPDATA_LOCATION = os.path.join(
+    os.getenv('APPDATA', os.path.expanduser('~')), 'Window Fill')
 DEFAULT_CONFIG_NAME = 'config.ini'
 DEFAULT_LOG_NAME = 'log.txt'
+DEFAULT_TIMINGS_NAME = 'timings.json'
+DEFAULT_TRACE_NAME = 'trace.bin'
+#Seconds between checks of the configuration file for changes
+RELOAD_INTERVAL = 2
 
 default_settings = {
     'hotkey': {
@@ -18,8 +29,31 @@ default_settings = {
         'use alt': 'no',
         'keyboard letter': 'Q'
     },
+    'fill': {
+        'engine': 'exact',
+        'fill all order': 'z-order'
+    },
+    'candidates': {
+        'strategies': 'horizontal, vertical, largest, aspect',
+        'area weight': '1.0',
+        'aspect weight': '0.5',
+        'budget ms': '20'
+    },
+    'exclusion': {
+        #One regular expression per line
+        'exclude titles': '\n'.join(exclusion.DEFAULT_EXCLUDE_TITLES),
+        'exclude classes': '',
+        'exclude processes': '',
+        'include titles': '',
+        'include classes': '',
+        'include processes': '',
+        'min width': '0',
+        'min height': '0'
+    },
     'development': {
-        'enable logging': 'yes'
+        'enable logging': 'yes',
+        'enable timings': 'no',
+        'record trace': 'no'
     }
 }
 
@@ -31,21 +65,58 @@ class Settings:
         if not os.path.exists(appdata_location):
             os.makedirs(appdata_location)
         
-        config_filename = os.path.join(appdata_location, DEFAULT_CONFIG_NAME)
-        
-        self.config = configparser.ConfigParser()
-        # Ensure all settings will be available:
-        self.config.read_dict(default_settings)
-        
+        self.config_filename = os.path.join(appdata_location,
+                                            DEFAULT_CONFIG_NAME)
+        self._file_state = None
+        self.config = self._load()
+    
+    def _get_file_state(self):
+        '''Return what identifies a version of the file, None if it is gone'''
         try:
-            with open(config_filename, 'r') as f:
-                self.config.read_file(f, DEFAULT_CONFIG_NAME)
+            stat = os.stat(self.config_filename)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _load(self):
+        '''Return the parsed configuration file, adding any missing defaults'''
+        self._file_state = self._get_file_state()
+        #Values are taken literally, patterns may contain %
+        from_file = configparser.ConfigParser(interpolation=None)
+        try:
+            with open(self.config_filename, 'r') as f:
+                from_file.read_file(f, DEFAULT_CONFIG_NAME)
         except FileNotFoundError:
             pass
         
-        # Write settings (did not exist / something may have been updated)
-        with open(config_filename, 'w') as f:
-            self.config.write(f)
+        config = configparser.ConfigParser(interpolation=None)
+        # Ensure all settings will be available:
+        config.read_dict(default_settings)
+        config.read_dict(from_file)
+        
+        # Only write the file if it lacks a setting (eg. after an upgrade)
+        if any(not from_file.has_option(section, option)
+               for section, options in default_settings.items()
+               for option in options):
+            with open(self.config_filename, 'w') as f:
+                config.write(f)
+            self._file_state = self._get_file_state()
+        return config
+    
+    def reload_if_changed(self):
+        '''Return whether the configuration file changed and was reloaded
+        
+        Checking costs one stat of the file. If the new file cannot be
+        parsed, the previous settings are kept.'''
+        if self._get_file_state() == self._file_state:
+            return False
+        try:
+            self.config = self._load()
+        except (configparser.Error, OSError) as e:
+            logging.error("Keeping the previous settings: {}".format(e))
+            return False
+        logging.info("Settings reloaded from {}".format(self.config_filename))
+        return True
     
     def get_hotkey(self):
         '''Return the hotkey as a list, eg. ['MOD_CONTROL', 'MOD_SHIFT', 'Q']'''
@@ -63,18 +134,89 @@ class Settings:
         
         return hotkey
     
+    def get_fill_engine(self):
+        '''Return the name of the fill engine, eg. "exact", "numpy" or "legacy"
+        
+        Or "candidates" to choose between several fills, see
+        get_candidate_policy.'''
+        return self.config.get('fill', 'engine')
+    
+    def get_candidate_policy(self):
+        '''Return the candidates.Policy choosing between fills
+        
+        Unknown strategies and invalid numbers are replaced by the defaults.'''
+        section = self.config['candidates']
+        default = candidates.DEFAULT_POLICY
+        strategies = tuple(name.strip() for name in
+                           section.get('strategies').split(',') if name.strip())
+        if not strategies or any(name not in candidates.STRATEGIES
+                                 for name in strategies):
+            logging.error("Invalid fill strategies: {}".format(strategies))
+            strategies = default.strategies
+        try:
+            weights = (section.getfloat('area weight'),
+                       section.getfloat('aspect weight'))
+        except ValueError as e:
+            logging.error("Invalid fill candidate weight: {}".format(e))
+            weights = (default.area_weight, default.aspect_weight)
+        try:
+            budget = section.getfloat('budget ms') / 1000
+        except ValueError as e:
+            logging.error("Invalid fill candidate budget: {}".format(e))
+            budget = default.budget
+        return candidates.Policy(strategies, weights[0], weights[1], budget)
+    
+    def get_fill_all_order(self):
+        '''Return the order windows are filled in by "fill all", eg. "z-order"'''
+        return self.config.get('fill', 'fill all order')
+    
+    def get_exclusion_rules(self):
+        '''Return the exclusion.RuleSet of windows left out of the fill
+        
+        If a pattern or size is invalid, the default rules are used.'''
+        section = self.config['exclusion']
+        def patterns(option):
+            return [line.strip() for line in
+                    section.get(option).splitlines() if line.strip()]
+        try:
+            return exclusion.RuleSet(
+                patterns('exclude titles'), patterns('exclude classes'),
+                patterns('exclude processes'), patterns('include titles'),
+                patterns('include classes'), patterns('include processes'),
+                section.getint('min width'), section.getint('min height'))
+        except (re.error, ValueError) as e:
+            logging.error("Invalid window exclusion rules: {}".format(e))
+            return exclusion.RuleSet()
+    
+    def get_timings_enabled(self):
+        '''Return whether the latency of each fill phase is recorded'''
+        return self.config.get('development', 'enable timings') == 'yes'
+    
+    def get_timings_filename(self):
+        '''Return the file that recorded fill latencies are written to'''
+        return os.path.join(self.appdata_location, DEFAULT_TIMINGS_NAME)
+    
+    def get_trace_enabled(self):
+        '''Return whether the inputs and result of each fill are recorded'''
+        return self.config.get('development', 'record trace') == 'yes'
+    
+    def get_trace_filename(self):
+        '''Return the file that fills are recorded to (see filltrace)'''
+        return os.path.join(self.appdata_location, DEFAULT_TRACE_NAME)
+    
     def setup_logging(self, to_file=True, to_console=False):
         '''Setup logging behaviour to a file or to the console
         
-        Log debug messages if in debug mode, otherwise just errors'''
+        Log debug messages if in debug mode, otherwise just errors.
+        Records are written by a background thread (see asynclog).'''
         
         if self.config.get('development', 'enable logging') == 'yes':
-            level = logging.DEBUG
+            level = 'DEBUG'
         else:
-            level = logging.ERROR
+            level = 'ERROR'
         
         if to_file:
             filename = os.path.join(self.appdata_location, DEFAULT_LOG_NAME)
-            logging.basicConfig(filename=filename, filemode='w', level=level)
+            asynclog.setup(filename, level)
         elif to_console:
-            logging.basicConfig(level=level)
+            asynclog.setup(None, level)
@@ -0,0 +1,80 @@
+'''
+Provides: WindowIndex, a uniform grid over window rectangles
+
+A window covers the points strictly inside its rectangle, which matches
+windowinfo.is_empty, so the index can be passed anywhere a list of windows is.
+'''
+
+DEFAULT_CELL_SIZE = 256
+#Windows spanning more cells than this are kept aside and scanned linearly
+MAX_CELLS_PER_WINDOW = 1024
+
+
+class WindowIndex:
+    def __init__(self, windows, cell_size=DEFAULT_CELL_SIZE):
+        '''Bucket the windows into square grid cells of cell_size pixels'''
+        self.windows = list(windows)
+        self.cell_size = cell_size
+        self._cells = {}
+        self._oversize = []
+
+        for window in self.windows:
+            #Integer points covered are left+1..right-1, top+1..bottom-1
+            if window.right - window.left < 2 or window.bottom - window.top < 2:
+                continue
+
+            col_range = self._span(window.left + 1, window.right - 1)
+            row_range = self._span(window.top + 1, window.bottom - 1)
+            if len(col_range) * len(row_range) > MAX_CELLS_PER_WINDOW:
+                self._oversize.append(window)
+                continue
+
+            for col in col_range:
+                for row in row_range:
+                    self._cells.setdefault((col, row), []).append(window)
+
+    def _span(self, low, high):
+        '''Return the range of cell indexes covering low..high inclusive'''
+        return range(low // self.cell_size, high // self.cell_size + 1)
+
+    def __iter__(self):
+        return iter(self.windows)
+
+    def __len__(self):
+        return len(self.windows)
+
+    def _candidates(self, rect):
+        '''Yield windows that may cover part of rect (each at most once)'''
+        seen = set()
+        for col in self._span(rect[0], rect[2]):
+            for row in self._span(rect[1], rect[3]):
+                for window in self._cells.get((col, row), ()):
+                    if id(window) not in seen:
+                        seen.add(id(window))
+                        yield window
+        yield from self._oversize
+
+    def is_empty(self, position):
+        '''Return whether there is no window at position'''
+        x, y = position
+        cell = (x // self.cell_size, y // self.cell_size)
+        for window in self._cells.get(cell, ()):
+            if window.left < x < window.right and window.top < y < window.bottom:
+                return False
+        for window in self._oversize:
+            if window.left < x < window.right and window.top < y < window.bottom:
+                return False
+        return True
+
+    def overlapping(self, rect):
+        '''Return windows covering any point of rect (left, top, right, bottom)
+
+        The rectangle includes its edges, like the result of fill_space.'''
+        left, top, right, bottom = rect
+        return [window for window in self._candidates(rect)
+                if max(window.left + 1, left) <= min(window.right - 1, right)
+                and max(window.top + 1, top) <= min(window.bottom - 1, bottom)]
+
+    def is_rect_empty(self, rect):
+        '''Return whether no window covers any point of rect'''
+        return not self.overlapping(rect)
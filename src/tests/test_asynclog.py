@@ -0,0 +1,64 @@
+import logging
+import threading
+import unittest
+
+import asynclog
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.threads = set()
+    
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+        self.threads.add(threading.current_thread().name)
+
+
+class TestRingBufferHandler(unittest.TestCase):
+    
+    def setUp(self):
+        self.target = ListHandler()
+        self.logger = logging.getLogger('test_asynclog')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+    
+    def tearDown(self):
+        self.logger.handlers.clear()
+    
+    def test_flush_on_demand(self):
+        handler = asynclog.RingBufferHandler(self.target, flush_interval=60)
+        self.logger.addHandler(handler)
+        self.logger.debug("one")
+        self.logger.info("two")
+        self.assertEqual(self.target.messages, [])
+        handler.flush()
+        self.assertEqual(self.target.messages, ["one", "two"])
+        handler.close()
+    
+    def test_error_wakes_writer(self):
+        handler = asynclog.RingBufferHandler(self.target, flush_interval=60)
+        self.logger.addHandler(handler)
+        written = threading.Event()
+        self.target.flush = written.set
+        self.logger.debug("before")
+        self.logger.error("failed")
+        self.assertTrue(written.wait(5))
+        self.assertEqual(self.target.messages, ["before", "failed"])
+        self.assertEqual(self.target.threads, {'log-writer'})
+        handler.close()
+    
+    def test_full_buffer_drops_oldest(self):
+        handler = asynclog.RingBufferHandler(self.target, capacity=3,
+                                             flush_interval=60)
+        self.logger.addHandler(handler)
+        for i in range(5):
+            self.logger.info(str(i))
+        handler.close()
+        self.assertEqual(self.target.messages[1:], ["2", "3", "4"])
+        self.assertIn("2 log records dropped", self.target.messages[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
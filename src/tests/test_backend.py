@@ -0,0 +1,34 @@
+import sys
+import unittest
+
+from fakebackend import FakeBackend
+
+
+class TestBackend(unittest.TestCase):
+    
+    def check_hwnds(self, api):
+        """Enumerated hwnds are ints, equal to those of the other calls"""
+        hwnds = api.enum_windows()
+        for hwnd in hwnds:
+            self.assertIsInstance(hwnd, int)
+            hash(hwnd)
+        self.assertEqual(len(set(hwnds)), len(hwnds))
+        foreground = api.get_foreground_window()
+        if foreground:
+            self.assertIsInstance(foreground, int)
+            self.assertIn(foreground, set(hwnds))
+    
+    def test_fake_hwnds(self):
+        fake = FakeBackend()
+        fake.add_window("win1", (0, 0, 100, 100))
+        fake.set_foreground_window(fake.add_window("win2", (0, 0, 50, 50)))
+        self.check_hwnds(fake)
+    
+    @unittest.skipUnless(sys.platform == 'win32', "Needs the Win32 API")
+    def test_win32_hwnds(self):
+        import win32backend
+        self.check_hwnds(win32backend.Win32Backend())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import random
+import unittest
+
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    
+    def test_layouts(self):
+        desktop_size = benchmark.virtual_desktop_size((1920, 1080), 2)
+        self.assertEqual(desktop_size, (3840, 1080))
+        
+        for name, layout in benchmark.LAYOUTS.items():
+            for count in (1, 7, 200):
+                rects = layout(random.Random(0), desktop_size, count)
+                self.assertEqual(len(rects), count, name)
+                for left, top, right, bottom in rects:
+                    self.assertTrue(0 <= left < right <= desktop_size[0], name)
+                    self.assertTrue(0 <= top < bottom <= desktop_size[1], name)
+                #Reproducible from the seed
+                self.assertEqual(rects, layout(random.Random(0), desktop_size,
+                                               count))
+    
+    def test_summarise(self):
+        summary = benchmark.summarise([i / 1e6 for i in range(1, 101)])
+        self.assertAlmostEqual(summary['p50'], 50)
+        self.assertAlmostEqual(summary['p99'], 99)
+        self.assertAlmostEqual(summary['max'], 100)
+        self.assertEqual(summary['samples'], 100)
+    
+    def test_run_and_compare(self):
+        results = benchmark.run(['1080p'], [1], ['tiling'], [5], ['exact'],
+                                repeat=3)
+        measurements = results['cases']['1080px1/tiling/5']
+        self.assertIn('fill_space[exact]', measurements)
+        self.assertIn('pipeline[exact]', measurements)
+        
+        self.assertEqual(benchmark.compare(results, results), [])
+        slower = {'cases': {'1080px1/tiling/5': {'is_empty': {
+            'p50': measurements['is_empty']['p50'] * 2 + 1}}}}
+        self.assertEqual(len(benchmark.compare(results, slower)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
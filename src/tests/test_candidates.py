@@ -0,0 +1,118 @@
+import threading
+import time
+import unittest
+
+import candidates
+import windowinfo as w
+from freespace import FreeSpaceMap
+
+
+class TestCandidates(unittest.TestCase):
+
+    def setUp(self):
+        self.area = (0, 0, 800, 600)
+        self.windows = [w.Window.create_dummy("win1", (100, 100, 200, 200)),
+                        w.Window.create_dummy("win2", (300, 300, 400, 400))]
+
+    def test_fill_candidates(self):
+        found = candidates.fill_candidates(self.windows, self.area, (250, 250),
+                                           (100, 300))
+        self.assertEqual(found, {
+            'horizontal': (0, 200, 800, 300),
+            'vertical': (200, 0, 300, 600),
+            'largest': (200, 0, 800, 300),
+            #The tallest of the free rectangles, like the window
+            'aspect': (200, 0, 300, 600),
+        })
+        self.assertEqual(found['horizontal'],
+                         w.fill_space(self.windows, self.area, (250, 250)))
+
+        found = candidates.fill_candidates(self.windows, self.area, (150, 150))
+        self.assertEqual(found, dict.fromkeys(candidates.STRATEGIES))
+
+    def test_choose_fill(self):
+        policy = candidates.DEFAULT_POLICY
+        self.assertEqual(candidates.choose_fill(self.windows, self.area,
+                                                (250, 250), None, policy),
+                         (200, 0, 800, 300))
+        shape = policy._replace(area_weight=0.1)
+        self.assertEqual(candidates.choose_fill(self.windows, self.area,
+                                                (250, 250), (100, 300), shape),
+                         (200, 0, 300, 600))
+        horizontal = policy._replace(strategies=('horizontal',))
+        self.assertEqual(candidates.choose_fill(self.windows, self.area,
+                                                (250, 250), None, horizontal),
+                         (0, 200, 800, 300))
+        self.assertIsNone(candidates.choose_fill(self.windows, self.area,
+                                                 (150, 150)))
+        with self.assertRaises(ValueError):
+            candidates.choose_fill(self.windows, self.area, (250, 250), None,
+                                   policy._replace(strategies=('spiral',)))
+
+    def test_budget(self):
+        release = threading.Event()
+        def slow(query):
+            release.wait(5)
+            return (0, 0, 800, 600)
+        def failing(query):
+            raise RuntimeError("no fill")
+        strategies = candidates.STRATEGIES.copy()
+        candidates.STRATEGIES.update(slow=slow, failing=failing)
+        try:
+            policy = candidates.Policy(('slow', 'failing', 'horizontal'),
+                                       1.0, 0.0, 0.2)
+            #The slow candidate would score best, but is over budget
+            self.assertEqual(candidates.choose_fill(self.windows, self.area,
+                                                    (250, 250), None, policy),
+                             (0, 200, 800, 300))
+
+            #Without any candidate in budget, the horizontal fill is used
+            policy = policy._replace(strategies=('slow',), budget=0.01)
+            start = time.perf_counter()
+            self.assertEqual(candidates.fill_candidates(
+                             self.windows, self.area, (250, 250), None, policy),
+                             {'horizontal': (0, 200, 800, 300)})
+            self.assertLess(time.perf_counter() - start, 1)
+            self.assertEqual(candidates.choose_fill(self.windows, self.area,
+                                                    (250, 250), None, policy),
+                             (0, 200, 800, 300))
+        finally:
+            release.set()
+            candidates.STRATEGIES.clear()
+            candidates.STRATEGIES.update(strategies)
+
+    def test_free_map_not_ready(self):
+        release = threading.Event()
+        def slow_map():
+            release.wait(5)
+            return FreeSpaceMap(self.windows, self.area)
+        policy = candidates.DEFAULT_POLICY._replace(budget=0.05)
+        try:
+            #Largest and aspect are skipped while the map is built
+            found = candidates.fill_candidates(self.windows, self.area,
+                                               (250, 250), None, policy,
+                                               slow_map)
+            self.assertEqual(sorted(found), ['horizontal', 'vertical'])
+            #Without queuing another build behind it
+            built = []
+            def new_map():
+                built.append(1)
+                return FreeSpaceMap(self.windows, self.area)
+            found = candidates.fill_candidates(self.windows, self.area,
+                                               (250, 250), None, policy,
+                                               new_map)
+            self.assertEqual(sorted(found), ['horizontal', 'vertical'])
+            self.assertEqual(built, [])
+        finally:
+            release.set()
+        candidates._free_map_future.result()
+
+        free_map = FreeSpaceMap(self.windows, self.area)
+        found = candidates.fill_candidates(self.windows, self.area,
+                                           (250, 250), None, policy,
+                                           lambda: free_map)
+        self.assertEqual(found['largest'], (200, 0, 800, 300))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+import unittest
+
+import backend
+import eventloop
+import hotkey
+from fakebackend import FakeBackend
+
+
+class TestEventLoop(unittest.TestCase):
+    
+    def setUp(self):
+        self.fake = FakeBackend()
+        self.old_backend = backend.set_backend(self.fake)
+        #Long enough that a wake up within it is not due to the limit
+        self.events = eventloop.EventLoop(max_latency=10)
+    
+    def tearDown(self):
+        self.events.close()
+        backend.set_backend(self.old_backend)
+    
+    def test_wait_message(self):
+        start = time.monotonic()
+        self.assertIsNone(self.fake.wait_message(0.02))
+        self.assertGreaterEqual(time.monotonic() - start, 0.02)
+        self.assertIsNone(self.fake.wait_message(0))
+        
+        threading.Timer(0.01, self.fake.wake).start()
+        self.assertIsNone(self.fake.wait_message())
+        self.fake.press_hotkey(5, (1, 2))
+        self.assertEqual(self.fake.wait_message(0), (1, 5, (1, 2)))
+    
+    def test_messages(self):
+        pressed = []
+        hid = hotkey.register_hotkey(["Q"], lambda x, y: pressed.append((x, y)))
+        try:
+            self.fake.press_hotkey(hid, (10, 20))
+            self.fake.post_quit()
+            self.assertEqual(self.events.run(), 0)
+            self.assertTrue(hotkey.wait_for_handlers(timeout=5))
+            self.assertEqual(pressed, [(10, 20)])
+        finally:
+            hotkey.unregister_hotkey(hid=hid)
+    
+    def test_timers(self):
+        calls = []
+        def tick(name):
+            calls.append(name)
+            if calls.count('every') == 3:
+                self.events.stop()
+        def failing():
+            calls.append('failing')
+            raise RuntimeError("failed")
+        self.events.call_later(0.01, calls.append, 'later')
+        self.events.call_later(0.01, calls.append, 'cancelled').cancel()
+        self.events.call_every(0.02, tick, 'every')
+        periodic = self.events.call_every(0.005, failing)
+        self.events.call_later(0.03, periodic.cancel)
+        start = time.monotonic()
+        self.assertIsNone(self.events.run())
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(calls.count('every'), 3)
+        self.assertIn('later', calls)
+        self.assertNotIn('cancelled', calls)
+        #Failures do not stop the calls, cancelling does
+        self.assertTrue(2 <= calls.count('failing') <= 6)
+    
+    def test_submit(self):
+        results = []
+        def client():
+            loop_thread = self.events.submit(threading.get_ident).result(5)
+            results.append(loop_thread)
+            with self.assertRaises(ValueError):
+                self.events.submit(int, 'x').result(5)
+            self.events.stop()
+        threading.Thread(target=client).start()
+        start = time.monotonic()
+        self.assertIsNone(self.events.run())
+        #Woken at once, not after max_latency
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(results, [threading.get_ident()])
+        
+        with self.assertRaises(RuntimeError):
+            self.events.submit(int)
+    
+    def test_pending_cancelled(self):
+        future = self.events.submit(int)
+        self.events.stop()
+        self.assertIsNone(self.events.run())
+        self.assertTrue(future.cancelled())
+        with self.assertRaises(RuntimeError):
+            self.events.submit(int)
+    
+    def test_tasks(self):
+        events = eventloop.EventLoop(max_latency=0.01)
+        async def sleeper():
+            await asyncio.sleep(0.02)
+            events.stop()
+            return 'slept'
+        try:
+            task = events.loop.create_task(sleeper())
+            start = time.monotonic()
+            self.assertIsNone(events.run())
+            self.assertLess(time.monotonic() - start, 5)
+            self.assertEqual(task.result(), 'slept')
+        finally:
+            events.close()
+        
+        async def answer():
+            return 42
+        def client():
+            self.assertEqual(self.events.run_coroutine_threadsafe(
+                             answer()).result(5), 42)
+            self.events.stop()
+        threading.Thread(target=client).start()
+        self.assertIsNone(self.events.run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import re
+import unittest
+
+import backend
+import exclusion
+import windowinfo as w
+from fakebackend import FakeBackend
+
+
+class TestRuleSet(unittest.TestCase):
+    
+    def test_default_rules(self):
+        rules = exclusion.RuleSet()
+        for title in ("", "Program Manager", "Window Fill.exe - console"):
+            self.assertTrue(rules.excludes(title), title)
+        for title in ("Notepad", "Program Manager 2", "My Window Fill.exe"):
+            self.assertFalse(rules.excludes(title), title)
+        self.assertFalse(rules.uses_class or rules.uses_process)
+        self.assertFalse(rules.is_too_small((0, 0, 1, 1)))
+    
+    def test_include_overrides_exclude(self):
+        rules = exclusion.RuleSet(exclude_titles=[r'^$'],
+                                  exclude_classes=['^Shell_TrayWnd$'],
+                                  exclude_processes=[r'^explorer\.exe$'],
+                                  include_titles=['^File Explorer'])
+        self.assertTrue(rules.uses_class and rules.uses_process)
+        self.assertTrue(rules.excludes("Taskbar", "Shell_TrayWnd", "x.exe"))
+        self.assertTrue(rules.excludes("Files", "CabinetWClass", "Explorer.EXE"))
+        self.assertFalse(rules.excludes("File Explorer - C:", "CabinetWClass",
+                                        "explorer.exe"))
+        self.assertFalse(rules.excludes("Notepad", "Notepad", "notepad.exe"))
+    
+    def test_size(self):
+        rules = exclusion.RuleSet(min_width=100, min_height=50)
+        self.assertTrue(rules.is_too_small((0, 0, 99, 100)))
+        self.assertTrue(rules.is_too_small((0, 0, 100, 49)))
+        self.assertFalse(rules.is_too_small((10, 10, 110, 60)))
+    
+    def test_equality(self):
+        self.assertEqual(exclusion.RuleSet(), exclusion.RuleSet())
+        self.assertNotEqual(exclusion.RuleSet(), exclusion.RuleSet(min_width=1))
+        with self.assertRaises(re.error):
+            exclusion.RuleSet(exclude_titles=['('])
+
+
+class TestVerdictCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.fake = FakeBackend()
+        self.old_backend = backend.set_backend(self.fake)
+        self.calls = []
+        for name in ('get_window_title', 'get_window_class',
+                     'get_process_name'):
+            def counted(hwnd, name=name, method=getattr(self.fake, name)):
+                self.calls.append(name)
+                return method(hwnd)
+            setattr(self.fake, name, counted)
+    
+    def tearDown(self):
+        backend.set_backend(self.old_backend)
+        exclusion.set_rules(exclusion.RuleSet())
+        exclusion.track(False)
+    
+    def test_verdicts_cached_by_title(self):
+        cache = exclusion.VerdictCache(exclusion.RuleSet(
+            exclude_classes=['^Tool']))
+        win = self.fake.add_window("win", (0, 0, 100, 100), class_name="Tool")
+        self.assertTrue(cache.is_excluded(win))
+        self.assertTrue(cache.is_excluded(win))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(self.calls, ['get_window_title', 'get_window_class',
+                                      'get_window_title'])
+        
+        #The class is only fetched again when the title changes
+        self.fake.update_window(win, title="renamed")
+        self.assertTrue(cache.is_excluded(win))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertEqual(self.calls[-2:], ['get_window_title',
+                                           'get_window_class'])
+        
+        cache.set_rules(exclusion.RuleSet())
+        self.assertFalse(cache.is_excluded(win, "renamed"))
+    
+    def test_tracking_skips_titles(self):
+        cache = exclusion.VerdictCache(exclusion.RuleSet())
+        cache.tracking = True
+        win = self.fake.add_window("", (0, 0, 100, 100))
+        self.assertTrue(cache.is_excluded(win))
+        del self.calls[:]
+        self.assertTrue(cache.is_excluded(win))
+        self.assertEqual(self.calls, [])
+        #A reported title change replaces the verdict
+        self.assertFalse(cache.is_excluded(win, "titled"))
+        self.assertFalse(cache.is_excluded(win))
+        cache.forget(win)
+        self.assertTrue(cache.is_excluded(win))
+    
+    def test_get_active_windows(self):
+        self.fake.add_window("win1", (0, 0, 100, 100), process_name="a.exe")
+        self.fake.add_window("win2", (0, 0, 100, 100), process_name="B.exe")
+        self.fake.add_window("small", (0, 0, 10, 10))
+        self.fake.add_window("", (0, 0, 100, 100))
+        self.assertEqual([win.title for win in w.get_active_windows()],
+                         ["small", "win2", "win1"])
+        
+        exclusion.set_rules(exclusion.RuleSet(
+            exclude_processes=['^b\\.exe$'], min_width=20, min_height=20))
+        self.assertEqual([win.title for win in w.get_active_windows()],
+                         ["win1"])
+        self.assertIsNone(w.get_active_window(2))
+        self.assertEqual(w.get_active_window(1).title, "win1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import random
+import unittest
+
+import backend
+import windowinfo as w
+from fakebackend import FakeBackend
+from fillcache import FillCache
+from windowcache import WindowCache
+
+
+class TestFillCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.windows = [w.Window(1, "win1", (100, 100, 200, 200), False),
+                        w.Window(2, "win2", (300, 300, 400, 400), False)]
+        self.area = (0, 0, 800, 600)
+    
+    def test_repeat_in_cell_hits(self):
+        cache = FillCache()
+        self.assertEqual(cache.fill(self.windows, self.area, (250, 150)),
+                         (200, 0, 800, 300))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        #Another point between the same edges
+        self.assertEqual(cache.fill(self.windows, self.area, (270, 120)),
+                         (200, 0, 800, 300))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        #On an edge is a different cell
+        self.assertEqual(cache.fill(self.windows, self.area, (300, 120)),
+                         (200, 0, 800, 300))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertIsNone(cache.fill(self.windows, self.area, (150, 150)))
+        self.assertIsNone(cache.fill(self.windows, self.area, (160, 170)))
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+    
+    def test_window_array(self):
+        cache = FillCache()
+        windows = w.WindowArray.from_windows(self.windows)
+        self.assertEqual(cache.fill(windows, self.area, (250, 150)),
+                         (200, 0, 800, 300))
+        #The same layout as the list of its windows
+        self.assertEqual(cache.fill(self.windows, self.area, (270, 120)),
+                         (200, 0, 800, 300))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.invalidate(2)
+        self.assertEqual(len(cache), 0)
+    
+    def test_matches_fill_space(self):
+        rng = random.Random(15)
+        windows = []
+        for hwnd in range(10):
+            left, top = rng.randrange(0, 700), rng.randrange(0, 500)
+            windows.append(w.Window(hwnd, str(hwnd), (left, top,
+                                    left + rng.randrange(1, 300),
+                                    top + rng.randrange(1, 300)), False))
+        cache = FillCache(max_entries=16)
+        for _ in range(500):
+            position = rng.randrange(-10, 811), rng.randrange(-10, 611)
+            for engine in ('exact', 'legacy'):
+                self.assertEqual(cache.fill(windows, self.area, position,
+                                            engine),
+                                 w.fill_space(windows, self.area, position,
+                                              engine))
+        self.assertGreater(cache.hits, 0)
+        self.assertLessEqual(len(cache), 16)
+    
+    def test_layout_change(self):
+        cache = FillCache()
+        cache.fill(self.windows, self.area, (300, 150))
+        moved = [self.windows[0],
+                 w.Window(2, "win2", (300, 0, 400, 100), False)]
+        self.assertEqual(cache.fill(moved, self.area, (350, 120)),
+                         (200, 100, 800, 600))
+        self.assertEqual(cache.hits, 0)
+        
+        cache.fill(self.windows, self.area, (300, 150))
+        cache.invalidate(3)
+        self.assertEqual(len(cache), 2)
+        cache.invalidate(2)
+        self.assertEqual(len(cache), 0)
+        cache.fill(self.windows, self.area, (300, 150))
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+    
+    def test_invalidated_by_window_events(self):
+        fake = FakeBackend()
+        old_backend = backend.set_backend(fake)
+        cache = FillCache()
+        window_cache = WindowCache(on_change=cache.invalidate)
+        try:
+            win1 = fake.add_window("win1", (100, 100, 200, 200))
+            window_cache.start(periodic_resync=False)
+            cache.fill(window_cache.snapshot(), self.area, (300, 150))
+            self.assertEqual(len(cache), 1)
+            fake.move_window(win1, (0, 0, 50, 50))
+            self.assertEqual(len(cache), 0)
+        finally:
+            window_cache.stop()
+            backend.set_backend(old_backend)
+
+
+if __name__ == "__main__":
+    unittest.main()
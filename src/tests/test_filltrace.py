@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import backend
+import filltrace
+import replay
+import windowinfo as w
+from fakebackend import FakeBackend
+
+
+class TestFillTrace(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'trace.bin')
+    
+    def tearDown(self):
+        filltrace.stop()
+        shutil.rmtree(self.directory)
+    
+    def test_encode_decode(self):
+        record = filltrace.TraceRecord(
+            1234.5, (10, -20), (0, 0, 800, 600), (800, 640), None, 0.000125,
+            'exact', [(0, 0, 100, 100), (-1920, 5, 0, 1080)])
+        self.assertEqual(filltrace.decode(filltrace.encode(record)), record)
+        record = record._replace(result=(1, 2, 3, 4), rects=[])
+        self.assertEqual(filltrace.decode(filltrace.encode(record)), record)
+    
+    def test_record_and_replay(self):
+        fake = FakeBackend(desktop_size=(800, 640))
+        old_backend = backend.set_backend(fake)
+        try:
+            fake.add_window("win1", (100, 100, 200, 200))
+            fore = fake.add_window("fore", (500, 500, 550, 550))
+            fake.set_foreground_window(fore)
+            
+            filltrace.start(self.filename)
+            for position in ((250, 250), (150, 150)):
+                fake.cursor_pos = position
+                w.fill_foreground_window()
+            filltrace.stop()
+            fake.cursor_pos = (300, 300)
+            w.fill_foreground_window()
+        finally:
+            backend.set_backend(old_backend)
+        
+        records = list(filltrace.read_trace(self.filename))
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0].position, (250, 250))
+        self.assertEqual(records[0].work_area, (0, 0, 800, 600))
+        self.assertEqual(records[0].desktop_size, (800, 640))
+        self.assertEqual(records[0].result, (0, 200, 800, 600))
+        self.assertEqual(records[0].rects, [(100, 100, 200, 200)])
+        self.assertIsNone(records[1].result)
+        
+        summaries, mismatches, compared = replay.replay(records,
+                                                        ['exact', 'legacy'])
+        self.assertEqual(summaries['fill_space[exact]']['samples'], 2)
+        self.assertEqual(mismatches['exact'], [])
+        #Only records of the same engine are compared
+        self.assertEqual(compared, {'exact': 2, 'legacy': 0})
+        other = [record._replace(engine='candidates', result=(0, 0, 1, 1))
+                 for record in records]
+        summaries, mismatches, compared = replay.replay(other, ['exact'])
+        self.assertEqual((mismatches, compared), ({'exact': []}, {'exact': 0}))
+        self.assertEqual(replay.main([self.filename, '--engines', 'exact']),
+                         0)
+    
+    def test_partial_record(self):
+        filltrace.start(self.filename)
+        record = filltrace.TraceRecord(0, (1, 1), (0, 0, 10, 10), (10, 10),
+                                       (0, 0, 10, 10), 0, 'exact', [])
+        filltrace.record(record)
+        filltrace.record(record)
+        filltrace.stop()
+        with open(self.filename, 'r+b') as f:
+            f.truncate(os.path.getsize(self.filename) - 1)
+        self.assertEqual(list(filltrace.read_trace(self.filename)), [record])
+        
+        with open(self.filename, 'wb') as f:
+            f.write(b'not a trace')
+        self.assertRaises(filltrace.TraceError, list,
+                          filltrace.read_trace(self.filename))
+
+
+if __name__ == "__main__":
+    unittest.main()
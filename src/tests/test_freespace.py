@@ -0,0 +1,147 @@
+import itertools
+import random
+import unittest
+
+from freespace import FreeSpaceMap
+
+
+class Rect:
+    """Stand-in for windowinfo.Window, which needs the Win32 API"""
+    def __init__(self, left, top, right, bottom):
+        self.left, self.top, self.right, self.bottom = left, top, right, bottom
+
+
+def brute_force_rectangles(windows, area):
+    """Return the maximal empty rectangles by trying every edge combination"""
+    rects = [(w.left, w.top, w.right, w.bottom) for w in windows
+             if w.right - w.left >= 2 and w.bottom - w.top >= 2]
+    xs = sorted({area[0], area[2]} | {r[0] for r in rects} |
+                {r[2] for r in rects})
+    ys = sorted({area[1], area[3]} | {r[1] for r in rects} |
+                {r[3] for r in rects})
+    xs = [x for x in xs if area[0] <= x <= area[2]]
+    ys = [y for y in ys if area[1] <= y <= area[3]]
+
+    def empty(l, t, r, b):
+        return not any(l < w[2] and r > w[0] and t < w[3] and b > w[1]
+                       for w in rects)
+
+    found = set()
+    for (l, r), (t, b) in itertools.product(
+            itertools.combinations(xs, 2), itertools.combinations(ys, 2)):
+        if not empty(l, t, r, b):
+            continue
+        i, j = xs.index(l), xs.index(r)
+        k, m = ys.index(t), ys.index(b)
+        if ((i == 0 or not empty(xs[i - 1], t, r, b)) and
+                (j == len(xs) - 1 or not empty(l, t, xs[j + 1], b)) and
+                (k == 0 or not empty(l, ys[k - 1], r, b)) and
+                (m == len(ys) - 1 or not empty(l, t, r, ys[m + 1]))):
+            found.add((l, t, r, b))
+    return found
+
+
+def random_windows(rng, count, size=100):
+    windows = []
+    for _ in range(count):
+        left, top = rng.randrange(-10, size), rng.randrange(-10, size)
+        windows.append(Rect(left, top, left + rng.randrange(1, 50),
+                            top + rng.randrange(1, 50)))
+    return windows
+
+
+class TestFreeSpaceMap(unittest.TestCase):
+
+    def test_two_windows(self):
+        windows = [Rect(0, 0, 100, 100), Rect(200, 50, 300, 150)]
+        free = FreeSpaceMap(windows, (400, 200))
+        self.assertEqual(set(free.rectangles), {(100, 0, 400, 50),
+                                                (100, 0, 200, 200),
+                                                (0, 150, 400, 200),
+                                                (0, 100, 200, 200),
+                                                (300, 0, 400, 200)})
+        self.assertEqual(free.rectangle_at((150, 20)), (100, 0, 200, 200))
+        self.assertEqual(free.rectangle_at((350, 20)), (300, 0, 400, 200))
+        self.assertEqual(free.rectangle_at((50, 120)), (0, 100, 200, 200))
+        #Window edges are free
+        self.assertEqual(free.rectangle_at((0, 100)), (0, 100, 200, 200))
+        self.assertIsNone(free.rectangle_at((50, 50)))
+        self.assertIsNone(free.rectangle_at((500, 50)))
+        self.assertEqual(len(free.rectangles_at((150, 120))), 2)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(12)
+        for _ in range(40):
+            windows = random_windows(rng, rng.randrange(8))
+            area = (0, 0, 100, 100)
+            free = FreeSpaceMap(windows, area)
+            expected = brute_force_rectangles(windows, area)
+            self.assertEqual(set(free.rectangles), expected)
+            self.assertEqual(len(free.rectangles), len(expected))
+
+            for _ in range(20):
+                point = (rng.randrange(101), rng.randrange(101))
+                containing = [r for r in expected if r[0] <= point[0] <= r[2]
+                              and r[1] <= point[1] <= r[3]]
+                best = free.rectangle_at(point)
+                if containing:
+                    self.assertIn(best, containing)
+                    self.assertEqual((best[2] - best[0]) * (best[3] - best[1]),
+                                     max((r[2] - r[0]) * (r[3] - r[1])
+                                         for r in containing))
+                else:
+                    self.assertIsNone(best)
+
+    def test_update_matches_rebuild(self):
+        rng = random.Random(5)
+        area = (10, 20, 110, 120)
+        for _ in range(30):
+            windows = random_windows(rng, rng.randrange(1, 8))
+            free = FreeSpaceMap(windows, area)
+            for _ in range(4):
+                moved = rng.randrange(len(windows))
+                old = windows[moved]
+                new = random_windows(rng, 1)[0]
+                windows[moved] = new
+                free.update((old.left, old.top, old.right, old.bottom),
+                            (new.left, new.top, new.right, new.bottom))
+                rebuilt = FreeSpaceMap(windows, area)
+                self.assertEqual(set(free.rectangles), set(rebuilt.rectangles))
+                for x, y in itertools.product(range(10, 111, 7),
+                                              range(20, 121, 7)):
+                    best, expected = (free.rectangle_at((x, y)),
+                                      rebuilt.rectangle_at((x, y)))
+                    self.assertEqual(best is None, expected is None)
+
+    def test_grid_stays_bounded(self):
+        """Dragging windows around does not grow the grid without limit"""
+        rng = random.Random(12)
+        area = (0, 0, 3840, 2120)
+        windows = [(left, top, left + 300, top + 200) for left, top in
+                   ((rng.randrange(3500), rng.randrange(1900))
+                    for _ in range(20))]
+        free = FreeSpaceMap([Rect(*rect) for rect in windows], area)
+        for step in range(300):
+            i = step % len(windows)
+            left, top, right, bottom = windows[i]
+            dx, dy = rng.randrange(-30, 31), rng.randrange(-30, 31)
+            moved = (left + dx, top + dy, right + dx, bottom + dy)
+            free.update(windows[i], moved)
+            windows[i] = moved
+            #Twice the lines of a rebuild, plus the moved window's
+            self.assertLessEqual(len(free.xs) + len(free.ys),
+                                 2 * 2 * (2 + 2 * 20) + 4)
+        rebuilt = FreeSpaceMap([Rect(*rect) for rect in windows], area)
+        self.assertEqual(set(free.rectangles), set(rebuilt.rectangles))
+
+    def test_add_and_remove(self):
+        free = FreeSpaceMap([], (100, 100))
+        self.assertEqual(free.rectangles, [(0, 0, 100, 100)])
+        free.update(new_rect=(40, 40, 60, 60))
+        self.assertEqual(free.rectangle_at((10, 50)), (0, 0, 40, 100))
+        free.update(old_rect=(40, 40, 60, 60))
+        self.assertEqual(free.rectangles, [(0, 0, 100, 100)])
+
+
+if __name__ == "__main__":
+    unittest.main()
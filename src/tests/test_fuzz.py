@@ -0,0 +1,57 @@
+import logging
+import random
+import unittest
+
+import fuzz
+import windowinfo as w
+
+
+class TestFuzz(unittest.TestCase):
+    
+    def setUp(self):
+        #Positions inside a window make the fill warn, which is expected here
+        logging.disable(logging.WARNING)
+    
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+    
+    def test_engines_agree(self):
+        self.assertEqual(fuzz.fuzz(40, seed=22, points=10), [])
+    
+    def test_check_rect(self):
+        area = (0, 0, 100, 100)
+        wins = [w.Window.create_dummy("win1", (50, 0, 60, 100))]
+        self.assertEqual(fuzz.check_rect(wins, area, (20, 20), (0, 0, 50, 100)),
+                         [])
+        self.assertEqual(fuzz.check_rect(wins, area, (20, 20), (0, 0, 51, 100)),
+                         ["covers a window"])
+        self.assertEqual(fuzz.check_rect(wins, area, (20, 20), (0, 10, 50, 100)),
+                         ["can grow to the top"])
+        self.assertEqual(fuzz.check_rect(wins, area, (20, 20), (30, 0, 50, 10)),
+                         ["does not contain the position", "can grow to the left",
+                          "can grow to the bottom"])
+    
+    def test_finds_broken_engine(self):
+        rng = random.Random(0)
+        area = (0, 0, 200, 150)
+        wins = fuzz.random_layout(rng, area, 8)
+        position = next(point for point in fuzz.random_points(rng, wins,
+                                                               area, 100)
+                        if w.is_empty(wins, point))
+        self.assertEqual(fuzz.check(wins, area, position), [])
+        
+        fill_space_numpy = w.fill_space_numpy
+        def off_by_one(*args):
+            rect = fill_space_numpy(*args)
+            return (rect[0], rect[1], rect[2] + 1, rect[3])
+        w.fill_space_numpy = off_by_one
+        try:
+            problems = fuzz.check(wins, area, position)
+        finally:
+            w.fill_space_numpy = fill_space_numpy
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0].startswith("numpy:"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 
 import hotkey
@@ -68,6 +70,21 @@ class TestWindowInfo(unittest.TestCase):
         self.assertEqual(hotkey.unregister_hotkey(keys=["Q"]), 1)
         self.assertEqual(hotkey.get_total_registrations(), 0)
     
+    def test_replace_hotkey(self):
+        func = lambda x, y: None
+        hid = hotkey.register_hotkey(["Q"], func)
+        new_hid = hotkey.replace_hotkey(hid, ["W"], func)
+        self.assertEqual(hotkey.get_total_registrations(), 1)
+        self.assertEqual(hotkey.unregister_hotkey(hid=hid), 0)
+        
+        #The old hotkey stays if the new one fails
+        hotkey.register_hotkey(["E"], lambda x, y: None)
+        with self.assertRaises(hotkey.FailedToRegisterHotkey):
+            hotkey.replace_hotkey(new_hid, ["E"], func)
+        self.assertEqual(hotkey.unregister_hotkey(hid=new_hid), 1)
+        self.assertEqual(hotkey.unregister_hotkey(keys=["E"]), 1)
+        self.assertEqual(hotkey.get_total_registrations(), 0)
+    
     def test_unregister_all(self):
         self.assertEqual(hotkey.get_total_registrations(), 0)
         hotkey.register_hotkey(["Q"], lambda x: x)
@@ -77,6 +94,69 @@ class TestWindowInfo(unittest.TestCase):
         self.assertTrue(hotkey.unregister_all_hotkeys())
         self.assertEqual(hotkey.get_total_registrations(), 0)
     
+    def test_process_next_message(self):
+        fake = hotkey.get_backend()
+        if not hasattr(fake, 'press_hotkey'):
+            self.skipTest("Needs the fake backend")
+        
+        pressed = []
+        hid = hotkey.register_hotkey(["Q"], lambda x, y: pressed.append((x, y)))
+        fake.press_hotkey(hid, (10, 20))
+        self.assertTrue(hotkey.process_next_message())
+        self.assertTrue(hotkey.wait_for_handlers(timeout=5))
+        self.assertEqual(pressed, [(10, 20)])
+        
+        fake.post_quit()
+        self.assertEqual(hotkey.process_next_message(), 0)
+        self.assertEqual(hotkey.unregister_hotkey(hid=hid), 1)
+    
+    def test_timers_run_while_waiting(self):
+        fake = hotkey.get_backend()
+        if not hasattr(fake, 'press_hotkey'):
+            self.skipTest("Needs the fake backend")
+        
+        ticks = []
+        def tick():
+            ticks.append(1)
+            if len(ticks) == 3:
+                fake.post_quit()
+        timer_id = fake.set_timer(0.01, tick)
+        self.assertEqual(hotkey.process_next_message(), 0)
+        fake.kill_timer(timer_id)
+        self.assertEqual(len(ticks), 3)
+    
+    def test_hids_not_reused(self):
+        hid1 = hotkey.register_hotkey(["Q"], lambda x, y: 0)
+        hid2 = hotkey.register_hotkey(["W"], lambda x, y: 0)
+        self.assertEqual(hotkey.unregister_hotkey(hid=hid1), 1)
+        hid3 = hotkey.register_hotkey(["E"], lambda x, y: 0)
+        self.assertEqual(len({hid1, hid2, hid3}), 3)
+        self.assertTrue(hotkey.unregister_all_hotkeys())
+    
+    def test_handler_queue_coalesces(self):
+        release = threading.Event()
+        calls = []
+        def slow(x, y):
+            calls.append(('slow', x, y))
+            release.wait(5)
+        def other(x, y):
+            calls.append(('other', x, y))
+        
+        handlers = hotkey.HandlerQueue(maxsize=2)
+        self.assertTrue(handlers.submit(1, slow, 0, 0))
+        #Wait for the first press to start running
+        while not calls:
+            time.sleep(0.001)
+        self.assertTrue(handlers.submit(1, slow, 1, 1))
+        self.assertTrue(handlers.submit(1, slow, 2, 2))
+        self.assertTrue(handlers.submit(2, other, 3, 3))
+        self.assertFalse(handlers.submit(3, other, 4, 4))
+        release.set()
+        
+        self.assertTrue(handlers.join(timeout=5))
+        self.assertEqual(calls, [('slow', 0, 0), ('slow', 2, 2),
+                                 ('other', 3, 3)])
+    
     """
     def test_interactive(self):
         '''Testing:'''
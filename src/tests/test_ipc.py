@@ -0,0 +1,121 @@
+import os
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+import eventloop
+import ipc
+
+
+@unittest.skipIf(sys.platform == 'win32', "Uses a Unix-domain socket")
+class TestCommandChannel(unittest.TestCase):
+    
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.tempdir.name, 'test.sock')
+    
+    def tearDown(self):
+        self.tempdir.cleanup()
+    
+    def test_no_daemon(self):
+        with self.assertRaises(ipc.DaemonNotRunning):
+            ipc.send_command('fill', address=self.address)
+    
+    def test_commands(self):
+        def fail():
+            raise ValueError("failed")
+        commands = {'fill': lambda: [1, 2, 3, 4],
+                    'add': lambda a, b: a + b,
+                    'fail': fail}
+        server = ipc.CommandServer(commands, address=self.address)
+        server.start()
+        try:
+            self.assertEqual(ipc.send_command('ping', address=self.address),
+                             'pong')
+            self.assertEqual(ipc.send_command('fill', address=self.address),
+                             [1, 2, 3, 4])
+            self.assertEqual(ipc.send_command('add', address=self.address,
+                                              a=1, b=2), 3)
+            with self.assertRaises(ipc.CommandFailed):
+                ipc.send_command('unknown', address=self.address)
+            with self.assertRaises(ipc.CommandFailed):
+                ipc.send_command('fail', address=self.address)
+            
+            #Only one daemon at a time
+            with self.assertRaises(ipc.IPCException):
+                ipc.CommandServer(commands, address=self.address).start()
+        finally:
+            server.stop()
+        
+        with self.assertRaises(ipc.DaemonNotRunning):
+            ipc.send_command('fill', address=self.address)
+    
+    def test_stale_socket(self):
+        stale = socket.socket(socket.AF_UNIX)
+        stale.bind(self.address)
+        stale.close()
+        
+        server = ipc.CommandServer({}, address=self.address)
+        server.start()
+        try:
+            self.assertEqual(ipc.send_command('ping', address=self.address),
+                             'pong')
+        finally:
+            server.stop()
+    
+    def test_unremovable_socket(self):
+        #Not a socket, and cannot be removed like one
+        os.mkdir(self.address)
+        with self.assertRaises(ipc.IPCException):
+            ipc.CommandServer({}, address=self.address).start()
+    
+    def test_private_socket(self):
+        server = ipc.CommandServer({}, address=self.address)
+        server.start()
+        try:
+            self.assertEqual(os.stat(self.address).st_mode & 0o077, 0)
+        finally:
+            server.stop()
+    
+    def test_get_address(self):
+        old_runtime_dir = os.environ.pop('XDG_RUNTIME_DIR', None)
+        try:
+            os.environ['XDG_RUNTIME_DIR'] = self.tempdir.name
+            self.assertEqual(ipc.get_address(), (os.path.join(
+                self.tempdir.name, 'window-fill.sock'), 'AF_UNIX'))
+            del os.environ['XDG_RUNTIME_DIR']
+            self.assertEqual(ipc.get_address(), (os.path.expanduser(
+                '~/.window-fill.sock'), 'AF_UNIX'))
+        finally:
+            if old_runtime_dir is not None:
+                os.environ['XDG_RUNTIME_DIR'] = old_runtime_dir
+    
+    def test_scheduler(self):
+        events = eventloop.EventLoop()
+        commands = {'thread': threading.get_ident, 'stop': events.stop}
+        server = ipc.CommandServer(commands, address=self.address,
+                                   scheduler=events)
+        server.start()
+        replies = []
+        def client():
+            replies.append(ipc.send_command('thread', address=self.address))
+            ipc.send_command('stop', address=self.address)
+            #Not run once the loop has stopped
+            with self.assertRaises(ipc.CommandFailed):
+                ipc.send_command('thread', address=self.address)
+            replies.append(True)
+        try:
+            thread = threading.Thread(target=client)
+            thread.start()
+            events.run()
+            thread.join(5)
+        finally:
+            server.stop()
+            events.close()
+        self.assertEqual(replies, [threading.get_ident(), True])
+
+
+if __name__ == "__main__":
+    unittest.main()
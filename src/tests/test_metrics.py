@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+
+import metrics
+
+
+class TestHistogram(unittest.TestCase):
+    
+    def test_buckets(self):
+        previous = -1
+        for value in range(100000):
+            index = metrics._bucket(value)
+            self.assertGreaterEqual(index, previous)
+            high = metrics._bucket_high(index)
+            self.assertGreaterEqual(high, value)
+            self.assertLessEqual(high - value, value / metrics.SUB_BUCKETS)
+            previous = index
+    
+    def test_percentile(self):
+        histogram = metrics.Histogram()
+        for value in range(1, 1001):
+            histogram.record(value)
+        
+        self.assertEqual(histogram.count, 1000)
+        self.assertEqual(histogram.max, 1000)
+        for percentile in (50, 90, 99):
+            self.assertAlmostEqual(histogram.percentile(percentile),
+                                   percentile * 10, delta=percentile * 10 / 16)
+        self.assertEqual(histogram.percentile(100), 1000)
+        self.assertEqual(metrics.Histogram().percentile(50), 0)
+    
+    def test_rolling(self):
+        now = [0]
+        histogram = metrics.RollingHistogram(window=10, clock=lambda: now[0])
+        histogram.record(1)
+        now[0] = 15
+        histogram.record(2)
+        self.assertEqual(histogram.snapshot().count, 2)
+        now[0] = 25
+        histogram.record(3)
+        self.assertEqual(histogram.snapshot().count, 2)
+        now[0] = 100
+        histogram.record(4)
+        self.assertEqual(histogram.snapshot().count, 1)
+
+
+class TestPhases(unittest.TestCase):
+    
+    def tearDown(self):
+        metrics.disable()
+        metrics.reset()
+    
+    def test_disabled(self):
+        with metrics.phase('test'):
+            pass
+        self.assertEqual(metrics.get_percentiles(), {})
+    
+    def test_enabled(self):
+        metrics.enable()
+        for _ in range(3):
+            with metrics.phase('test'):
+                pass
+        percentiles = metrics.get_percentiles()
+        self.assertEqual(percentiles['test']['count'], 3)
+        self.assertIn('p99', percentiles['test'])
+        
+        with tempfile.TemporaryDirectory() as tempdir:
+            filename = os.path.join(tempdir, 'timings.json')
+            metrics.dump(filename)
+            with open(filename) as f:
+                self.assertEqual(json.load(f), percentiles)
+
+
+if __name__ == "__main__":
+    unittest.main()
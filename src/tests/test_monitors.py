@@ -0,0 +1,48 @@
+import unittest
+
+import backend
+import monitors
+from fakebackend import FakeBackend
+
+LEFT = ((-1920, 0, 0, 1080), (-1920, 0, 0, 1040), False)
+PRIMARY = ((0, 0, 2560, 1440), (0, 40, 2560, 1440), True)
+
+
+class TestMonitors(unittest.TestCase):
+    
+    def setUp(self):
+        self.fake = FakeBackend(monitors=[LEFT, PRIMARY])
+        self.old_backend = backend.set_backend(self.fake)
+        monitors.watch()
+    
+    def tearDown(self):
+        monitors.unwatch()
+        monitors.invalidate()
+        backend.set_backend(self.old_backend)
+    
+    def test_get_monitors(self):
+        self.assertEqual(monitors.get_monitors(),
+                         [monitors.Monitor(*PRIMARY), monitors.Monitor(*LEFT)])
+    
+    def test_get_monitor_at(self):
+        self.assertEqual(monitors.get_monitor_at((-1, 500)).bounds, LEFT[0])
+        self.assertEqual(monitors.get_monitor_at((0, 500)).bounds, PRIMARY[0])
+        #Below the left monitor, nearest to it
+        self.assertEqual(monitors.get_monitor_at((-500, 1200)).bounds, LEFT[0])
+    
+    def test_cached_until_display_change(self):
+        calls = []
+        get_monitors = self.fake.get_monitors
+        self.fake.get_monitors = lambda: calls.append(1) or get_monitors()
+        
+        monitors.get_monitors()
+        monitors.get_monitors()
+        self.assertEqual(len(calls), 1)
+        
+        self.fake.set_monitors([PRIMARY])
+        self.assertEqual(len(monitors.get_monitors()), 1)
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
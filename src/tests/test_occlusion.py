@@ -0,0 +1,104 @@
+import random
+import unittest
+
+import windowinfo as w
+from occlusion import prune_occluded, merge_aligned
+
+
+def random_windows(rng, count, stacked=False):
+    windows = []
+    for hwnd in range(count):
+        if stacked and windows and rng.random() < 0.5:
+            #Somewhere inside an earlier window, often hidden by it
+            above = rng.choice(windows)
+            left = rng.randrange(above.left, above.right)
+            top = rng.randrange(above.top, above.bottom)
+            right = rng.randrange(left + 1, above.right + 2)
+            bottom = rng.randrange(top + 1, above.bottom + 2)
+        else:
+            left, top = rng.randrange(0, 700), rng.randrange(0, 500)
+            right = left + rng.randrange(1, 300)
+            bottom = top + rng.randrange(1, 300)
+        windows.append(w.Window(hwnd, str(hwnd), (left, top, right, bottom),
+                                False))
+    return windows
+
+
+class TestPruneOccluded(unittest.TestCase):
+
+    def test_hidden_window_dropped(self):
+        top = w.Window(1, "top", (100, 100, 400, 400), False)
+        hidden = w.Window(2, "hidden", (150, 150, 300, 300), False)
+        #Only the edges are shared, which are not covered points
+        edge = w.Window(3, "edge", (100, 100, 400, 400), False)
+        self.assertEqual(prune_occluded([top, hidden, edge]), [top])
+
+    def test_hidden_by_several(self):
+        left = w.Window(1, "left", (0, 0, 201, 300), False)
+        right = w.Window(2, "right", (199, 0, 400, 300), False)
+        hidden = w.Window(3, "hidden", (50, 50, 350, 250), False)
+        self.assertEqual(prune_occluded([left, right, hidden]), [left, right])
+        #Touching windows leave the shared edge uncovered
+        right = w.Window(2, "right", (201, 0, 400, 300), False)
+        self.assertEqual(prune_occluded([left, right, hidden]),
+                         [left, right, hidden])
+
+    def test_z_order_kept(self):
+        bottom = w.Window(1, "bottom", (150, 150, 300, 300), False)
+        top = w.Window(2, "top", (100, 100, 400, 400), False)
+        other = w.Window(3, "other", (500, 0, 600, 100), False)
+        thin = w.Window(4, "thin", (0, 0, 1, 600), False)
+        #Windows are only hidden by those above them
+        self.assertEqual(prune_occluded([bottom, other, thin, top]),
+                         [bottom, other, top])
+
+    def test_fill_unchanged(self):
+        rng = random.Random(19)
+        area = (0, 0, 800, 600)
+        for _ in range(8):
+            windows = random_windows(rng, 25, stacked=True)
+            pruned = prune_occluded(windows)
+            self.assertLess(len(pruned), len(windows))
+            for _ in range(8):
+                position = rng.randrange(-10, 811), rng.randrange(-10, 611)
+                for engine in w.FILL_ENGINES:
+                    self.assertEqual(
+                        w.fill_space(pruned, area, position, engine),
+                        w.fill_space(windows, area, position, engine))
+
+
+class TestMergeAligned(unittest.TestCase):
+
+    def test_merge_rows_and_columns(self):
+        windows = [w.Window(1, "a", (0, 0, 100, 50), False),
+                   w.Window(2, "b", (99, 0, 200, 50), False),
+                   w.Window(3, "c", (0, 49, 200, 80), False),
+                   w.Window(4, "d", (300, 0, 400, 50), False)]
+        self.assertEqual(sorted(win.position for win in merge_aligned(windows)),
+                         [(0, 0, 200, 80), (300, 0, 400, 50)])
+
+    def test_touching_not_merged(self):
+        windows = [w.Window(1, "a", (0, 0, 100, 50), False),
+                   w.Window(2, "b", (100, 0, 200, 50), False)]
+        self.assertEqual(len(merge_aligned(windows)), 2)
+
+    def test_fill_unchanged(self):
+        rng = random.Random(20)
+        area = (0, 0, 800, 600)
+        for _ in range(8):
+            #Tiled columns of equal height, some overlapping
+            windows = [w.Window(i, str(i), (x, 0, x + rng.randrange(80, 130),
+                                            300), False)
+                       for i, x in enumerate(range(0, 800, 100))]
+            windows += random_windows(rng, 5)
+            merged = merge_aligned(windows)
+            for _ in range(8):
+                position = rng.randrange(-10, 811), rng.randrange(-10, 611)
+                for engine in w.FILL_ENGINES:
+                    self.assertEqual(
+                        w.fill_space(merged, area, position, engine),
+                        w.fill_space(windows, area, position, engine))
+
+
+if __name__ == '__main__':
+    unittest.main()
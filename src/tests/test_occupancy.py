@@ -0,0 +1,142 @@
+import random
+import unittest
+from array import array
+
+import occupancy
+import windowinfo
+from spatialindex import WindowIndex
+
+
+class Rect:
+    """Stand-in for windowinfo.Window, which needs the Win32 API"""
+    def __init__(self, left, top, right, bottom):
+        self.left, self.top, self.right, self.bottom = left, top, right, bottom
+
+
+@unittest.skipUnless(occupancy.HAVE_NUMPY, "NumPy is not installed")
+class TestOccupancyGrid(unittest.TestCase):
+    
+    def test_is_empty(self):
+        """Same expectations as test_windowinfo.test_is_empty"""
+        win1 = Rect(0, 0, 100, 100)
+        win2 = Rect(50, 50, 150, 150)
+        grid = occupancy.OccupancyGrid([win1, win2], (800, 600))
+        
+        self.assertTrue(grid.is_empty((0, 0)))
+        self.assertTrue(grid.is_empty((25, 125)))
+        self.assertTrue(grid.is_empty((125, 25)))
+        self.assertTrue(grid.is_empty((150, 150)))
+        self.assertFalse(grid.is_empty((100, 100)))
+        self.assertFalse(grid.is_empty((149, 149)))
+    
+    def test_is_rect_empty(self):
+        grid = occupancy.OccupancyGrid([Rect(100, 100, 200, 200)], (800, 600))
+        
+        self.assertTrue(grid.is_rect_empty((0, 0, 100, 600)))
+        self.assertFalse(grid.is_rect_empty((0, 0, 101, 101)))
+        self.assertTrue(grid.is_rect_empty((200, 200, 800, 600)))
+    
+    def test_fill(self):
+        desktop_size = 800, 600
+        win1 = Rect(100, 100, 200, 200)
+        win2 = Rect(300, 300, 400, 400)
+        grid = occupancy.OccupancyGrid([win1, win2], desktop_size)
+        
+        self.assertEqual(grid.fill((300, 150)), (200, 0, 800, 300))
+        self.assertEqual(grid.fill((250, 250)), (0, 200, 800, 300))
+        self.assertIsNone(grid.fill((150, 150)))
+    
+    def test_fill_downscaled_is_empty(self):
+        """A downscaled fill is smaller but still empty"""
+        rng = random.Random(3)
+        desktop_size = 1000, 700
+        wins = []
+        for _ in range(15):
+            left, top = rng.randrange(0, 900), rng.randrange(0, 600)
+            wins.append(Rect(left, top, left + rng.randrange(2, 300),
+                             top + rng.randrange(2, 300)))
+        index = WindowIndex(wins)
+        grid = occupancy.OccupancyGrid(wins, desktop_size, scale=8)
+        
+        for _ in range(200):
+            position = rng.randrange(0, 1001), rng.randrange(0, 701)
+            rect = grid.fill(position)
+            if rect is not None:
+                self.assertTrue(index.is_rect_empty(rect))
+                self.assertTrue(rect[0] <= position[0] <= rect[2])
+                self.assertTrue(rect[1] <= position[1] <= rect[3])
+
+
+
+@unittest.skipUnless(occupancy.HAVE_NUMPY, "NumPy is not installed")
+class TestRectArray(unittest.TestCase):
+    
+    def test_fill(self):
+        area = (0, 0, 800, 600)
+        rects = occupancy.RectArray([(100, 100, 200, 200), (300, 300, 400, 400)])
+        
+        self.assertEqual(rects.fill(area, (300, 150)), (200, 0, 800, 300))
+        self.assertIsNone(rects.fill(area, (150, 150)))
+        self.assertEqual(rects.fill(area, (150, 150), ignore=0),
+                         (0, 0, 800, 300))
+        
+        rects.replace(1, (500, 0, 600, 600))
+        self.assertEqual(rects.fill(area, (300, 150)), (200, 0, 500, 600))
+        rects.replace(1, (500, 0, 501, 600))
+        self.assertEqual(rects.fill(area, (300, 150)), (200, 0, 800, 600))
+    
+    def test_fill_matches_exact(self):
+        rng = random.Random(14)
+        area = (50, 20, 1000, 700)
+        wins = []
+        for _ in range(30):
+            left, top = rng.randrange(0, 1000), rng.randrange(0, 700)
+            wins.append(Rect(left, top, left + rng.randrange(1, 300),
+                             top + rng.randrange(1, 300)))
+        rects = occupancy.RectArray([(win.left, win.top, win.right, win.bottom)
+                                     for win in wins])
+        
+        for _ in range(200):
+            position = rng.randrange(50, 1001), rng.randrange(20, 701)
+            if windowinfo.is_empty(wins, position):
+                self.assertEqual(rects.fill(area, position),
+                                 windowinfo.fill_space_exact(wins, area,
+                                                             position))
+            else:
+                self.assertIsNone(rects.fill(area, position))
+    
+    def test_fill_many(self):
+        area = (0, 0, 800, 600)
+        rects = occupancy.RectArray([(100, 100, 200, 200), (300, 300, 400, 400),
+                                     (500, 0, 501, 600)])
+        positions = [(300, 150), (150, 150), (-20, 150), (800, 600)] * 3
+        block_size, occupancy.FILL_MANY_BLOCK = occupancy.FILL_MANY_BLOCK, 5
+        try:
+            self.assertEqual(rects.fill_many(area, positions),
+                             [rects.fill(area, position)
+                              for position in positions])
+        finally:
+            occupancy.FILL_MANY_BLOCK = block_size
+        
+        self.assertEqual(occupancy.RectArray([]).fill_many(area, [(5, 5)]),
+                         [(0, 0, 800, 600)])
+        self.assertEqual(rects.fill_many(area, []), [])
+    
+    def test_from_columns(self):
+        rects = occupancy.RectArray.from_columns(
+            array('i', [100, 500]), array('i', [100, 0]),
+            array('i', [200, 501]), array('i', [200, 600]))
+        self.assertEqual(rects.rects.tolist(),
+                         [[100, 100, 200, 200], [500, 0, 501, 600]])
+        self.assertFalse(rects.is_empty((150, 150)))
+        self.assertTrue(rects.is_empty((100, 150)))
+        self.assertTrue(rects.is_empty((500, 300)))
+        self.assertEqual(rects.fill((0, 0, 800, 600), (300, 150)),
+                         (200, 0, 800, 600))
+        empty = occupancy.RectArray.from_columns(*(array('i') for _ in 'ltrb'))
+        self.assertEqual(len(empty), 0)
+        self.assertTrue(empty.is_empty((0, 0)))
+
+
+if __name__ == "__main__":
+    unittest.main()
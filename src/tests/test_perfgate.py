@@ -0,0 +1,43 @@
+import json
+import unittest
+
+import perfgate
+
+
+class TestPerfGate(unittest.TestCase):
+    
+    def test_relative_timings(self):
+        results = {'cases': {'case': {
+            'is_empty': {'p50': 2.0, 'p99': 4.0},
+            'fill_space[exact]': {'p50': 10.0, 'p99': 40.0},
+        }}}
+        self.assertEqual(perfgate.relative_timings(results),
+                         {'case': {'fill_space[exact]': 5.0}})
+        self.assertEqual(perfgate.relative_timings(results, 'p99'),
+                         {'case': {'fill_space[exact]': 10.0}})
+    
+    def test_find_regressions(self):
+        baseline = {'ratio': 1.5, 'cases': {'case': {
+            'fill_space[exact]': 5.0, 'fill_space[numpy]': 100.0}}}
+        relative = {'case': {'fill_space[exact]': 7.0,
+                             'fill_space[numpy]': 151.0,
+                             'fill_space[legacy]': 1000.0},
+                    'new case': {'fill_space[exact]': 1000.0}}
+        self.assertEqual(perfgate.find_regressions(baseline, relative),
+                         [('case', 'fill_space[numpy]', 100.0, 151.0)])
+        self.assertEqual(len(perfgate.find_regressions(baseline, relative,
+                                                       ratio=1.2)), 2)
+    
+    def test_stored_baseline(self):
+        """The stored baseline covers the gate's cases"""
+        with open(perfgate.DEFAULT_BASELINE) as f:
+            baseline = json.load(f)
+        self.assertEqual(baseline['reference'], perfgate.REFERENCE)
+        self.assertEqual(len(baseline['cases']),
+                         len(perfgate.GATE_CASES['layouts']))
+        for measurements in baseline['cases'].values():
+            self.assertIn('fill_space[exact]', measurements)
+
+
+if __name__ == "__main__":
+    unittest.main()
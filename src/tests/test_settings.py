@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import candidates
+import exclusion
+import settings
+
+
+class TestSettings(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, settings.DEFAULT_CONFIG_NAME)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def write(self, text):
+        with open(self.filename, 'w') as f:
+            f.write(text)
+        #Make the change visible even on file systems with coarse times
+        stat = os.stat(self.filename)
+        os.utime(self.filename, ns=(stat.st_atime_ns,
+                                    stat.st_mtime_ns + 10 ** 9))
+    
+    def test_defaults_written_only_when_missing(self):
+        config = settings.Settings(self.directory)
+        self.assertEqual(config.get_fill_engine(), 'exact')
+        self.assertFalse(config.get_timings_enabled())
+        written = os.stat(self.filename).st_mtime_ns
+        
+        settings.Settings(self.directory)
+        self.assertEqual(os.stat(self.filename).st_mtime_ns, written)
+        
+        self.write("[fill]\nengine = numpy\n")
+        config = settings.Settings(self.directory)
+        self.assertEqual(config.get_fill_engine(), 'numpy')
+        with open(self.filename) as f:
+            text = f.read()
+        self.assertIn("engine = numpy", text)
+        self.assertIn("keyboard letter = Q", text)
+    
+    def test_reload_if_changed(self):
+        config = settings.Settings(self.directory)
+        self.assertFalse(config.reload_if_changed())
+        
+        with open(self.filename) as f:
+            text = f.read()
+        self.write(text.replace("keyboard letter = Q", "keyboard letter = W"))
+        self.assertTrue(config.reload_if_changed())
+        self.assertEqual(config.get_hotkey(), ['MOD_CONTROL', 'MOD_SHIFT', 'W'])
+        self.assertFalse(config.reload_if_changed())
+        
+        #A broken file keeps the previous settings
+        self.write("[hotkey\n")
+        self.assertFalse(config.reload_if_changed())
+        self.assertEqual(config.get_hotkey(), ['MOD_CONTROL', 'MOD_SHIFT', 'W'])
+
+    
+    def test_candidate_policy(self):
+        config = settings.Settings(self.directory)
+        self.assertEqual(config.get_candidate_policy(),
+                         candidates.DEFAULT_POLICY)
+        
+        self.write("[candidates]\nstrategies = largest, horizontal\n"
+                   "area weight = 2\nbudget ms = 5\n")
+        config = settings.Settings(self.directory)
+        self.assertEqual(config.get_candidate_policy(),
+                         candidates.Policy(('largest', 'horizontal'), 2.0, 0.5,
+                                           0.005))
+        
+        self.write("[candidates]\nstrategies = spiral\naspect weight = x\n")
+        config = settings.Settings(self.directory)
+        self.assertEqual(config.get_candidate_policy(),
+                         candidates.DEFAULT_POLICY)
+
+    
+    def test_exclusion_rules(self):
+        config = settings.Settings(self.directory)
+        self.assertEqual(config.get_exclusion_rules(), exclusion.RuleSet())
+        
+        self.write("[exclusion]\nexclude titles = ^$\n    100%\n"
+                   "exclude processes = ^steam\\.exe$\nmin width = 20\n")
+        config = settings.Settings(self.directory)
+        self.assertEqual(config.get_exclusion_rules(), exclusion.RuleSet(
+            ['^$', '100%'], exclude_processes=['^steam\\.exe$'],
+            min_width=20))
+        
+        self.write("[exclusion]\nexclude titles = (\n")
+        config = settings.Settings(self.directory)
+        self.assertEqual(config.get_exclusion_rules(), exclusion.RuleSet())
+
+
+if __name__ == "__main__":
+    unittest.main()
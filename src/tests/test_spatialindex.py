@@ -0,0 +1,57 @@
+import unittest
+
+from spatialindex import WindowIndex
+
+
+class Rect:
+    """Stand-in for windowinfo.Window, which needs the Win32 API"""
+    def __init__(self, left, top, right, bottom):
+        self.left, self.top, self.right, self.bottom = left, top, right, bottom
+
+
+class TestWindowIndex(unittest.TestCase):
+    
+    def test_is_empty(self):
+        """Same expectations as test_windowinfo.test_is_empty"""
+        win1 = Rect(0, 0, 100, 100)
+        win2 = Rect(50, 50, 150, 150)
+        
+        index = WindowIndex([win1], cell_size=16)
+        self.assertTrue(index.is_empty((0, 0)))
+        self.assertFalse(index.is_empty((50, 50)))
+        self.assertTrue(index.is_empty((100, 100)))
+        
+        index = WindowIndex([win1, win2], cell_size=16)
+        self.assertTrue(index.is_empty((0, 0)))
+        self.assertTrue(index.is_empty((25, 125)))
+        self.assertTrue(index.is_empty((125, 25)))
+        self.assertTrue(index.is_empty((150, 150)))
+        
+        self.assertFalse(index.is_empty((100, 100)))
+        self.assertFalse(index.is_empty((149, 149)))
+    
+    def test_negative_and_oversize(self):
+        left_monitor = Rect(-1920, 0, -100, 1080)
+        huge = Rect(-100000, 5000, 100000, 6000)
+        index = WindowIndex([left_monitor, huge], cell_size=16)
+        
+        self.assertFalse(index.is_empty((-1000, 500)))
+        self.assertTrue(index.is_empty((-100, 500)))
+        self.assertFalse(index.is_empty((0, 5500)))
+        self.assertEqual(len(index), 2)
+    
+    def test_overlapping(self):
+        win1 = Rect(0, 0, 100, 100)
+        win2 = Rect(200, 0, 300, 100)
+        thin = Rect(400, 0, 401, 100)
+        index = WindowIndex([win1, win2, thin], cell_size=64)
+        
+        self.assertEqual(index.overlapping((0, 0, 300, 50)), [win1, win2])
+        #Edges are not covered by the window
+        self.assertEqual(index.overlapping((100, 0, 200, 100)), [])
+        self.assertEqual(index.overlapping((99, 99, 201, 200)), [win1, win2])
+        self.assertTrue(index.is_rect_empty((350, 0, 450, 100)))
+
+
+if __name__ == "__main__":
+    unittest.main()
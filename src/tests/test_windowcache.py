@@ -0,0 +1,162 @@
+import unittest
+
+import backend
+import eventloop
+import exclusion
+import windowinfo
+from fakebackend import FakeBackend
+from freespace import FreeSpaceMap
+from windowcache import WindowCache
+from windowinfo import WindowArray
+
+
+class TestWindowCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.fake = FakeBackend()
+        self.old_backend = backend.set_backend(self.fake)
+        self.cache = WindowCache()
+    
+    def tearDown(self):
+        self.cache.stop()
+        backend.set_backend(self.old_backend)
+    
+    def titles(self):
+        return sorted(win.title for win in self.cache.snapshot())
+    
+    def test_events(self):
+        win1 = self.fake.add_window("win1", (0, 0, 100, 100))
+        self.cache.start(periodic_resync=False)
+        self.assertEqual(self.titles(), ["win1"])
+        
+        win2 = self.fake.add_window("win2", (100, 0, 200, 100))
+        self.fake.add_window("", (100, 0, 200, 100))
+        self.assertEqual(self.titles(), ["win1", "win2"])
+        
+        self.fake.move_window(win2, (300, 0, 400, 100))
+        self.assertEqual([win.position for win in self.cache.snapshot()
+                          if win.hwnd == win2], [(300, 0, 400, 100)])
+        
+        self.fake.update_window(win1, iconic=True)
+        self.assertEqual(self.titles(), ["win2"])
+        self.fake.update_window(win1, iconic=False, title="renamed")
+        self.assertEqual(self.titles(), ["renamed", "win2"])
+        
+        self.fake.remove_window(win2)
+        self.assertEqual(self.titles(), ["renamed"])
+    
+    def test_snapshot(self):
+        win1 = self.fake.add_window("win1", (0, 0, 100, 100))
+        self.cache.start(periodic_resync=False)
+        snapshot = self.cache.snapshot()
+        self.assertIsInstance(snapshot, WindowArray)
+        self.assertEqual(snapshot.hwnds, [win1])
+        self.assertEqual(snapshot.maximised, [False])
+        self.assertIs(self.cache.snapshot(), snapshot)
+        
+        self.fake.move_window(win1, (0, 0, 50, 50))
+        self.assertEqual(list(self.cache.snapshot().rects()), [(0, 0, 50, 50)])
+        self.assertEqual(list(snapshot.rects()), [(0, 0, 100, 100)])
+    
+    def test_z_ordered(self):
+        win1 = self.fake.add_window("win1", (0, 0, 300, 600))
+        win2 = self.fake.add_window("win2", (200, 0, 500, 600))
+        self.cache.start(periodic_resync=False)
+        #Created and raised after the resync
+        win3 = self.fake.add_window("win3", (700, 0, 800, 100))
+        self.fake.set_foreground_window(win1)
+        expected = [win.hwnd for win in windowinfo.get_active_windows()]
+        self.assertEqual(expected, [win1, win3, win2])
+        self.assertNotEqual(self.cache.snapshot().hwnds, expected)
+        self.assertEqual(self.cache.z_ordered().hwnds, expected)
+        
+        #So fill_all fills as without the cache
+        moved = windowinfo.fill_all_windows(windows=self.cache.z_ordered)
+        self.fake.move_window(win1, (0, 0, 300, 600))
+        self.fake.move_window(win2, (200, 0, 500, 600))
+        self.fake.move_window(win3, (700, 0, 800, 100))
+        self.assertEqual(windowinfo.fill_all_windows(), moved)
+    
+    def test_resync(self):
+        win1 = self.fake.add_window("win1", (0, 0, 100, 100))
+        self.cache.start(periodic_resync=False)
+        
+        #Changed without an event
+        self.fake.get_window(win1).title = "missed"
+        self.assertEqual(self.titles(), ["win1"])
+        self.cache.resync()
+        self.assertEqual(self.titles(), ["missed"])
+    
+    def test_scheduled_resync(self):
+        win1 = self.fake.add_window("win1", (0, 0, 100, 100))
+        events = eventloop.EventLoop()
+        self.cache = WindowCache(resync_interval=0.01)
+        self.cache.start(scheduler=events)
+        self.fake.get_window(win1).title = "missed"
+        
+        def check():
+            if self.titles() == ["missed"]:
+                events.stop()
+        events.call_every(0.01, check)
+        events.call_later(5, events.stop)
+        try:
+            events.run()
+        finally:
+            events.close()
+        self.assertEqual(self.titles(), ["missed"])
+        self.cache.stop()
+    
+    def test_exclusion(self):
+        win1 = self.fake.add_window("win1", (0, 0, 100, 100))
+        self.cache.start(periodic_resync=False)
+        self.assertTrue(exclusion.is_tracking())
+        
+        #Verdicts change with the titles reported by events
+        self.fake.update_window(win1, title="")
+        self.assertEqual(self.titles(), [])
+        self.fake.update_window(win1, title="win1")
+        self.assertEqual(self.titles(), ["win1"])
+        
+        self.cache.stop()
+        self.assertFalse(exclusion.is_tracking())
+    
+    def test_free_map(self):
+        area = (0, 0, 800, 600)
+        win1 = self.fake.add_window("win1", (0, 0, 100, 100))
+        win2 = self.fake.add_window("win2", (300, 200, 500, 400))
+        self.cache.start(periodic_resync=False)
+        
+        def expected(exclude=None):
+            windows = [win for win in self.cache.snapshot()
+                       if win.hwnd != exclude]
+            return sorted(FreeSpaceMap(windows, area).rectangles)
+        
+        free_map = self.cache.free_map(area)
+        self.assertEqual(sorted(free_map.rectangles), expected())
+        #Kept up to date by the window events
+        self.fake.move_window(win2, (100, 100, 400, 300))
+        win3 = self.fake.add_window("win3", (600, 0, 700, 500))
+        self.fake.remove_window(win1)
+        self.assertIs(self.cache.free_map(area), free_map)
+        self.assertEqual(sorted(free_map.rectangles), expected())
+        #Leaving out the window being filled
+        self.assertIs(self.cache.free_map(area, win3), free_map)
+        self.assertEqual(sorted(free_map.rectangles), expected(win3))
+        self.fake.move_window(win3, (0, 400, 800, 500))
+        self.assertEqual(sorted(free_map.rectangles), expected(win3))
+        self.assertIs(self.cache.free_map(area, win2), free_map)
+        self.assertEqual(sorted(free_map.rectangles), expected(win2))
+        
+        self.cache.resync()
+        self.assertIs(self.cache.free_map(area, win2), free_map)
+        self.assertIsNot(self.cache.free_map((0, 0, 400, 300)), free_map)
+    
+    def test_stop(self):
+        self.cache.start(periodic_resync=False)
+        self.cache.stop()
+        self.fake.add_window("win1", (0, 0, 100, 100))
+        self.assertEqual(self.titles(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
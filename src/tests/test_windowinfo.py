@@ -1,6 +1,13 @@
+import random
 import unittest
 
+import backend
+import candidates
+import metrics
+import occupancy
 import windowinfo as w
+from fakebackend import FakeBackend
+from spatialindex import WindowIndex
 
 class TestWindowInfo(unittest.TestCase):
 
@@ -32,6 +39,378 @@ class TestWindowInfo(unittest.TestCase):
         self.assertEqual(w.fill_space([win1, win2], desktop_size, (250, 250)),
                          (0, 200, desktop_size[0], 300))
     
+    def test_fill_space_engines_agree(self):
+        desktop_size = 800, 600
+        wins = [w.Window.create_dummy("win1", (100, 100, 200, 200)),
+                w.Window.create_dummy("win2", (300, 300, 400, 400)),
+                w.Window.create_dummy("win3", (500, 0, 700, 250))]
+        
+        for position in [(250, 250), (450, 50), (750, 500)]:
+            self.assertEqual(w.fill_space(wins, desktop_size, position, 'exact'),
+                             w.fill_space(wins, desktop_size, position, 'legacy'))
+        
+        self.assertIsNone(w.fill_space(wins, desktop_size, (150, 150), 'exact'))
+        with self.assertRaises(ValueError):
+            w.fill_space(wins, desktop_size, (0, 0), 'no such engine')
+    
+    def test_fill_space_engines_random(self):
+        """The exact and numpy engines agree on random layouts"""
+        rng = random.Random(1)
+        desktop_size = 640, 480
+        for _ in range(10):
+            wins = []
+            for i in range(rng.randrange(1, 12)):
+                left, top = rng.randrange(-50, 600), rng.randrange(-50, 450)
+                wins.append(w.Window.create_dummy(str(i), (
+                    left, top, left + rng.randrange(1, 250),
+                    top + rng.randrange(1, 250))))
+            for _ in range(10):
+                position = rng.randrange(0, 641), rng.randrange(0, 481)
+                self.assertEqual(
+                    w.fill_space(wins, desktop_size, position, 'numpy'),
+                    w.fill_space(wins, desktop_size, position, 'exact'))
+    
+    def test_fill_space_area(self):
+        """The fill is bounded by an area that may not start at (0, 0)"""
+        area = (-1920, 40, 0, 1080)
+        win1 = w.Window.create_dummy("win1", (-1000, 500, -500, 700))
+        
+        for engine in w.FILL_ENGINES:
+            self.assertEqual(w.fill_space([win1], area, (-200, 600), engine),
+                             (-500, 40, 0, 1080))
+            self.assertEqual(w.fill_space([win1], area, (-750, 300), engine),
+                             (-1920, 40, 0, 500))
+    
+    def test_fill_space_numpy_layout_change(self):
+        """The grid kept from the last fill is not used for another layout"""
+        desktop_size = 800, 600
+        wins = [w.Window.create_dummy("win1", (100, 100, 200, 200))]
+        self.assertEqual(w.fill_space_numpy(wins, desktop_size, (300, 150)),
+                         (200, 0, 800, 600))
+        wins = [w.Window.create_dummy("win1", (400, 100, 500, 200))]
+        self.assertEqual(w.fill_space_numpy(wins, desktop_size, (300, 150)),
+                         (0, 0, 400, 600))
+        self.assertEqual(w.fill_space_numpy(wins, (0, 0, 350, 600),
+                                            (300, 150)), (0, 0, 350, 600))
+    
+    def test_fill_space_with_index(self):
+        desktop_size = 800, 600
+        wins = [w.Window.create_dummy("win1", (100, 100, 200, 200)),
+                w.Window.create_dummy("win2", (300, 300, 400, 400))]
+        index = WindowIndex(wins, cell_size=32)
+        
+        self.assertFalse(w.is_empty(index, (150, 150)))
+        for engine in w.FILL_ENGINES:
+            self.assertEqual(w.fill_space(index, desktop_size, (250, 250), engine),
+                             w.fill_space(wins, desktop_size, (250, 250), engine))
+    
+    def test_index_windows(self):
+        wins = [w.Window.create_dummy("win1", (100, 100, 200, 200))]
+        self.assertIsInstance(w.index_windows(wins, 'legacy'), WindowIndex)
+        self.assertIs(w.index_windows(wins, 'exact'), wins)
+        self.assertIs(w.index_windows(wins, 'numpy'), wins)
+        array = w.WindowArray.from_windows(wins)
+        self.assertIs(w.index_windows(array, 'legacy'), array)
+    
+    def test_prune_occluded_per_layout(self):
+        """Hidden windows are pruned once per layout"""
+        top = w.Window.create_dummy("top", (100, 100, 300, 300))
+        hidden = w.Window.create_dummy("hidden", (150, 150, 250, 250))
+        pruned = w._prune_occluded([top, hidden])
+        self.assertEqual(pruned, [top])
+        self.assertIs(w._prune_occluded([top, hidden]), pruned)
+        
+        moved = w.Window.create_dummy("hidden", (250, 250, 350, 350))
+        self.assertEqual(w._prune_occluded([top, moved]), [top, moved])
+    
+    def test_fill_space_exact_gaps(self):
+        """The legacy fill probes every 10th column and jumps over rows"""
+        desktop_size = 800, 600
+        narrow = w.Window.create_dummy("narrow", (103, 0, 107, 100))
+        self.assertEqual(w.fill_space([narrow], desktop_size, (300, 300), 'exact'),
+                         (0, 100, desktop_size[0], desktop_size[1]))
+        
+        win1 = w.Window.create_dummy("win1", (100, 100, 200, 200))
+        win2 = w.Window.create_dummy("win2", (300, 300, 400, 400))
+        self.assertEqual(w.fill_space([win1, win2], desktop_size, (300, 150),
+                                      'exact'),
+                         (200, 0, desktop_size[0], 300))
+    
+    def test_fill_space_many(self):
+        """Each result is the same as filling the point on its own"""
+        rng = random.Random(20)
+        area = (-40, 20, 280, 260)
+        for _ in range(3):
+            wins = []
+            for i in range(rng.randrange(1, 12)):
+                left, top = rng.randrange(-60, 260), rng.randrange(0, 240)
+                wins.append(w.Window.create_dummy(str(i), (
+                    left, top, left + rng.randrange(1, 120),
+                    top + rng.randrange(1, 120))))
+            #Points on the edges and outside the area, some repeated
+            points = [(rng.randrange(-50, 291), rng.randrange(10, 271))
+                      for _ in range(60)]
+            points += [(win.left, win.bottom) for win in wins] + points[:5]
+            for engine in w.FILL_ENGINES:
+                expected = [w.fill_space(wins, area, point, engine)
+                            for point in points]
+                self.assertEqual(w.fill_space_many(wins, area, points, engine),
+                                 expected)
+                have_numpy, occupancy.HAVE_NUMPY = occupancy.HAVE_NUMPY, False
+                try:
+                    self.assertEqual(
+                        w.fill_space_many(wins, area, points, engine), expected)
+                finally:
+                    occupancy.HAVE_NUMPY = have_numpy
+        
+        self.assertEqual(w.fill_space_many([], (800, 600), []), [])
+        with self.assertRaises(ValueError):
+            w.fill_space_many([], (800, 600), [(0, 0)], 'no such engine')
+    
+    def test_window_array(self):
+        """A WindowArray fills the same as the list of its windows"""
+        rng = random.Random(25)
+        area = (-40, 20, 280, 260)
+        for _ in range(3):
+            wins = []
+            for i in range(rng.randrange(0, 12)):
+                left, top = rng.randrange(-60, 260), rng.randrange(0, 240)
+                wins.append(w.Window.create_dummy(str(i), (
+                    left, top, left + rng.randrange(1, 120),
+                    top + rng.randrange(1, 120))))
+            windows = w.WindowArray.from_windows(wins)
+            self.assertEqual(list(windows), wins)
+            points = [(rng.randrange(-50, 291), rng.randrange(10, 271))
+                      for _ in range(40)]
+            #With and without the array operations
+            for min_windows in (0, 1000):
+                numpy_min, w.NUMPY_MIN_WINDOWS = (w.NUMPY_MIN_WINDOWS,
+                                                  min_windows)
+                windows = w.WindowArray.from_windows(wins)
+                try:
+                    for point in points:
+                        self.assertEqual(w.is_empty(windows, point),
+                                         w.is_empty(wins, point))
+                        for engine in w.FILL_ENGINES:
+                            self.assertEqual(
+                                w.fill_space(windows, area, point, engine),
+                                w.fill_space(wins, area, point, engine))
+                    for engine in w.FILL_ENGINES:
+                        self.assertEqual(
+                            w.fill_space_many(windows, area, points, engine),
+                            w.fill_space_many(wins, area, points, engine))
+                finally:
+                    w.NUMPY_MIN_WINDOWS = numpy_min
+        
+        empty = w.WindowArray()
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(w.fill_space(empty, (800, 600), (5, 5)),
+                         (0, 0, 800, 600))
+    
+
+class TestFillForegroundWindow(unittest.TestCase):
+    
+    def setUp(self):
+        self.fake = FakeBackend(desktop_size=(800, 640))
+        self.old_backend = backend.set_backend(self.fake)
+    
+    def tearDown(self):
+        backend.set_backend(self.old_backend)
+    
+    def test_get_active_windows(self):
+        self.fake.add_window("win1", (100, 100, 200, 200))
+        self.fake.add_window("", (0, 0, 10, 10))
+        self.fake.add_window("Program Manager", (0, 0, 800, 640))
+        self.fake.add_window("hidden", (0, 0, 10, 10), visible=False)
+        self.fake.add_window("minimised", (0, 0, 10, 10), iconic=True)
+        
+        self.assertEqual([win.title for win in w.get_active_windows()],
+                         ["win1"])
+    
+    def test_get_active_windows_fetches_lazily(self):
+        calls = []
+        for name in ('get_window_title', 'get_window_rect', 'is_zoomed'):
+            def counted(hwnd, name=name, method=getattr(self.fake, name)):
+                calls.append(name)
+                return method(hwnd)
+            setattr(self.fake, name, counted)
+        
+        self.fake.add_window("win1", (100, 100, 200, 200))
+        self.fake.add_window("hidden", (0, 0, 10, 10), visible=False)
+        self.fake.add_window("minimised", (0, 0, 10, 10), iconic=True)
+        
+        wins = w.get_active_windows()
+        self.assertEqual(calls, ['get_window_title'])
+        self.assertEqual(wins[0].position, (100, 100, 200, 200))
+        self.assertEqual(wins[0].right, 200)
+        self.assertEqual(calls, ['get_window_title', 'get_window_rect'])
+    
+    def test_window_array_fetches_lazily(self):
+        win1 = self.fake.add_window("win1", (100, 100, 200, 200))
+        win2 = self.fake.add_window("win2", (300, 100, 400, 200))
+        windows = w.WindowArray([(100, 100, 200, 200), (300, 100, 400, 200)],
+                                [win1, win2])
+        self.assertEqual(windows.titles, [None, None])
+        self.assertEqual(windows[1].title, "win2")
+        self.assertEqual(windows.titles, [None, "win2"])
+        self.assertEqual(windows[0].hwnd, win1)
+        self.assertEqual(windows[0].position, (100, 100, 200, 200))
+        
+        #Titles not fetched yet stay so
+        wins = [w.Window(win1), w.Window(win2, "win2")]
+        windows = w.WindowArray.from_windows(wins)
+        self.assertEqual(windows.titles, [None, "win2"])
+        self.assertEqual([win.title for win in windows], ["win1", "win2"])
+        self.assertEqual(w.fill_space(windows, (800, 640), (250, 150)),
+                         (200, 0, 300, 640))
+        
+        selected = windows.select([1])
+        self.assertEqual(list(selected.rects()), [(300, 100, 400, 200)])
+        self.assertEqual(selected.hwnds, [win2])
+        self.assertEqual(selected[0].title, "win2")
+    
+    def test_move_batch(self):
+        win1 = self.fake.add_window("win1", (0, 0, 100, 100))
+        win2 = self.fake.add_window("win2", (100, 0, 200, 100))
+        still = self.fake.add_window("still", (200, 0, 300, 100))
+        zoomed = self.fake.add_window("zoomed", (0, 0, 800, 600), zoomed=True)
+        moved = []
+        self.fake.watch_windows(lambda hwnd, destroyed: moved.append(
+            (hwnd, self.fake.get_window_rect(win2))))
+        
+        batch = w.MoveBatch()
+        self.assertTrue(batch.add(w.Window(win1), (0, 0, 50, 50)))
+        self.assertTrue(batch.add(w.Window(win2), (50, 0, 100, 50)))
+        self.assertFalse(batch.add(w.Window(still), (200, 0, 300, 100)))
+        self.assertFalse(batch.add(w.Window(zoomed), (0, 0, 10, 10)))
+        self.assertEqual(len(batch), 2)
+        self.assertEqual(moved, [])
+        
+        self.assertEqual(batch.commit(), 2)
+        #All windows were moved before the first notification
+        self.assertEqual(moved, [(win1, (50, 0, 100, 50)),
+                                 (win2, (50, 0, 100, 50))])
+        self.assertEqual(self.fake.get_window_rect(win1), (0, 0, 50, 50))
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(batch.commit(), 0)
+    
+    def test_fill_foreground_window(self):
+        self.fake.add_window("win1", (100, 100, 200, 200))
+        self.fake.add_window("win2", (300, 300, 400, 400))
+        fore = self.fake.add_window("fore", (500, 500, 550, 550))
+        self.fake.set_foreground_window(fore)
+        self.fake.cursor_pos = (250, 250)
+        
+        w.fill_foreground_window()
+        self.assertEqual(self.fake.get_window_rect(fore), (0, 200, 800, 300))
+    
+    def test_fill_foreground_window_array(self):
+        self.fake.add_window("win1", (100, 100, 200, 200))
+        self.fake.add_window("win2", (300, 300, 400, 400))
+        self.fake.add_window("other monitor", (900, 0, 1000, 100))
+        fore = self.fake.add_window("fore", (500, 500, 550, 550))
+        self.fake.set_foreground_window(fore)
+        self.fake.cursor_pos = (250, 250)
+        windows = w.WindowArray.from_windows(w.get_active_windows())
+        
+        for engine in list(w.FILL_ENGINES) + [w.CANDIDATES_ENGINE]:
+            self.fake.move_window(fore, (500, 500, 550, 550))
+            rect = w.fill_foreground_window(engine, windows)
+            self.fake.move_window(fore, (500, 500, 550, 550))
+            self.assertEqual(w.fill_foreground_window(
+                             engine, list(windows)), rect)
+        self.assertEqual(self.fake.get_window_rect(fore), rect)
+    
+    def test_fill_foreground_window_candidates(self):
+        self.fake.add_window("win1", (100, 100, 200, 200))
+        self.fake.add_window("win2", (300, 300, 400, 400))
+        fore = self.fake.add_window("fore", (500, 500, 550, 550))
+        self.fake.set_foreground_window(fore)
+        self.fake.cursor_pos = (250, 250)
+        
+        policy = candidates.DEFAULT_POLICY._replace(aspect_weight=0)
+        w.fill_foreground_window(w.CANDIDATES_ENGINE, policy=policy)
+        self.assertEqual(self.fake.get_window_rect(fore), (200, 0, 800, 300))
+    
+    def test_fill_foreground_window_timings(self):
+        self.fake.add_window("win1", (100, 100, 200, 200))
+        fore = self.fake.add_window("fore", (500, 500, 550, 550))
+        self.fake.set_foreground_window(fore)
+        self.fake.cursor_pos = (250, 250)
+        
+        metrics.enable()
+        try:
+            w.fill_foreground_window(windows=w.get_active_windows)
+            timings = metrics.get_percentiles()
+        finally:
+            metrics.disable()
+            metrics.reset()
+        self.assertEqual(sorted(timings), ['cursor', 'enumerate', 'fill',
+                                           'filter', 'move', 'total'])
+    
+    def test_fill_foreground_window_monitor(self):
+        self.fake.set_monitors([((0, 0, 800, 640), (0, 0, 800, 600), True),
+                                ((800, 0, 1600, 640), (800, 0, 1600, 640),
+                                 False)])
+        self.fake.add_window("win1", (100, 100, 200, 200))
+        fore = self.fake.add_window("fore", (500, 500, 550, 550))
+        self.fake.set_foreground_window(fore)
+        self.fake.cursor_pos = (1000, 300)
+        
+        w.fill_foreground_window()
+        self.assertEqual(self.fake.get_window_rect(fore), (800, 0, 1600, 640))
+    
+    def test_fill_all_windows(self):
+        win1 = self.fake.add_window("win1", (100, 100, 200, 200))
+        win2 = self.fake.add_window("win2", (300, 100, 400, 200))
+        self.fake.add_window("zoomed", (0, 0, 800, 600), zoomed=True)
+        
+        #win2 is on top, so it is filled first and blocks win1
+        expected = {win2: (200, 0, 800, 600), win1: (0, 0, 200, 600)}
+        self.assertEqual(w.fill_all_windows(), expected)
+        self.assertEqual(self.fake.get_window_rect(win1), (0, 0, 200, 600))
+        self.assertEqual(self.fake.get_window_rect(win2), (200, 0, 800, 600))
+        #Nothing left to fill
+        self.assertEqual(w.fill_all_windows(), {})
+        
+        self.assertRaises(ValueError, w.fill_all_windows, 'random')
+    
+    def test_fill_all_windows_order(self):
+        small = self.fake.add_window("small", (100, 100, 150, 150))
+        large = self.fake.add_window("large", (300, 100, 500, 300))
+        
+        self.assertEqual(w.fill_all_windows('largest'),
+                         {large: (0, 150, 800, 600), small: (0, 0, 800, 150)})
+        self.fake.update_window(small, rect=(100, 100, 150, 150))
+        self.fake.update_window(large, rect=(300, 100, 500, 300))
+        self.assertEqual(w.fill_all_windows('smallest'),
+                         {small: (0, 0, 300, 600), large: (300, 0, 800, 600)})
+    
+    def test_fill_all_windows_without_numpy(self):
+        self.fake.add_window("covered", (120, 120, 180, 180))
+        self.fake.add_window("win1", (100, 100, 200, 200))
+        self.fake.add_window("win2", (150, 300, 250, 400))
+        with_numpy = w.fill_all_windows(windows=w.get_active_windows())
+        
+        for hwnd in (1, 2, 3):
+            self.fake.update_window(hwnd, rect={1: (120, 120, 180, 180),
+                                                2: (100, 100, 200, 200),
+                                                3: (150, 300, 250, 400)}[hwnd])
+        have_numpy, occupancy.HAVE_NUMPY = occupancy.HAVE_NUMPY, False
+        try:
+            without_numpy = w.fill_all_windows()
+        finally:
+            occupancy.HAVE_NUMPY = have_numpy
+        self.assertEqual(with_numpy, without_numpy)
+    
+    def test_full_screen_is_not_moved(self):
+        fore = self.fake.add_window("fore", (0, 0, 800, 640))
+        self.fake.set_foreground_window(fore)
+        self.fake.cursor_pos = (250, 250)
+        
+        w.fill_foreground_window()
+        self.assertEqual(self.fake.get_window_rect(fore), (0, 0, 800, 640))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,475 @@
+'''
+Provides: Win32Backend
+
+Win32 reference:
+EnumWindows
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms633497%28v=vs.85%29.aspx
+MoveWindow
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms633534%28v=vs.85%29.aspx
+BeginDeferWindowPos, DeferWindowPos & EndDeferWindowPos
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms632672%28v=vs.85%29.aspx
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms632681%28v=vs.85%29.aspx
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms633440%28v=vs.85%29.aspx
+GetCursorInfo
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms648389%28v=vs.85%29.aspx
+EnumDisplayMonitors & GetMonitorInfo
+    https://msdn.microsoft.com/en-us/library/windows/desktop/dd162610%28v=vs.85%29.aspx
+    https://msdn.microsoft.com/en-us/library/windows/desktop/dd144901%28v=vs.85%29.aspx
+WM_DISPLAYCHANGE & WM_SETTINGCHANGE
+    https://msdn.microsoft.com/en-us/library/windows/desktop/dd145210%28v=vs.85%29.aspx
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms725497%28v=vs.85%29.aspx
+SetTimer & KillTimer
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms644906%28v=vs.85%29.aspx
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms644903%28v=vs.85%29.aspx
+GetClassName
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms633582%28v=vs.85%29.aspx
+GetWindowThreadProcessId, OpenProcess & QueryFullProcessImageName
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms633522%28v=vs.85%29.aspx
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms684320%28v=vs.85%29.aspx
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms684919%28v=vs.85%29.aspx
+MsgWaitForMultipleObjectsEx, PeekMessage & CreateEvent
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms684245%28v=vs.85%29.aspx
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms644943%28v=vs.85%29.aspx
+    https://msdn.microsoft.com/en-us/library/windows/desktop/ms682396%28v=vs.85%29.aspx
+SetWinEventHook & Event constants
+    https://msdn.microsoft.com/en-us/library/windows/desktop/dd373640%28v=vs.85%29.aspx
+    https://msdn.microsoft.com/en-us/library/windows/desktop/dd318066%28v=vs.85%29.aspx
+'''
+
+import ctypes  # @UnusedImport
+import ctypes.wintypes
+import logging
+import math
+import ntpath
+import time
+
+from backend import Backend
+
+logging = logging.getLogger(__name__)
+
+#Hwnds are HWND (so plain ints) everywhere, so that they hash and compare
+#equal whichever API returned them
+EnumWindowsProc = ctypes.WINFUNCTYPE(ctypes.wintypes.BOOL,
+                                     ctypes.wintypes.HWND,
+                                     ctypes.wintypes.LPARAM)
+WinEventProc = ctypes.WINFUNCTYPE(None, ctypes.wintypes.HANDLE,
+                                  ctypes.wintypes.DWORD, ctypes.wintypes.HWND,
+                                  ctypes.wintypes.LONG, ctypes.wintypes.LONG,
+                                  ctypes.wintypes.DWORD, ctypes.wintypes.DWORD)
+MonitorEnumProc = ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.wintypes.HMONITOR,
+                                     ctypes.wintypes.HDC,
+                                     ctypes.POINTER(ctypes.wintypes.RECT),
+                                     ctypes.wintypes.LPARAM)
+WNDPROC = ctypes.WINFUNCTYPE(ctypes.wintypes.LPARAM, ctypes.wintypes.HWND,
+                             ctypes.wintypes.UINT, ctypes.wintypes.WPARAM,
+                             ctypes.wintypes.LPARAM)
+
+TIMERPROC = ctypes.WINFUNCTYPE(None, ctypes.wintypes.HWND,
+                               ctypes.wintypes.UINT, ctypes.c_size_t,
+                               ctypes.wintypes.DWORD)
+
+WM_SETTINGCHANGE = 0x001A
+WM_DISPLAYCHANGE = 0x007E
+WM_HOTKEY = 0x0312
+WM_QUIT = 0x0012
+PM_REMOVE = 0x0001
+QS_ALLINPUT = 0x04FF
+MWMO_INPUTAVAILABLE = 0x0004
+INFINITE = 0xFFFFFFFF
+WAIT_OBJECT_0 = 0x00000000
+WAIT_TIMEOUT = 0x00000102
+WAIT_FAILED = 0xFFFFFFFF
+SPI_SETWORKAREA = 0x002F
+MONITORINFOF_PRIMARY = 0x00000001
+NOTIFY_WINDOW_CLASS = 'WindowFillNotify'
+
+EVENT_SYSTEM_MINIMIZESTART = 0x0016
+EVENT_SYSTEM_MINIMIZEEND = 0x0017
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WATCHED_OBJECT_EVENTS = (EVENT_OBJECT_CREATE, EVENT_OBJECT_DESTROY,
+                         EVENT_OBJECT_SHOW, EVENT_OBJECT_HIDE,
+                         EVENT_OBJECT_LOCATIONCHANGE, EVENT_OBJECT_NAMECHANGE)
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+CHILDID_SELF = 0
+GA_ROOT = 2
+SWP_NOZORDER = 0x0004
+SWP_NOACTIVATE = 0x0010
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+#Longest class name (see WNDCLASS) and process path read
+MAX_CLASS_NAME = 256
+MAX_PATH_LENGTH = 32768
+
+
+class CURSORINFO(ctypes.Structure):
+    _fields_ = [('cbSize', ctypes.c_uint),
+                ('flags', ctypes.c_uint),
+                ('hCursor', ctypes.c_void_p),
+                ('ptScreenPos', ctypes.wintypes.POINT)]
+
+
+class MONITORINFO(ctypes.Structure):
+    _fields_ = [('cbSize', ctypes.wintypes.DWORD),
+                ('rcMonitor', ctypes.wintypes.RECT),
+                ('rcWork', ctypes.wintypes.RECT),
+                ('dwFlags', ctypes.wintypes.DWORD)]
+
+
+class WNDCLASSW(ctypes.Structure):
+    _fields_ = [('style', ctypes.wintypes.UINT),
+                ('lpfnWndProc', WNDPROC),
+                ('cbClsExtra', ctypes.c_int),
+                ('cbWndExtra', ctypes.c_int),
+                ('hInstance', ctypes.wintypes.HINSTANCE),
+                ('hIcon', ctypes.wintypes.HICON),
+                ('hCursor', ctypes.wintypes.HANDLE),
+                ('hbrBackground', ctypes.wintypes.HBRUSH),
+                ('lpszMenuName', ctypes.wintypes.LPCWSTR),
+                ('lpszClassName', ctypes.wintypes.LPCWSTR)]
+
+
+def _rect_tuple(rect):
+    return (rect.left, rect.top, rect.right, rect.bottom)
+
+
+class Win32Backend(Backend):
+    def __init__(self):
+        user32 = ctypes.windll.user32
+        self._EnumWindows = user32.EnumWindows
+        self._GetWindowText = user32.GetWindowTextW
+        self._GetWindowTextLength = user32.GetWindowTextLengthW
+        self._IsWindowVisible = user32.IsWindowVisible
+        self._GetWindowRect = user32.GetWindowRect
+        self._GetClassName = user32.GetClassNameW
+        self._GetWindowThreadProcessId = user32.GetWindowThreadProcessId
+        kernel32 = ctypes.windll.kernel32
+        self._OpenProcess = kernel32.OpenProcess
+        self._OpenProcess.restype = ctypes.wintypes.HANDLE
+        self._QueryFullProcessImageName = kernel32.QueryFullProcessImageNameW
+        self._QueryFullProcessImageName.argtypes = [
+            ctypes.wintypes.HANDLE, ctypes.wintypes.DWORD,
+            ctypes.wintypes.LPWSTR, ctypes.POINTER(ctypes.wintypes.DWORD)]
+        self._CloseHandle = kernel32.CloseHandle
+        self._CloseHandle.argtypes = [ctypes.wintypes.HANDLE]
+        self._GetDesktopWindow = user32.GetDesktopWindow
+        self._GetDesktopWindow.restype = ctypes.wintypes.HWND
+        self._IsIconic = user32.IsIconic
+        self._IsZoomed = user32.IsZoomed
+        self._GetForegroundWindow = user32.GetForegroundWindow
+        self._GetForegroundWindow.restype = ctypes.wintypes.HWND
+        self._MoveWindow = user32.MoveWindow
+        self._BeginDeferWindowPos = user32.BeginDeferWindowPos
+        self._BeginDeferWindowPos.restype = ctypes.wintypes.HANDLE
+        self._DeferWindowPos = user32.DeferWindowPos
+        self._DeferWindowPos.argtypes = [ctypes.wintypes.HANDLE,
+                                         ctypes.wintypes.HWND,
+                                         ctypes.wintypes.HWND,
+                                         ctypes.c_int, ctypes.c_int,
+                                         ctypes.c_int, ctypes.c_int,
+                                         ctypes.wintypes.UINT]
+        self._DeferWindowPos.restype = ctypes.wintypes.HANDLE
+        self._EndDeferWindowPos = user32.EndDeferWindowPos
+        self._EndDeferWindowPos.argtypes = [ctypes.wintypes.HANDLE]
+        self._GetCursorInfo = user32.GetCursorInfo
+        self._GetCursorInfo.argtypes = [ctypes.POINTER(CURSORINFO)]
+        self._RegisterHotKey = user32.RegisterHotKey
+        self._UnregisterHotKey = user32.UnregisterHotKey
+        self._GetMessage = user32.GetMessageW
+        self._PeekMessage = user32.PeekMessageW
+        self._MsgWaitForMultipleObjectsEx = user32.MsgWaitForMultipleObjectsEx
+        self._MsgWaitForMultipleObjectsEx.argtypes = [
+            ctypes.wintypes.DWORD, ctypes.POINTER(ctypes.wintypes.HANDLE),
+            ctypes.wintypes.DWORD, ctypes.wintypes.DWORD,
+            ctypes.wintypes.DWORD]
+        self._MsgWaitForMultipleObjectsEx.restype = ctypes.wintypes.DWORD
+        self._SetEvent = kernel32.SetEvent
+        self._SetEvent.argtypes = [ctypes.wintypes.HANDLE]
+        kernel32.CreateEventW.restype = ctypes.wintypes.HANDLE
+        #Auto-reset, so that a wake ends a single wait
+        self._wake_event = kernel32.CreateEventW(None, False, False, None)
+        self._SetTimer = user32.SetTimer
+        self._SetTimer.argtypes = [ctypes.wintypes.HWND, ctypes.c_size_t,
+                                   ctypes.wintypes.UINT, TIMERPROC]
+        self._SetTimer.restype = ctypes.c_size_t
+        self._KillTimer = user32.KillTimer
+        self._KillTimer.argtypes = [ctypes.wintypes.HWND, ctypes.c_size_t]
+        self._timer_procs = {} #{timer id: TIMERPROC}, kept alive while set
+        self._SetWinEventHook = user32.SetWinEventHook
+        self._SetWinEventHook.restype = ctypes.wintypes.HANDLE
+        self._UnhookWinEvent = user32.UnhookWinEvent
+        self._UnhookWinEvent.argtypes = [ctypes.wintypes.HANDLE]
+        self._GetAncestor = user32.GetAncestor
+        self._GetAncestor.argtypes = [ctypes.wintypes.HWND, ctypes.wintypes.UINT]
+        self._GetAncestor.restype = ctypes.wintypes.HWND
+        self._event_hooks = []
+        self._event_proc = None
+        self._TranslateMessage = user32.TranslateMessage
+        self._DispatchMessage = user32.DispatchMessageW
+        self._EnumDisplayMonitors = user32.EnumDisplayMonitors
+        self._GetMonitorInfo = user32.GetMonitorInfoW
+        self._GetMonitorInfo.argtypes = [ctypes.wintypes.HMONITOR,
+                                         ctypes.POINTER(MONITORINFO)]
+        self._RegisterClass = user32.RegisterClassW
+        self._UnregisterClass = user32.UnregisterClassW
+        self._CreateWindowEx = user32.CreateWindowExW
+        self._CreateWindowEx.restype = ctypes.wintypes.HWND
+        self._DestroyWindow = user32.DestroyWindow
+        self._DefWindowProc = user32.DefWindowProcW
+        self._DefWindowProc.argtypes = [ctypes.wintypes.HWND,
+                                        ctypes.wintypes.UINT,
+                                        ctypes.wintypes.WPARAM,
+                                        ctypes.wintypes.LPARAM]
+        self._DefWindowProc.restype = ctypes.wintypes.LPARAM
+        self._hinstance = ctypes.windll.kernel32.GetModuleHandleW(None)
+        self._notify_hwnd = None
+        self._window_proc = None
+
+    def enum_windows(self):
+        hwnds = []
+        def foreach_window(hwnd, lParam):
+            hwnds.append(hwnd)
+            return True
+        self._EnumWindows(EnumWindowsProc(foreach_window), 0)
+        return hwnds
+
+    def get_window_title(self, hwnd):
+        length = self._GetWindowTextLength(hwnd)
+        buff = ctypes.create_unicode_buffer(length + 1)
+        self._GetWindowText(hwnd, buff, length+1)
+        return buff.value
+
+    def get_window_rect(self, hwnd):
+        rect = ctypes.wintypes.RECT()
+        self._GetWindowRect(hwnd, ctypes.pointer(rect))
+        return _rect_tuple(rect)
+
+    def get_window_class(self, hwnd):
+        buff = ctypes.create_unicode_buffer(MAX_CLASS_NAME)
+        self._GetClassName(hwnd, buff, MAX_CLASS_NAME)
+        return buff.value
+
+    def get_process_name(self, hwnd):
+        pid = ctypes.wintypes.DWORD()
+        self._GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        process = self._OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False,
+                                    pid)
+        if not process:
+            return ''
+        try:
+            buff = ctypes.create_unicode_buffer(MAX_PATH_LENGTH)
+            size = ctypes.wintypes.DWORD(MAX_PATH_LENGTH)
+            if not self._QueryFullProcessImageName(process, 0, buff,
+                                                   ctypes.byref(size)):
+                return ''
+            return ntpath.basename(buff.value)
+        finally:
+            self._CloseHandle(process)
+
+    def is_iconic(self, hwnd):
+        return bool(self._IsIconic(hwnd))
+
+    def is_zoomed(self, hwnd):
+        return bool(self._IsZoomed(hwnd))
+
+    def is_visible(self, hwnd):
+        return bool(self._IsWindowVisible(hwnd))
+
+    def get_foreground_window(self):
+        return self._GetForegroundWindow()
+
+    def get_desktop_rect(self):
+        return self.get_window_rect(self._GetDesktopWindow())
+
+    def get_monitors(self):
+        monitors = []
+        def foreach_monitor(hmonitor, hdc, rect, lParam):
+            info = MONITORINFO()
+            info.cbSize = ctypes.sizeof(info)
+            if self._GetMonitorInfo(hmonitor, ctypes.byref(info)):
+                monitors.append((_rect_tuple(info.rcMonitor),
+                                 _rect_tuple(info.rcWork),
+                                 bool(info.dwFlags & MONITORINFOF_PRIMARY)))
+            return True
+        self._EnumDisplayMonitors(None, None, MonitorEnumProc(foreach_monitor),
+                                  0)
+        return monitors
+
+    def watch_displays(self, callback):
+        """Create a hidden window to receive the display change broadcasts"""
+        self.unwatch_displays()
+
+        def window_proc(hwnd, message, wParam, lParam):
+            if (message == WM_DISPLAYCHANGE or
+                    (message == WM_SETTINGCHANGE and wParam == SPI_SETWORKAREA)):
+                try:
+                    callback()
+                except Exception as e:
+                    logging.error("Display change handler failed: {}".format(e))
+            return self._DefWindowProc(hwnd, message, wParam, lParam)
+
+        #Keep a reference, the window procedure must outlive the window
+        self._window_proc = WNDPROC(window_proc)
+        wndclass = WNDCLASSW()
+        wndclass.lpfnWndProc = self._window_proc
+        wndclass.hInstance = self._hinstance
+        wndclass.lpszClassName = NOTIFY_WINDOW_CLASS
+        if not self._RegisterClass(ctypes.byref(wndclass)):
+            logging.error("Failed to register the notification window class")
+            return
+        self._notify_hwnd = self._CreateWindowEx(
+            0, NOTIFY_WINDOW_CLASS, 'Window Fill', 0, 0, 0, 0, 0,
+            None, None, self._hinstance, None)
+        if not self._notify_hwnd:
+            logging.error("Failed to create the notification window")
+
+    def unwatch_displays(self):
+        if self._notify_hwnd:
+            self._DestroyWindow(self._notify_hwnd)
+        if self._window_proc is not None:
+            self._UnregisterClass(NOTIFY_WINDOW_CLASS, self._hinstance)
+        self._notify_hwnd = None
+        self._window_proc = None
+
+    def move_window(self, hwnd, rect, repaint=True):
+        x, y = rect[0], rect[1]
+        width = rect[2] - rect[0]
+        height = rect[3] - rect[1]
+        self._MoveWindow(hwnd, x, y, width, height, repaint)
+
+    def move_windows(self, moves):
+        hdwp = self._BeginDeferWindowPos(len(moves))
+        for hwnd, rect in moves:
+            if hdwp:
+                hdwp = self._DeferWindowPos(hdwp, hwnd, None, rect[0], rect[1],
+                                            rect[2] - rect[0], rect[3] - rect[1],
+                                            SWP_NOZORDER | SWP_NOACTIVATE)
+            if not hdwp:
+                #The transaction was abandoned (eg. a window has gone)
+                logging.warning("Deferred move failed, moving one at a time")
+                for hwnd, rect in moves:
+                    self.move_window(hwnd, rect)
+                return
+        self._EndDeferWindowPos(hdwp)
+
+    def watch_windows(self, callback):
+        self.unwatch_windows()
+
+        def on_event(hook, event, hwnd, id_object, id_child, thread, time):
+            if id_object != OBJID_WINDOW or id_child != CHILDID_SELF or not hwnd:
+                return
+            if (event != EVENT_OBJECT_DESTROY and
+                    self._GetAncestor(hwnd, GA_ROOT) != hwnd):
+                return #Not a top-level window
+            if (event in WATCHED_OBJECT_EVENTS or
+                    event in (EVENT_SYSTEM_MINIMIZESTART,
+                              EVENT_SYSTEM_MINIMIZEEND)):
+                try:
+                    callback(hwnd, event == EVENT_OBJECT_DESTROY)
+                except Exception as e:
+                    logging.error("Window event handler failed: {}".format(e))
+
+        #Keep a reference, the callback must outlive the hooks
+        self._event_proc = WinEventProc(on_event)
+        flags = WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS
+        for event_min, event_max in (
+                (EVENT_SYSTEM_MINIMIZESTART, EVENT_SYSTEM_MINIMIZEEND),
+                (EVENT_OBJECT_CREATE, EVENT_OBJECT_NAMECHANGE)):
+            hook = self._SetWinEventHook(event_min, event_max, None,
+                                         self._event_proc, 0, 0, flags)
+            if hook:
+                self._event_hooks.append(hook)
+            else:
+                logging.error("Failed to set window event hook")
+
+    def unwatch_windows(self):
+        for hook in self._event_hooks:
+            self._UnhookWinEvent(hook)
+        self._event_hooks = []
+        self._event_proc = None
+
+    def get_cursor_pos(self):
+        # Initialize the output structure
+        info = CURSORINFO()
+        info.cbSize = ctypes.sizeof(info)
+
+        if self._GetCursorInfo(ctypes.byref(info)):
+            if info.flags & 0x00000001:
+                #The cursor is showing
+                return (info.ptScreenPos.x, info.ptScreenPos.y)
+            else:
+                logging.error("Cursor is not showing")
+        else:
+            # Error occurred (invalid structure size?)
+            logging.error("Invalid structure size??")
+
+    def register_hotkey(self, hid, modifiers, virtual_key):
+        return bool(self._RegisterHotKey(None, hid, modifiers, virtual_key))
+
+    def unregister_hotkey(self, hid):
+        return bool(self._UnregisterHotKey(None, hid))
+
+    def set_timer(self, interval, callback):
+        def on_timer(hwnd, message, timer_id, time):
+            try:
+                callback()
+            except Exception as e:
+                logging.error("Timer handler failed: {}".format(e))
+
+        proc = TIMERPROC(on_timer)
+        #WM_TIMER is dispatched to the procedure by get_message
+        timer_id = self._SetTimer(None, 0, int(interval * 1000), proc)
+        if timer_id:
+            self._timer_procs[timer_id] = proc
+        else:
+            logging.error("Failed to set a timer")
+        return timer_id
+
+    def kill_timer(self, timer_id):
+        self._KillTimer(None, timer_id)
+        self._timer_procs.pop(timer_id, None)
+
+    def get_message(self):
+        msg = ctypes.wintypes.MSG()
+        while True:
+            success = self._GetMessage(ctypes.pointer(msg), None, 0, 0) # Waiting here
+            if success > 0 and msg.message != WM_HOTKEY:
+                #Eg. for the notification window
+                self._TranslateMessage(ctypes.byref(msg))
+                self._DispatchMessage(ctypes.byref(msg))
+                continue
+            return success, msg.wParam, (msg.pt.x, msg.pt.y)
+
+    def wait_message(self, timeout=None):
+        msg = ctypes.wintypes.MSG()
+        handles = (ctypes.wintypes.HANDLE * 1)(self._wake_event)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            while self._PeekMessage(ctypes.byref(msg), None, 0, 0, PM_REMOVE):
+                if msg.message == WM_QUIT:
+                    return 0, msg.wParam, (msg.pt.x, msg.pt.y)
+                if msg.message == WM_HOTKEY:
+                    return 1, msg.wParam, (msg.pt.x, msg.pt.y)
+                self._TranslateMessage(ctypes.byref(msg))
+                self._DispatchMessage(ctypes.byref(msg))
+
+            if deadline is None:
+                wait = INFINITE
+            else:
+                wait = math.ceil(max(0, deadline - time.monotonic()) * 1000)
+            #Waiting here, for a message, the wake event or the time out
+            result = self._MsgWaitForMultipleObjectsEx(
+                1, handles, wait, QS_ALLINPUT, MWMO_INPUTAVAILABLE)
+            if result == WAIT_FAILED:
+                return -1, 0, (0, 0)
+            if result in (WAIT_OBJECT_0, WAIT_TIMEOUT):
+                return None
+            #Otherwise messages arrived
+
+    def wake(self):
+        self._SetEvent(self._wake_event)
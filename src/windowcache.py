@@ -0,0 +1,186 @@
+'''
+Provides: WindowCache, a resident table of the active windows
+
+The table is kept up to date from the backend's window events, so a hotkey
+press reads a ready snapshot, a WindowArray, instead of enumerating every
+window (all fields of the cached Window objects are fetched up front). It is
+fully rebuilt every resync_interval seconds in case an event was missed, by
+the scheduler given to start (see eventloop) or else on a background thread.
+While it runs, the exclusion verdicts of windows are reused without fetching
+their titles, as title changes are events.
+
+The cache also keeps the FreeSpaceMap of the last work area asked for, which
+window events update instead of a new map being built for every layout.
+'''
+
+import logging
+import threading
+
+import exclusion
+import windowinfo
+from backend import get_backend
+from freespace import FreeSpaceMap
+
+logging = logging.getLogger(__name__)
+
+DEFAULT_RESYNC_INTERVAL = 30 #seconds
+
+
+class WindowCache:
+    def __init__(self, resync_interval=DEFAULT_RESYNC_INTERVAL,
+                 on_change=None):
+        """On_change(hwnd) is called after the entry of a window changes"""
+        self.resync_interval = resync_interval
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._windows = {} #hwnd: Window, in z-order (top first) at resync
+        self._synced = False
+        self._version = 0 #Counts changes of the table
+        self._snapshot = None #WindowArray of the table, until it changes
+        self._free_map = None #(area, excluded hwnd, FreeSpaceMap)
+        self._stopping = threading.Event()
+        self._resync_thread = None
+        self._resync_timer = None
+
+    def start(self, periodic_resync=True, scheduler=None):
+        """Fill the table and start following window events
+
+        Scheduler, eg. an EventLoop, runs the periodic resyncs with its
+        call_every instead of a thread."""
+        self.resync()
+        get_backend().watch_windows(self.on_window_event)
+        exclusion.track()
+        if periodic_resync and scheduler is not None:
+            self._resync_timer = scheduler.call_every(self.resync_interval,
+                                                      self._try_resync)
+        elif periodic_resync:
+            self._stopping.clear()
+            self._resync_thread = threading.Thread(
+                target=self._resync_periodically, name='window-cache-resync',
+                daemon=True)
+            self._resync_thread.start()
+
+    def stop(self):
+        get_backend().unwatch_windows()
+        exclusion.track(False)
+        self._stopping.set()
+        if self._resync_timer is not None:
+            self._resync_timer.cancel()
+            self._resync_timer = None
+        if self._resync_thread is not None:
+            self._resync_thread.join()
+            self._resync_thread = None
+
+    def _resync_periodically(self):
+        while not self._stopping.wait(self.resync_interval):
+            self._try_resync()
+
+    def _try_resync(self):
+        try:
+            self.resync()
+        except Exception as e:
+            logging.error("Window cache resync failed: {}".format(e))
+
+    def resync(self):
+        """Rebuild the table from a full enumeration of the windows"""
+        #Titles are fetched again, in case a change was missed
+        exclusion.forget()
+        windows = {win.hwnd: win.fetch()
+                   for win in windowinfo.get_active_windows()}
+        with self._lock:
+            if self._free_map is not None and (
+                    _positions(windows) != _positions(self._windows)):
+                self._free_map = None
+            self._windows = windows
+            self._synced = True
+            self._version += 1
+            self._snapshot = None
+        logging.debug("Window cache resynced: {} windows".format(len(windows)))
+
+    def on_window_event(self, hwnd, destroyed):
+        """Refresh the entry of one window after it changed"""
+        if destroyed:
+            exclusion.forget(hwnd)
+            window = None
+        else:
+            try:
+                window = windowinfo.get_active_window(hwnd)
+                if window is not None:
+                    window.fetch()
+            except Exception as e:
+                #The window may be destroyed while it is queried
+                logging.debug("Window {} vanished: {}".format(hwnd, e))
+                window = None
+
+        with self._lock:
+            if window is None:
+                old = self._windows.pop(hwnd, None)
+            else:
+                old = self._windows.get(hwnd)
+                self._windows[hwnd] = window
+            self._version += 1
+            self._snapshot = None
+            if self._free_map is not None and hwnd != self._free_map[1]:
+                self._free_map[2].update(
+                    None if old is None else old.position,
+                    None if window is None else window.position)
+        if self.on_change is not None:
+            self.on_change(hwnd)
+
+    def snapshot(self):
+        """Return a WindowArray of the active windows (see get_active_windows)
+
+        The same array is returned until a window changes."""
+        if not self._synced:
+            self.resync()
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = windowinfo.WindowArray.from_windows(
+                    self._windows.values())
+            return self._snapshot
+
+    def z_ordered(self):
+        """Return the snapshot in z-order, top first
+
+        The table is only in z-order as of the last resync, as raising a
+        window is not an event, so the order is read from a fresh list of
+        the hwnds (only the list, nothing about each window). Windows gone
+        since are left out."""
+        snapshot = self.snapshot()
+        order = {hwnd: i for i, hwnd in
+                 enumerate(windowinfo.get_list_of_windows())}
+        indexes = [i for i, hwnd in enumerate(snapshot.hwnds) if hwnd in order]
+        indexes.sort(key=lambda i: order[snapshot.hwnds[i]])
+        return snapshot.select(indexes)
+
+    def free_map(self, area, exclude=None):
+        """Return the FreeSpaceMap of the windows other than exclude in area
+
+        Area is as for fill_space, and exclude is a hwnd, eg. of the window
+        being filled. The map of the last area is kept, and updated by the
+        window events instead of being built again."""
+        area = windowinfo.get_area(area)
+        with self._lock:
+            if self._free_map is not None and self._free_map[0] == area:
+                _, excluded, free_map = self._free_map
+                if exclude != excluded:
+                    #Put back the window left out last time, leave this out
+                    windows = self._windows
+                    if excluded in windows:
+                        free_map.update(new_rect=windows[excluded].position)
+                    if exclude in windows:
+                        free_map.update(old_rect=windows[exclude].position)
+                    self._free_map = (area, exclude, free_map)
+                return free_map
+            windows = [win for hwnd, win in self._windows.items()
+                       if hwnd != exclude]
+            version = self._version
+        free_map = FreeSpaceMap(windows, area)
+        with self._lock:
+            if self._version == version: #Unless a window changed meanwhile
+                self._free_map = (area, exclude, free_map)
+        return free_map
+
+
+def _positions(windows):
+    return {hwnd: win.position for hwnd, win in windows.items()}
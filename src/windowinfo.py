@@ -2,113 +2,137 @@
 Provides: fill_foreground_window()
 '''
 
-import ctypes  # @UnusedImport
-import ctypes.wintypes
+import functools
 import math
 import logging
+import time
+from array import array
+from logging import DEBUG
+
+import candidates
+import exclusion
+import filltrace
+import metrics
+import monitors
+import occlusion
+import occupancy
+from backend import get_backend
+from spatialindex import WindowIndex
 
 logging = logging.getLogger(__name__)
 
-EnumWindows = ctypes.windll.user32.EnumWindows
-EnumWindowsProc = ctypes.WINFUNCTYPE(ctypes.c_bool,
-                                     ctypes.POINTER(ctypes.c_int),
-                                     ctypes.POINTER(ctypes.c_int))
-GetWindowText = ctypes.windll.user32.GetWindowTextW
-GetWindowTextLength = ctypes.windll.user32.GetWindowTextLengthW
-IsWindowVisible = ctypes.windll.user32.IsWindowVisible
-GetWindowRect = ctypes.windll.user32.GetWindowRect
-GetDesktopWindow = ctypes.windll.user32.GetDesktopWindow
-IsIconic = ctypes.windll.user32.IsIconic #Is Minimised?
-IsZoomed = ctypes.windll.user32.IsZoomed #Is Maximised?
-GetForegroundWindow = ctypes.windll.user32.GetForegroundWindow
-MoveWindow = ctypes.windll.user32.MoveWindow
-GetCursorPos = ctypes.windll.user32.GetCursorPos
+DEFAULT_FILL_ENGINE = 'exact'
+#Fewest windows a WindowArray fills with NumPy, below it the overhead is more
+NUMPY_MIN_WINDOWS = 64
+#Engine of fill_foreground_window choosing between several fills
+CANDIDATES_ENGINE = 'candidates'
 
 
 def get_list_of_windows():
     """Return hwnds of all windows"""
-    hwnds = []
-    def foreach_window(hwnd, lParam):
-        hwnds.append(hwnd)
-        return True
-    EnumWindows(EnumWindowsProc(foreach_window), 0)
-    return hwnds
+    return get_backend().enum_windows()
 
 def get_active_windows():
     """Return a list of visible and non-minimised Window objects
     
-    The window must have a title.
-    Also it excludes "Program Manager" which fills up entire desktop.
-    Also excludes special run_once.bat file.
+    Windows excluded by the rules in exclusion are left out, by default those
+    without a title, "Program Manager" which fills up the entire desktop, and
+    Window Fill itself. Their verdicts are cached per window.
     """
-    active_windows = [Window.create_from_hwnd(hwnd) for hwnd
-                      in get_list_of_windows()
-                      if not IsIconic(hwnd) and IsWindowVisible(hwnd)]
-    wins_with_titles = [win for win in active_windows
-                        if win.title != '' and win.title != 'Program Manager'
-                        and not win.title.startswith('Window Fill.exe')]
-    return wins_with_titles
+    backend = get_backend()
+    tracking = exclusion.is_tracking()
+    rules = exclusion.get_rules()
+    check_size = rules.min_width or rules.min_height
+    active_windows = []
+    for hwnd in get_list_of_windows():
+        #Cheapest and most selective checks first, the title is fetched last
+        if not backend.is_visible(hwnd) or backend.is_iconic(hwnd):
+            continue
+        #While title changes are tracked, a known window's title is not needed
+        title = None if tracking else backend.get_window_title(hwnd)
+        if exclusion.is_excluded(hwnd, title):
+            continue
+        window = Window(hwnd, title)
+        if check_size and exclusion.is_too_small(window.position):
+            continue
+        active_windows.append(window)
+    return active_windows
+
+def get_active_window(hwnd):
+    """Return the Window for hwnd, or None if get_active_windows excludes it
+    
+    The title is fetched, so a change is seen by the exclusion rules."""
+    if is_shown(hwnd):
+        title = get_window_title(hwnd)
+        if not exclusion.is_excluded(hwnd, title):
+            window = Window(hwnd, title)
+            if not exclusion.is_too_small(window.position):
+                return window
+    return None
+
+def is_shown(hwnd):
+    """Return whether the window is visible and not minimised"""
+    backend = get_backend()
+    return backend.is_visible(hwnd) and not backend.is_iconic(hwnd)
 
 def get_desktop_size():
     """Get the full desktop resolution"""
-    rect = ctypes.wintypes.RECT()
-    GetWindowRect(GetDesktopWindow(), ctypes.pointer(rect))
-    return (rect.right, rect.bottom)
+    rect = get_backend().get_desktop_rect()
+    return (rect[2], rect[3])
 
-def get_usable_size():
-    """Return the usable screen resolution (ie. exclude task bar)"""
-    s = get_desktop_size()
-    #TODO: Make it not a hack
-    return s[0], s[1] - 40 #Hack bottom task bar removable
+def get_work_area(position):
+    """Return the work area (left, top, right, bottom) of the monitor at
+    position, ie. the monitor excluding the task bar"""
+    return monitors.get_monitor_at(position).work_area
 
 def get_window_title(hwnd):
     """Return the title of a window"""
-    length = GetWindowTextLength(hwnd)
-    buff = ctypes.create_unicode_buffer(length + 1)
-    GetWindowText(hwnd, buff, length+1)
-    return buff.value
+    return get_backend().get_window_title(hwnd)
 
 def get_window_rect(hwnd):
     """Return the window rectangle (left, top, right, bottom)"""
-    rect = ctypes.wintypes.RECT()
-    GetWindowRect(hwnd, ctypes.pointer(rect))
-    return (rect.left, rect.top, rect.right, rect.bottom)
+    return get_backend().get_window_rect(hwnd)
 
 def get_foreground_window():
     """Return the foreground window"""
-    return Window.create_from_hwnd(GetForegroundWindow())
+    return Window.create_from_hwnd(get_backend().get_foreground_window())
 
 def get_mouse_pos():
-    class CURSORINFO(ctypes.Structure):
-        _fields_ = [('cbSize', ctypes.c_uint),
-                    ('flags', ctypes.c_uint),
-                    ('hCursor', ctypes.c_void_p),
-                    ('ptScreenPos', ctypes.wintypes.POINT)]
-    
-    GetCursorInfo = ctypes.windll.user32.GetCursorInfo
-    GetCursorInfo.argtypes = [ctypes.POINTER(CURSORINFO)]
-    
-    # Initialize the output structure
-    info = CURSORINFO()
-    info.cbSize = ctypes.sizeof(info)
-    
-    if GetCursorInfo(ctypes.byref(info)):
-        if info.flags & 0x00000001:
-            #The cursor is showing
-            return (info.ptScreenPos.x, info.ptScreenPos.y)
-        else:
-            logging.error("Cursor is not showing")
-    else:
-        # Error occurred (invalid structure size?)
-        logging.error("Invalid structure size??")
+    """Return the cursor position (x, y), or None if it is not showing"""
+    return get_backend().get_cursor_pos()
 
 
 class Window:
-    def __init__(self, hwnd, title, rect, is_maximised):
+    """A window and its title, rectangle and maximised state
+    
+    Fields that are not given are fetched from the backend on first use (and
+    then kept), so a Window is a snapshot of the window at that time."""
+    
+    __slots__ = ('hwnd', '_title', '_position', '_is_maximised')
+    
+    def __init__(self, hwnd, title=None, rect=None, is_maximised=None):
         self.hwnd = hwnd
-        self.title = title
-        self.position = rect
-        self.is_maximised = is_maximised
+        self._title = title
+        self._position = rect
+        self._is_maximised = is_maximised
+    
+    @property
+    def title(self):
+        if self._title is None:
+            self._title = get_window_title(self.hwnd)
+        return self._title
+    
+    @property
+    def position(self):
+        if self._position is None:
+            self._position = get_window_rect(self.hwnd)
+        return self._position
+    
+    @property
+    def is_maximised(self):
+        if self._is_maximised is None:
+            self._is_maximised = get_backend().is_zoomed(self.hwnd)
+        return self._is_maximised
     
     @property
     def left(self):
@@ -126,21 +150,29 @@ class Window:
     def bottom(self):
         return self.position[3]
     
+    def fetch(self):
+        """Fetch any field not fetched yet, and return the Window"""
+        self.title, self.position, self.is_maximised  # @NoEffect
+        return self
+    
     def move_window(self, rect):
         """Move the window to the specified rectangle
         
         It will not move if the position is the same."""
-        if self.hwnd is not None:
-            if not self.is_maximised:
-                if self.position != rect:
-                    x, y = rect[0], rect[1]
-                    width = rect[2] - rect[0]
-                    height = rect[3] - rect[1]
-                    MoveWindow(self.hwnd, x, y, width, height, True)
-                else:
-                    logging.info("Did not move window into the same position")
-            else:
-                logging.info("Did not move maximised window")
+        if self.should_move(rect):
+            get_backend().move_window(self.hwnd, rect)
+    
+    def should_move(self, rect):
+        """Return whether moving the window to rect would change anything"""
+        if self.hwnd is None:
+            return False
+        if self.is_maximised:
+            logging.info("Did not move maximised window")
+            return False
+        if self.position == rect:
+            logging.info("Did not move window into the same position")
+            return False
+        return True
     
     def __eq__(self, other):
         return self.title == other.title and self.position == other.position
@@ -150,19 +182,137 @@ class Window:
     
     @classmethod
     def create_from_hwnd(cls, hwnd):
-        title = get_window_title(hwnd)
-        position = get_window_rect(hwnd)
-        is_maximised = IsZoomed(hwnd)
-        
-        return cls(hwnd, title, position, is_maximised)
+        """Return a Window whose fields are fetched when first used"""
+        return cls(hwnd)
     
     @classmethod
     def create_dummy(cls, title, rect, is_maximised=False):
         return cls(None, title, rect, is_maximised)
 
 
+class MoveBatch:
+    """Moves collected for several windows, applied together by commit()
+    
+    The backend positions all the windows in one transaction and repaints
+    once, instead of once per window as with Window.move_window."""
+    
+    def __init__(self):
+        self._moves = {} #{hwnd: rect}
+    
+    def __len__(self):
+        return len(self._moves)
+    
+    def add(self, window, rect):
+        """Queue moving window to rect, return whether it will move"""
+        if not window.should_move(rect):
+            self._moves.pop(window.hwnd, None)
+            return False
+        self._moves[window.hwnd] = tuple(rect)
+        return True
+    
+    def commit(self):
+        """Move the queued windows and return how many moved"""
+        moves = list(self._moves.items())
+        self._moves.clear()
+        if moves:
+            get_backend().move_windows(moves)
+        return len(moves)
+
+
+class WindowArray:
+    """Many windows, as columns: their rectangles in array('i') buffers and
+    their hwnds and titles in parallel lists
+    
+    It is much smaller than a list of Window objects, and the fill engines
+    and is_empty read the columns directly (with NumPy, as a RectArray). A
+    Window is only made when one is looked up, by index or by iterating. The
+    windows are a snapshot: the array is not changed once made."""
+    
+    def __init__(self, rects=(), hwnds=None, titles=None, maximised=None):
+        """Hwnds, titles and maximised states are in the order of rects, and
+        a title or state of None is fetched from the backend when first used"""
+        rects = list(rects)
+        self.lefts, self.tops, self.rights, self.bottoms = (
+            array('i', [rect[i] for rect in rects]) for i in range(4))
+        count = len(rects)
+        self.hwnds = [None] * count if hwnds is None else list(hwnds)
+        self.titles = [None] * count if titles is None else list(titles)
+        self.maximised = ([None] * count if maximised is None else
+                          list(maximised))
+        self._rect_array = None
+    
+    @classmethod
+    def from_windows(cls, windows):
+        """Return the windows as a WindowArray, fields not fetched stay so"""
+        windows = list(windows)
+        return cls([win.position for win in windows],
+                   [win.hwnd for win in windows],
+                   [win._title for win in windows],
+                   [win._is_maximised for win in windows])
+    
+    def select(self, indexes):
+        """Return a WindowArray of the windows at indexes, in that order"""
+        indexes = list(indexes)
+        return WindowArray([self.get_rect(i) for i in indexes],
+                           [self.hwnds[i] for i in indexes],
+                           [self.titles[i] for i in indexes],
+                           [self.maximised[i] for i in indexes])
+    
+    def __len__(self):
+        return len(self.lefts)
+    
+    def __getitem__(self, index):
+        return Window(self.hwnds[index], self.get_title(index),
+                      self.get_rect(index),
+                      False if self.hwnds[index] is None else
+                      self.maximised[index])
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+    
+    def get_title(self, index):
+        if self.titles[index] is None and self.hwnds[index] is not None:
+            self.titles[index] = get_window_title(self.hwnds[index])
+        return self.titles[index]
+    
+    def get_rect(self, index):
+        return (self.lefts[index], self.tops[index], self.rights[index],
+                self.bottoms[index])
+    
+    def rects(self):
+        """Return an iterator of the (left, top, right, bottom) rectangles"""
+        return zip(self.lefts, self.tops, self.rights, self.bottoms)
+    
+    def uses_numpy(self):
+        """Return whether fills are faster as array operations (RectArray)"""
+        return occupancy.HAVE_NUMPY and len(self) >= NUMPY_MIN_WINDOWS
+    
+    def rect_array(self):
+        """Return the rectangles as an occupancy.RectArray (needs NumPy)"""
+        if self._rect_array is None:
+            self._rect_array = occupancy.RectArray.from_columns(
+                self.lefts, self.tops, self.rights, self.bottoms)
+        return self._rect_array
+    
+    def is_empty(self, position):
+        """Return whether there is no window at position"""
+        x, y = position
+        if self.uses_numpy():
+            return self.rect_array().is_empty(position)
+        for left, top, right, bottom in self.rects():
+            if left < x < right and top < y < bottom:
+                return False
+        return True
+
+
 def is_empty(windows, position):
-    """Return whether there is no window at position"""
+    """Return whether there is no window at position
+    
+    Windows may be a list of Window objects, a WindowIndex or a WindowArray."""
+    if isinstance(windows, (WindowIndex, WindowArray)):
+        return windows.is_empty(position)
+    
     for window in windows:
         if(window.left < position[0] < window.right and
            window.top < position[1] < window.bottom):
@@ -171,24 +321,70 @@ def is_empty(windows, position):
     return True
 
 
-def fill_space(windows, desktop_size, position):
+def get_layout(windows):
+    """Return the ((hwnd, rect), ...) of windows, eg. to key a cache by"""
+    if isinstance(windows, WindowArray):
+        return tuple(zip(windows.hwnds, windows.rects()))
+    return tuple((win.hwnd, win.position) for win in windows)
+
+
+def get_area(desktop_size):
+    """Return the area (left, top, right, bottom) for a fill_space desktop_size"""
+    if len(desktop_size) == 2:
+        return (0, 0, desktop_size[0], desktop_size[1])
+    return tuple(desktop_size)
+
+
+def fill_space(windows, desktop_size, position, engine=DEFAULT_FILL_ENGINE):
     """Specify (left, top, right, bottom) of a window to fill position (x, y)
     
-    Windows should(!) exclude the window that you are moving.
-    Requires position to be empty."""
+    Windows should(!) exclude the window that you are moving, and may be
+    a list of Window objects, a WindowIndex or a WindowArray.
+    Requires position to be empty.
+    The desktop_size is (width, height), or the area (left, top, right,
+    bottom) to fill within, eg. the work area of a monitor.
+    The engine is one of the names in FILL_ENGINES."""
+    
+    try:
+        fill = FILL_ENGINES[engine]
+    except KeyError:
+        raise ValueError("Unknown fill engine: {}".format(engine))
+    return fill(windows, desktop_size, position)
+
+
+def index_windows(windows, engine):
+    """Return windows as the fill engine reads them fastest
+    
+    Only the legacy engine, which tests many points, gains from a WindowIndex;
+    the others read each window once, so building one would cost more than
+    the fill."""
+    if (engine == 'legacy' and
+            not isinstance(windows, (WindowIndex, WindowArray))):
+        return WindowIndex(windows)
+    return windows
+
+
+def fill_space_legacy(windows, desktop_size, position):
+    """Pixel-stepping fill (original algorithm)
+    
+    Steps left/right one pixel at a time, then jump-searches up/down probing
+    every 10th column, so it can miss narrow windows."""
     
     if not is_empty(windows, position):
         logging.warning("Attempted to move window into non-empty position")
         return None
     
+    area_left, area_top, area_right, area_bottom = get_area(desktop_size)
+    
     #Get left most on central horizontal line
     new_left = position[0]
-    while is_empty(windows, (new_left - 1, position[1])) and new_left > 0:
+    while(is_empty(windows, (new_left - 1, position[1])) and
+          new_left > area_left):
         new_left -= 1
     
     new_right = position[0]
     while(is_empty(windows, (new_right + 1, position[1])) and 
-          new_right < desktop_size[0]):
+          new_right < area_right):
         new_right += 1
     
     #Try to move the new horizontal line up as much as possible
@@ -200,11 +396,11 @@ def fill_space(windows, desktop_size, position):
         return True
     
     jumpby = 128
-    while new_top > 0:
+    while new_top > area_top:
         if test_next_top(new_top - jumpby):
             new_top -= jumpby
-            if new_top < 0:
-                new_top = 0
+            if new_top < area_top:
+                new_top = area_top
         elif jumpby > 1:
             jumpby = math.floor(jumpby/2)
         else:
@@ -218,11 +414,11 @@ def fill_space(windows, desktop_size, position):
         return True
     
     jumpby = 128
-    while new_bottom < desktop_size[1]:
+    while new_bottom < area_bottom:
         if test_next_bottom(new_bottom + jumpby):
             new_bottom += jumpby
-            if new_bottom > desktop_size[1]:
-                new_bottom = desktop_size[1]
+            if new_bottom > area_bottom:
+                new_bottom = area_bottom
         elif jumpby > 1:
             jumpby = math.floor(jumpby/2)
         else:
@@ -231,37 +427,399 @@ def fill_space(windows, desktop_size, position):
     return (new_left, new_top, new_right, new_bottom)
 
 
-def fill_foreground_window():
-    """Fill the current foreground window to available space at mouse cursor."""
+def fill_space_exact(windows, desktop_size, position):
+    """Edge-snapping fill, giving the exact result the legacy fill approximates
+    
+    A window only covers the points strictly inside it (see is_empty), so it
+    blocks the columns left+1..right-1 and rows top+1..bottom-1. The cursor row
+    is extended to the nearest blocking edges, then that span is extended up
+    and down to the nearest windows overlapping it. O(n) in the windows."""
+    
+    if not is_empty(windows, position):
+        logging.warning("Attempted to move window into non-empty position")
+        return None
+    
+    area = get_area(desktop_size)
+    if isinstance(windows, WindowArray) and windows.uses_numpy():
+        return windows.rect_array().fill(area, position)
+    return _fill_exact(_blocking_rects(windows), area, position)
+
+
+def _blocking_rects(windows):
+    """Return the rectangles of the windows that can cover a point"""
+    if isinstance(windows, WindowArray):
+        rects = windows.rects()
+    else:
+        rects = ((win.left, win.top, win.right, win.bottom)
+                 for win in windows)
+    #Windows too thin to contain a point never block anything
+    return [rect for rect in rects
+            if rect[2] - rect[0] >= 2 and rect[3] - rect[1] >= 2]
+
+
+def _fill_exact(rects, area, position):
+    """Return the fill_space_exact rectangle at an empty position"""
+    x, y = position
+    area_left, area_top, area_right, area_bottom = area
+    
+    #Horizontal: windows crossing the cursor row lie entirely left or right
+    new_left = area_left if x > area_left else x
+    new_right = area_right if x < area_right else x
+    for left, top, right, bottom in rects:
+        if top < y < bottom:
+            if right <= x:
+                new_left = max(new_left, right)
+            elif left >= x:
+                new_right = min(new_right, left)
+    
+    #Vertical: windows overlapping the span lie entirely above or below
+    new_top = area_top if y > area_top else y
+    new_bottom = area_bottom if y < area_bottom else y
+    for left, top, right, bottom in rects:
+        if left + 1 <= new_right and right - 1 >= new_left:
+            if bottom <= y:
+                new_top = max(new_top, bottom)
+            elif top >= y:
+                new_bottom = min(new_bottom, top)
+    
+    return (new_left, new_top, new_right, new_bottom)
+
+
+def fill_space_numpy(windows, desktop_size, position, scale=1):
+    """Occupancy-grid fill using NumPy, see occupancy.OccupancyGrid
+    
+    Falls back to the exact fill when NumPy is not installed or the position
+    is outside the area. A scale above 1 downscales the grid (less precise).
+    The grid of the last layout filled is kept for the next fill."""
+    
+    if not occupancy.HAVE_NUMPY:
+        logging.debug("NumPy is not installed, using the exact fill")
+        return fill_space_exact(windows, desktop_size, position)
     
+    grid = _get_grid(windows, desktop_size, scale)
+    if not grid.contains(position):
+        return fill_space_exact(windows, desktop_size, position)
+    
+    if not is_empty(windows, position):
+        logging.warning("Attempted to move window into non-empty position")
+        return None
+    
+    new_rect = grid.fill(position)
+    if new_rect is None:
+        #Only possible when downscaled: the cell is partly covered
+        return fill_space_exact(windows, desktop_size, position)
+    return new_rect
+
+
+#(layout, grid) of the last fill_space_numpy, as presses repeat on a layout
+_last_grid = (None, None)
+
+
+def _get_grid(windows, desktop_size, scale):
+    """Return the OccupancyGrid of a layout, reusing the last one's"""
+    global _last_grid
+    if isinstance(windows, WindowArray):
+        rects = windows.rect_array()
+        key = (rects.rects.tobytes(), tuple(desktop_size), scale)
+    else:
+        rects = windows
+        key = (tuple((win.left, win.top, win.right, win.bottom)
+                     for win in windows), tuple(desktop_size), scale)
+    layout, grid = _last_grid
+    if layout != key:
+        grid = occupancy.OccupancyGrid(rects, desktop_size, scale)
+        _last_grid = (key, grid)
+    return grid
+
+
+FILL_ENGINES = {
+    'legacy': fill_space_legacy,
+    'exact': fill_space_exact,
+    'numpy': fill_space_numpy,
+}
+
+
+def fill_space_many(windows, desktop_size, points, engine=DEFAULT_FILL_ENGINE):
+    """Return [fill_space(windows, desktop_size, point, engine), ...]
+    
+    For filling thousands of points, eg. for a preview of the fill anywhere
+    on the desktop. The work common to the points is done once: the exact and
+    numpy engines give the same result, filled for all the points at once
+    with NumPy (see occupancy.RectArray.fill_many), or otherwise once per cell
+    of the grid of window and area edges (the result is the same anywhere
+    within a cell). Covered points give None, without warning for each."""
+    
+    if engine not in FILL_ENGINES:
+        raise ValueError("Unknown fill engine: {}".format(engine))
+    points = [tuple(point) for point in points]
+    area = get_area(desktop_size)
+    
+    if engine == 'legacy':
+        index = index_windows(windows, engine)
+        results = {}
+        for point in points:
+            if point not in results:
+                results[point] = (fill_space_legacy(index, area, point)
+                                  if index.is_empty(point) else None)
+        return [results[point] for point in points]
+    
+    if occupancy.HAVE_NUMPY:
+        if isinstance(windows, WindowArray):
+            return windows.rect_array().fill_many(area, points)
+        rects = occupancy.RectArray(_blocking_rects(windows))
+        return rects.fill_many(area, points)
+    
+    blocking = _blocking_rects(windows)
+    xs = sorted({area[0], area[2]}.union(
+        *((rect[0], rect[2]) for rect in blocking)))
+    ys = sorted({area[1], area[3]}.union(
+        *((rect[1], rect[3]) for rect in blocking)))
+    #The cells of FillCache, which imports this module
+    from fillcache import _cell as cell
+    
+    results = []
+    cells = {}
+    for point in points:
+        x, y = point
+        if area[0] <= x <= area[2] and area[1] <= y <= area[3]:
+            key = (cell(xs, x), cell(ys, y))
+        else:
+            #Outside the area the result depends on the exact position
+            key = point
+        if key not in cells:
+            covered = any(left < x < right and top < y < bottom
+                          for left, top, right, bottom in blocking)
+            cells[key] = None if covered else _fill_exact(blocking, area,
+                                                          point)
+        results.append(cells[key])
+    return results
+
+
+#Engines whose fill costs more than dropping the hidden windows first: the
+#exact and numpy fills read each window once, so pruning would cost more
+PRUNED_ENGINES = {'legacy', CANDIDATES_ENGINE}
+
+#(layout, pruned windows) of the last fill, as presses repeat on a layout
+_last_pruned = (None, None)
+
+
+def _prune_occluded(windows):
+    """Return occlusion.prune_occluded(windows), reusing the last layout's
+    
+    Pruning is quadratic, so it is only redone when the layout changes."""
+    global _last_pruned
+    key = get_layout(windows)
+    layout, pruned = _last_pruned
+    if layout != key:
+        pruned = occlusion.prune_occluded(windows)
+        _last_pruned = (key, pruned)
+    return pruned
+
+
+def fill_foreground_window(engine=DEFAULT_FILL_ENGINE, windows=None,
+                           cache=None, policy=None, free_map=None):
+    """Fill the current foreground window to available space at mouse cursor.
+    
+    Return the rectangle the window was moved into, or None if it was not.
+    Windows defaults to get_active_windows(), but a list of them or a function
+    returning one can be given instead (see windowcache).
+    Fill results are looked up in cache, a fillcache.FillCache, if given.
+    The engine may also be CANDIDATES_ENGINE, to choose between several fills
+    under policy (see candidates), which is not cached. They read free space
+    maps from free_map(area, exclude hwnd), eg. WindowCache.free_map, if given.
+    The time taken by each phase is recorded in metrics, when enabled."""
+    
+    with metrics.phase('total'):
+        return _fill_foreground_window(engine, windows, cache, policy,
+                                       free_map)
+
+
+def _fill_foreground_window(engine, windows, cache, policy, free_map):
     logging.info("Start a window fill")
     
-    mouse_pos = get_mouse_pos()
+    with metrics.phase('cursor'):
+        mouse_pos = get_mouse_pos()
     logging.debug("Mouse position: {}".format(mouse_pos))
+    if mouse_pos is None:
+        logging.warning("Unable to get the mouse position.")
+        return None
     
-    wins = get_active_windows()
+    with metrics.phase('enumerate'):
+        if windows is None:
+            wins = get_active_windows()
+        elif callable(windows):
+            wins = windows()
+        else:
+            wins = windows
     
-    desktop_size = get_usable_size()
-    logging.debug("Usable desktop size: {}".format(desktop_size))
+    with metrics.phase('filter'):
+        monitor = monitors.get_monitor_at(mouse_pos)
+        work_area = monitor.work_area
+        fore = get_foreground_window()
+        if fore.hwnd:
+            real_size = get_desktop_size()
+            full_screen = fore.position in (monitor.bounds,
+                                            (0, 0, real_size[0], real_size[1]))
+            #Windows on other monitors cannot affect the fill
+            wins = _others_in_area(wins, fore, work_area)
+            #Windows hidden behind others cannot affect the fill either
+            if engine in PRUNED_ENGINES:
+                wins = _prune_occluded(wins)
     
-    fore = get_foreground_window()
+    logging.debug("Monitor work area: {}".format(work_area))
+    if not fore.hwnd:
+        logging.warning("There is no foreground window.")
+        return None
     logging.debug("Foreground window: {}".format(str(fore)))
     
-    real_size = get_desktop_size()
-    if fore.position == (0, 0, real_size[0], real_size[1]):
+    new_size = None
+    if full_screen:
         logging.info("Window is full-screen, we will not move it.")
     else:
-        logging.debug("---Windows excluding foreground window:")
-        wins = [win for win in wins if win != fore]
-        for win in wins:
-            logging.debug(str(win))
+        if logging.isEnabledFor(DEBUG):
+            logging.debug("---Windows excluding foreground window:")
+            for win in wins:
+                logging.debug(str(win))
         
-        new_size = fill_space(wins, desktop_size, mouse_pos)
+        with metrics.phase('fill'):
+            fill_start = time.perf_counter()
+            if engine == CANDIDATES_ENGINE:
+                size = (fore.right - fore.left, fore.bottom - fore.top)
+                if free_map is not None:
+                    free_map = functools.partial(free_map, work_area,
+                                                 fore.hwnd)
+                new_size = candidates.choose_fill(
+                    wins, work_area, mouse_pos, size,
+                    policy or candidates.DEFAULT_POLICY, free_map)
+            elif cache is None:
+                new_size = fill_space(index_windows(wins, engine), work_area,
+                                      mouse_pos, engine)
+            else:
+                new_size = cache.fill(wins, work_area, mouse_pos, engine)
+            fill_time = time.perf_counter() - fill_start
+        if filltrace.is_recording():
+            filltrace.record(filltrace.TraceRecord(
+                time.time(), mouse_pos, work_area, real_size, new_size,
+                fill_time, engine, [rect for _, rect in get_layout(wins)]))
         if new_size is not None:
             logging.info("Moving window to given rectangle: {}".format(new_size))
-            fore.move_window(new_size)
+            with metrics.phase('move'):
+                fore.move_window(new_size)
         else:
             logging.warning("Unable to obtain rectangle to move window into.")
     
     logging.info("Finished window fill")
     logging.info("")
+    return new_size
+
+
+def _others_in_area(windows, fore, area):
+    """Return the windows other than fore overlapping area, a WindowArray
+    if windows is one"""
+    area_left, area_top, area_right, area_bottom = area
+    if isinstance(windows, WindowArray):
+        return windows.select(
+            i for i, (left, top, right, bottom) in enumerate(windows.rects())
+            if windows.hwnds[i] != fore.hwnd and
+            right > area_left and left < area_right and
+            bottom > area_top and top < area_bottom)
+    return [win for win in windows if win != fore and
+            win.right > area_left and win.left < area_right and
+            win.bottom > area_top and win.top < area_bottom]
+
+
+def _window_area(win):
+    return (win.right - win.left) * (win.bottom - win.top)
+
+#Orders in which fill_all_windows fills the windows, as sort keys
+FILL_ALL_ORDERS = {
+    'z-order': None, #Top first, as listed by get_active_windows
+    'largest': lambda win: -_window_area(win),
+    'smallest': _window_area,
+}
+DEFAULT_FILL_ALL_ORDER = 'z-order'
+
+
+def fill_all_windows(order=DEFAULT_FILL_ALL_ORDER, windows=None):
+    """Fill every active window into the space left by the others.
+    
+    The windows are filled one at a time in order (see FILL_ALL_ORDERS), as if
+    the hotkey was pressed at the centre of each, and the windows filled
+    before it block at their new positions. Maximised and full-screen windows
+    are left alone. All windows are moved together at the end (see MoveBatch).
+    Windows is as for fill_foreground_window.
+    Return {hwnd: rect} of the windows moved."""
+    
+    try:
+        key = FILL_ALL_ORDERS[order]
+    except KeyError:
+        raise ValueError("Unknown fill order: {}".format(order))
+    
+    with metrics.phase('fill all'):
+        return _fill_all_windows(key, windows)
+
+
+def _fill_points(rect, area):
+    """Return the points to try filling a window from: the centre, then the
+    corners just inside it, all moved into area"""
+    left, top, right, bottom = rect
+    points = [((left + right) // 2, (top + bottom) // 2),
+              (left + 1, top + 1), (right - 1, top + 1),
+              (left + 1, bottom - 1), (right - 1, bottom - 1)]
+    return [(min(max(x, area[0]), area[2]), min(max(y, area[1]), area[3]))
+            for x, y in points]
+
+
+def _fill_all_windows(key, windows):
+    if windows is None:
+        wins = get_active_windows()
+    elif callable(windows):
+        wins = windows()
+    else:
+        wins = windows
+    
+    real_size = get_desktop_size()
+    desktop = (0, 0, real_size[0], real_size[1])
+    targets = [] #[(Window, work area), ...]
+    for win in wins:
+        if win.is_maximised:
+            continue
+        position = win.position
+        monitor = monitors.get_monitor_at(((position[0] + position[2]) // 2,
+                                           (position[1] + position[3]) // 2))
+        if position in (monitor.bounds, desktop):
+            continue
+        targets.append((win, monitor.work_area))
+    if key is not None:
+        targets.sort(key=lambda target: key(target[0]))
+    
+    #Only the rectangle of the window just placed changes each time
+    rects = [win.position for win, _ in targets]
+    if occupancy.HAVE_NUMPY:
+        obstacles = occupancy.RectArray(rects)
+    
+    batch = MoveBatch()
+    moved = {}
+    for i, (win, work_area) in enumerate(targets):
+        new_rect = None
+        if occupancy.HAVE_NUMPY:
+            for point in _fill_points(rects[i], work_area):
+                new_rect = obstacles.fill(work_area, point, ignore=i)
+                if new_rect is not None:
+                    break
+        else:
+            others = [Window.create_dummy(None, rect)
+                      for j, rect in enumerate(rects) if j != i]
+            for point in _fill_points(rects[i], work_area):
+                if is_empty(others, point):
+                    new_rect = fill_space_exact(others, work_area, point)
+                    break
+        
+        if new_rect is not None and batch.add(win, new_rect):
+            rects[i] = moved[win.hwnd] = new_rect
+            if occupancy.HAVE_NUMPY:
+                obstacles.replace(i, new_rect)
+    
+    logging.info("Filling {} of {} windows".format(len(moved), len(targets)))
+    batch.commit()
+    return moved